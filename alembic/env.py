@@ -32,6 +32,11 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# DATABASE_URL, when set, wins over alembic.ini so migrations hit the same
+# database as the app (% is escaped for configparser interpolation)
+if os.getenv("DATABASE_URL"):
+    config.set_main_option("sqlalchemy.url", os.environ["DATABASE_URL"].replace("%", "%%"))
+
 # This tells Alembic where to find your tables
 target_metadata = Base.metadata
 
@@ -0,0 +1,50 @@
+"""enrollment jobs
+
+Revision ID: 2e6f0b8d4c71
+Revises: d7a1c5e93f28
+Create Date: 2026-10-18 19:02:13.447920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2e6f0b8d4c71'
+down_revision: Union[str, Sequence[str], None] = 'd7a1c5e93f28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "enrollment_jobs",
+        sa.Column("job_id", sa.Integer(), primary_key=True),
+        sa.Column("created_by", sa.Integer(), sa.ForeignKey("users.user_id"), nullable=True),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("total_rows", sa.Integer(), nullable=False),
+        sa.Column("processed_rows", sa.Integer(), nullable=False),
+        sa.Column("succeeded", sa.Integer(), nullable=False),
+        sa.Column("failed", sa.Integer(), nullable=False),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now()),
+        sa.Column("finished_at", sa.TIMESTAMP(timezone=True), nullable=True),
+    )
+    op.create_table(
+        "enrollment_job_rows",
+        sa.Column("job_id", sa.Integer(), sa.ForeignKey("enrollment_jobs.job_id"), primary_key=True),
+        sa.Column("row_number", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(), nullable=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.user_id"), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("enrollment_job_rows")
+    op.drop_table("enrollment_jobs")
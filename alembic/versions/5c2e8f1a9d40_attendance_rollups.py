@@ -0,0 +1,66 @@
+"""attendance rollups
+
+Revision ID: 5c2e8f1a9d40
+Revises: eb74d37733c5
+Create Date: 2026-10-18 14:40:11.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2e8f1a9d40'
+down_revision: Union[str, Sequence[str], None] = 'eb74d37733c5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_attendance_records_check_in_time", "attendance_records", ["check_in_time"])
+
+    op.create_table(
+        "attendance_daily_rollups",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("check_ins", sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        "attendance_session_rollups",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("session_id", sa.Integer(), sa.ForeignKey("attendance_sessions.session_id"), primary_key=True),
+        sa.Column("check_ins", sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        "attendance_user_rollups",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.user_id"), primary_key=True),
+        sa.Column("check_ins", sa.Integer(), nullable=False),
+        sa.Column("last_check_in", sa.TIMESTAMP(timezone=True)),
+    )
+
+    # Backfill from the existing records
+    day = "date(check_in_time)" if op.get_bind().dialect.name == "sqlite" else "date(check_in_time AT TIME ZONE 'UTC')"
+    op.execute(
+        f"INSERT INTO attendance_daily_rollups (day, check_ins) "
+        f"SELECT {day}, count(*) FROM attendance_records WHERE check_in_time IS NOT NULL GROUP BY {day}"
+    )
+    op.execute(
+        f"INSERT INTO attendance_session_rollups (day, session_id, check_ins) "
+        f"SELECT {day}, session_id, count(*) FROM attendance_records WHERE check_in_time IS NOT NULL "
+        f"GROUP BY {day}, session_id"
+    )
+    op.execute(
+        "INSERT INTO attendance_user_rollups (user_id, check_ins, last_check_in) "
+        "SELECT user_id, count(*), max(check_in_time) FROM attendance_records WHERE check_in_time IS NOT NULL "
+        "GROUP BY user_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("attendance_user_rollups")
+    op.drop_table("attendance_session_rollups")
+    op.drop_table("attendance_daily_rollups")
+    op.drop_index("ix_attendance_records_check_in_time", table_name="attendance_records")
@@ -0,0 +1,117 @@
+"""binary face embeddings
+
+Revision ID: 63d367542a45
+Revises: 301d8db69fe7
+Create Date: 2026-10-18 09:12:41.208311
+
+"""
+import base64
+import binascii
+from typing import Sequence, Union
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '63d367542a45'
+down_revision: Union[str, Sequence[str], None] = '301d8db69fe7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+# Rows written before this migration were always Facenet float32
+LEGACY_DTYPE = "float32"
+LEGACY_MODEL = "Facenet"
+LEGACY_VERSION = 1
+
+users = sa.table(
+    "users",
+    sa.column("user_id", sa.Integer),
+    sa.column("face_embedding", sa.String),
+    sa.column("face_embedding_bin", sa.LargeBinary),
+    sa.column("face_embedding_b64", sa.String),
+    sa.column("embedding_dtype", sa.String),
+    sa.column("embedding_model", sa.String),
+    sa.column("embedding_version", sa.Integer),
+)
+
+
+def _flush(conn, statement, batch):
+    if batch:
+        conn.execute(statement, batch)
+        batch.clear()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.add_column(sa.Column("face_embedding_bin", sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column("embedding_dtype", sa.String(), nullable=True))
+        batch_op.add_column(sa.Column("embedding_model", sa.String(), nullable=True))
+        batch_op.add_column(sa.Column("embedding_version", sa.Integer(), nullable=True))
+
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.select(users.c.user_id, users.c.face_embedding).where(users.c.face_embedding.isnot(None))
+    ).fetchall()
+
+    statement = users.update().where(users.c.user_id == sa.bindparam("b_user_id")).values(
+        face_embedding_bin=sa.bindparam("b_blob"),
+        embedding_dtype=LEGACY_DTYPE,
+        embedding_model=LEGACY_MODEL,
+        embedding_version=LEGACY_VERSION,
+    )
+    batch = []
+    for user_id, value in rows:
+        # "NO FACE" was the admin placeholder; it becomes NULL
+        try:
+            blob = base64.b64decode(value, validate=True)
+        except (binascii.Error, ValueError):
+            continue
+        if not blob or len(blob) % 4:
+            continue
+        batch.append({"b_user_id": user_id, "b_blob": blob})
+        if len(batch) >= BATCH_SIZE:
+            _flush(conn, statement, batch)
+    _flush(conn, statement, batch)
+
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("face_embedding")
+        batch_op.alter_column("face_embedding_bin", new_column_name="face_embedding")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.add_column(sa.Column("face_embedding_b64", sa.String(), nullable=True))
+
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.select(users.c.user_id, users.c.face_embedding.label("blob"), users.c.embedding_dtype)
+    ).fetchall()
+
+    statement = users.update().where(users.c.user_id == sa.bindparam("b_user_id")).values(
+        face_embedding_b64=sa.bindparam("b_value"),
+    )
+    dtypes = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+    batch = []
+    for user_id, blob, dtype in rows:
+        if blob is None:
+            value = "NO FACE"
+        else:
+            vector = np.frombuffer(blob, dtype=dtypes.get(dtype or LEGACY_DTYPE, np.float32))
+            value = base64.b64encode(vector.astype(np.float32).tobytes()).decode("utf-8")
+        batch.append({"b_user_id": user_id, "b_value": value})
+        if len(batch) >= BATCH_SIZE:
+            _flush(conn, statement, batch)
+    _flush(conn, statement, batch)
+
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("face_embedding")
+        batch_op.drop_column("embedding_dtype")
+        batch_op.drop_column("embedding_model")
+        batch_op.drop_column("embedding_version")
+        batch_op.alter_column("face_embedding_b64", new_column_name="face_embedding")
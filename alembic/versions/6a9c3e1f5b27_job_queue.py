@@ -0,0 +1,55 @@
+"""job queue
+
+Revision ID: 6a9c3e1f5b27
+Revises: 2e6f0b8d4c71
+Create Date: 2026-10-18 20:11:37.204618
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a9c3e1f5b27'
+down_revision: Union[str, Sequence[str], None] = '2e6f0b8d4c71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "jobs",
+        sa.Column("job_id", sa.Integer(), primary_key=True),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("payload", sa.Text(), nullable=True),
+        sa.Column("data", sa.LargeBinary(), nullable=True),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("max_attempts", sa.Integer(), nullable=False),
+        sa.Column("run_after", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("locked_until", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("locked_by", sa.String(), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now()),
+        sa.Column("finished_at", sa.TIMESTAMP(timezone=True), nullable=True),
+    )
+    op.create_index("ix_jobs_claim", "jobs", ["status", "run_after"])
+    # Existing users were enrolled synchronously
+    with op.batch_alter_table("users", recreate="always") as batch_op:
+        batch_op.add_column(sa.Column("enrollment_status", sa.String(), nullable=False, server_default="complete"))
+        batch_op.add_column(sa.Column("enrollment_job_id", sa.Integer(), nullable=True))
+        batch_op.create_foreign_key("fk_users_enrollment_job_id", "jobs", ["enrollment_job_id"], ["job_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("users", recreate="always") as batch_op:
+        batch_op.drop_constraint("fk_users_enrollment_job_id", type_="foreignkey")
+        batch_op.drop_column("enrollment_job_id")
+        batch_op.drop_column("enrollment_status")
+    op.drop_index("ix_jobs_claim", table_name="jobs")
+    op.drop_table("jobs")
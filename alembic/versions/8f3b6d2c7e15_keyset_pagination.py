@@ -0,0 +1,54 @@
+"""keyset pagination indexes
+
+Revision ID: 8f3b6d2c7e15
+Revises: 5c2e8f1a9d40
+Create Date: 2026-10-18 16:05:37.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f3b6d2c7e15'
+down_revision: Union[str, Sequence[str], None] = '5c2e8f1a9d40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ("ix_users_created", "users", ["created_at", "user_id"]),
+    ("ix_users_role_created", "users", ["role", "created_at", "user_id"]),
+    ("ix_attendance_sessions_created", "attendance_sessions", ["created_at", "session_id"]),
+    ("ix_attendance_sessions_creator_created", "attendance_sessions", ["created_by", "created_at", "session_id"]),
+    ("ix_attendance_records_created", "attendance_records", ["created_at", "record_id"]),
+    ("ix_attendance_records_session_created", "attendance_records", ["session_id", "created_at", "record_id"]),
+    ("ix_attendance_records_user_created", "attendance_records", ["user_id", "created_at", "record_id"]),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # SQLite can't ADD COLUMN with a CURRENT_TIMESTAMP default, hence the table copy
+    with op.batch_alter_table("attendance_records", recreate="always") as batch_op:
+        batch_op.add_column(sa.Column("created_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now()))
+    op.execute("UPDATE attendance_records SET created_at = COALESCE(check_in_time, created_at)")
+
+    if op.get_bind().dialect.name == "sqlite":
+        # CURRENT_TIMESTAMP has no fractional seconds while rows written by the
+        # app do; give them one text format so (created_at, id) compares in order
+        for table in ("users", "attendance_sessions", "attendance_records"):
+            op.execute(f"UPDATE {table} SET created_at = created_at || '.000000' WHERE length(created_at) = 19")
+
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
+    with op.batch_alter_table("attendance_records") as batch_op:
+        batch_op.drop_column("created_at")
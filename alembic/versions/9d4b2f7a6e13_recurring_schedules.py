@@ -0,0 +1,58 @@
+"""recurring schedules
+
+Revision ID: 9d4b2f7a6e13
+Revises: 6a9c3e1f5b27
+Create Date: 2026-10-18 21:04:52.318640
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4b2f7a6e13'
+down_revision: Union[str, Sequence[str], None] = '6a9c3e1f5b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "recurring_schedules",
+        sa.Column("schedule_id", sa.Integer(), primary_key=True),
+        sa.Column("created_by", sa.Integer(), sa.ForeignKey("users.user_id"), nullable=True),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("weekdays", sa.String(), nullable=False),
+        sa.Column("start_time", sa.Time(), nullable=False),
+        sa.Column("duration_minutes", sa.Integer(), nullable=False),
+        sa.Column("timezone", sa.String(), nullable=False),
+        sa.Column("start_date", sa.Date(), nullable=False),
+        sa.Column("end_date", sa.Date(), nullable=False),
+        sa.Column("exceptions", sa.Text(), nullable=True),
+        sa.Column("gps_lat", sa.Float()),
+        sa.Column("gps_lon", sa.Float()),
+        sa.Column("allowed_radius", sa.Integer()),
+        sa.Column("geofence", sa.Text(), nullable=True),
+        sa.Column("qr_rotation_seconds", sa.Integer(), nullable=True),
+        sa.Column("materialized_through", sa.Date(), nullable=True),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now()),
+    )
+    # SQLite can't ADD COLUMN with a CURRENT_TIMESTAMP default, hence the table copy
+    with op.batch_alter_table("attendance_sessions", recreate="always") as batch_op:
+        batch_op.add_column(sa.Column("schedule_id", sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(
+            "fk_attendance_sessions_schedule_id", "recurring_schedules", ["schedule_id"], ["schedule_id"]
+        )
+        batch_op.create_unique_constraint("_schedule_start_uc", ["schedule_id", "start_time"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("attendance_sessions", recreate="always") as batch_op:
+        batch_op.drop_constraint("_schedule_start_uc", type_="unique")
+        batch_op.drop_constraint("fk_attendance_sessions_schedule_id", type_="foreignkey")
+        batch_op.drop_column("schedule_id")
+    op.drop_table("recurring_schedules")
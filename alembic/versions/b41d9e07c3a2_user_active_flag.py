@@ -0,0 +1,36 @@
+"""user active flag
+
+Revision ID: b41d9e07c3a2
+Revises: 8f3b6d2c7e15
+Create Date: 2026-10-18 17:22:49.530611
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41d9e07c3a2'
+down_revision: Union[str, Sequence[str], None] = '8f3b6d2c7e15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # SQLite can't ADD COLUMN with a CURRENT_TIMESTAMP default, hence the table copy
+    with op.batch_alter_table("users", recreate="always") as batch_op:
+        batch_op.add_column(sa.Column("is_active", sa.Boolean(), nullable=False, server_default=sa.true()))
+        batch_op.add_column(sa.Column("updated_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now()))
+    op.execute("UPDATE users SET updated_at = created_at")
+    op.create_index("ix_users_updated_at", "users", ["updated_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_users_updated_at", table_name="users")
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("updated_at")
+        batch_op.drop_column("is_active")
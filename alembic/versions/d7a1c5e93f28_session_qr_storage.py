@@ -0,0 +1,33 @@
+"""session qr storage
+
+Revision ID: d7a1c5e93f28
+Revises: b41d9e07c3a2
+Create Date: 2026-10-18 18:10:26.884017
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a1c5e93f28'
+down_revision: Union[str, Sequence[str], None] = 'b41d9e07c3a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("attendance_sessions", sa.Column("qr_image", sa.LargeBinary(), nullable=True))
+    op.add_column("attendance_sessions", sa.Column("qr_rotation_seconds", sa.Integer(), nullable=True))
+    # Existing sessions point at files that were never written; the endpoint renders them on demand
+    op.execute("UPDATE attendance_sessions SET qr_code = '/sessions/' || session_id || '/qr'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("attendance_sessions") as batch_op:
+        batch_op.drop_column("qr_rotation_seconds")
+        batch_op.drop_column("qr_image")
@@ -0,0 +1,30 @@
+"""session geofence
+
+Revision ID: eb74d37733c5
+Revises: 63d367542a45
+Create Date: 2026-10-18 11:40:02.915377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'eb74d37733c5'
+down_revision: Union[str, Sequence[str], None] = '63d367542a45'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("attendance_sessions") as batch_op:
+        batch_op.add_column(sa.Column("geofence", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("attendance_sessions") as batch_op:
+        batch_op.drop_column("geofence")
@@ -1,10 +1,15 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from datetime import datetime, timedelta, timezone
-from jose import jwt, JWTError
+from functools import lru_cache
+from jose import jwk, jwt, JWTError
 from passlib.context import CryptContext
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db, get_db
 from app import models
+from app.repositories import UserRepository
+from app.utils.auth_cache import UserState, user_state, user_state_cache
+from app.utils.executors import password_executor
 import os
 from dotenv import load_dotenv
 load_dotenv()
@@ -16,9 +21,18 @@ JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 
+# claims: trust the role/email signed into the token unless the user is in
+# the recently-changed set (see UserStateCache); no query per request.
+# database: look the user up on every request.
+AUTH_VERIFY_MODE = os.getenv("AUTH_VERIFY_MODE", "claims")
+
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Each +1 doubles the cost; lower it for tests, raise it as hardware gets faster.
+# Hashes made at another cost are redone on the user's next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 def hash_password(password: str):
     return pwd_context.hash(password)
@@ -26,39 +40,103 @@ def hash_password(password: str):
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
+async def hash_password_async(password: str):
+    return await password_executor.run(pwd_context.hash, password)
+
+async def verify_password_async(plain_password, hashed_password):
+    """
+    (matches, new_hash) on the password pool; new_hash is set when the
+    stored hash is outdated (other scheme or cost) and should replace it.
+    """
+    return await password_executor.run(pwd_context.verify_and_update, plain_password, hashed_password)
+
+@lru_cache(maxsize=4)
+def _jwt_key(secret, algorithm):
+    # python-jose would otherwise try json.loads on the secret and build a
+    # new key object for every encode/decode
+    return jwk.construct(secret, algorithm)
+
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(hours=1)):
     to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + expires_delta
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+    now = datetime.now(timezone.utc)
+    to_encode.update({"iat": now, "exp": now + expires_delta})
+    return jwt.encode(to_encode, _jwt_key(JWT_SECRET_KEY, JWT_ALGORITHM), algorithm=JWT_ALGORITHM)
+
+def access_token_claims(user):
+    """
+    Everything get_current_user returns, so it can be served from the token.
+    """
+    return {
+        "sub": str(user.user_id),
+        "user_id": user.user_id,
+        "role": user.role,
+        "email": user.email,
+    }
 
 def decode_access_token(token: str):
-    return jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+    return jwt.decode(token, _jwt_key(JWT_SECRET_KEY, JWT_ALGORITHM), algorithms=[JWT_ALGORITHM])
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: models.AttendanceSession = Depends(get_db)
-):
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _token_payload(token: str):
     try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+        payload = decode_access_token(token)
+        payload["user_id"] = int(payload["sub"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        raise _credentials_exception()
+    return payload
+
+def _current_user(user_id, state):
+    if not state.is_active:
+        raise _credentials_exception()
+    return {
+        "user_id": user_id,
+        "role": state.role,
+        "email": state.email
+    }
+
+def _trusts_claims(payload):
+    # Tokens signed before role/email were claims still need the lookup
+    return AUTH_VERIFY_MODE == "claims" and user_state_cache.ready and "role" in payload and "email" in payload
 
-    user = db.query(models.User).filter(models.User.user_id == user_id).first()
-    if not user:
-        raise credentials_exception
+def _user_from_claims(payload):
+    state = user_state_cache.get(payload["user_id"])
+    if state is None:
+        state = UserState(True, payload["role"], payload["email"])
+    return _current_user(payload["user_id"], state)
+
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: models.AttendanceSession = Depends(get_db)
+):
+    payload = _token_payload(token)
+    if AUTH_VERIFY_MODE == "claims" and user_state_cache.claim_refresh():
+        user_state_cache.refresh(db)
+    if _trusts_claims(payload):
+        return _user_from_claims(payload)
 
+    user = db.get(models.User, payload["user_id"])
     # Return a dict with user_id and role so routes like create_session can access them
-    return {
-        "user_id": user.user_id,
-        "role": user.role,
-        "email": user.email
-    }
\ No newline at end of file
+    return _current_user(payload["user_id"], user_state(user))
+
+
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    get_current_user for async routes; the user lookup doesn't take a threadpool slot.
+    """
+    payload = _token_payload(token)
+    if AUTH_VERIFY_MODE == "claims" and user_state_cache.claim_refresh():
+        await db.run_sync(user_state_cache.refresh)
+    if _trusts_claims(payload):
+        return _user_from_claims(payload)
+
+    user = await UserRepository(db).get(payload["user_id"])
+    return _current_user(payload["user_id"], user_state(user))
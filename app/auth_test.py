@@ -0,0 +1,20 @@
+import asyncio
+
+from passlib.context import CryptContext
+
+from app import auth
+
+
+def test_outdated_hash_is_replaced_on_verify():
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("secret")
+    current = auth.pwd_context.hash("secret")
+
+    matches, new_hash = asyncio.run(auth.verify_password_async("secret", old_hash))
+    assert matches and new_hash and not auth.pwd_context.needs_update(new_hash)
+    assert asyncio.run(auth.verify_password_async("secret", current)) == (True, None)
+    assert asyncio.run(auth.verify_password_async("wrong", old_hash)) == (False, None)
+
+
+def test_hash_password_async_round_trips():
+    hashed = asyncio.run(auth.hash_password_async("secret"))
+    assert auth.verify_password("secret", hashed)
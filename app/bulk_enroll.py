@@ -0,0 +1,71 @@
+"""
+Bulk enrollment from the command line, without going through the API.
+
+    python -m app.bulk_enroll users.csv [faces.zip] [--rounds 10]
+    python -m app.bulk_enroll --resume JOB_ID
+    python -m app.bulk_enroll --status JOB_ID
+
+The CSV has full_name, email, role and password columns, optionally
+matric_number and image (a file name in the zip). Progress is stored in
+enrollment_jobs, so a run that is interrupted (Ctrl-C, crash) continues
+with --resume. Running API workers see the new users' faces in /identify
+after a restart.
+"""
+import argparse
+import json
+import sys
+
+from app.database import SessionLocal
+from app.utils.bulk_enrollment import (
+    ENROLLMENT_BCRYPT_ROUNDS, EnrollmentError, create_job, job_status, run_job,
+)
+
+
+def print_progress(job, users):
+    print(f"job {job.job_id}: {job.processed_rows}/{job.total_rows} rows, "
+          f"{job.succeeded} enrolled, {job.failed} failed", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enroll users from a CSV and a zip of photos")
+    parser.add_argument("csv", nargs="?")
+    parser.add_argument("archive", nargs="?")
+    parser.add_argument("--resume", type=int, metavar="JOB_ID")
+    parser.add_argument("--status", type=int, metavar="JOB_ID")
+    parser.add_argument("--rounds", type=int, default=ENROLLMENT_BCRYPT_ROUNDS, help="bcrypt cost for the new hashes")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.status is not None:
+            print(json.dumps(job_status(db, args.status), default=str, indent=2))
+            return
+        job_id = args.resume
+        if job_id is None:
+            if not args.csv:
+                parser.error("a CSV file (or --resume/--status) is required")
+            archive = open(args.archive, "rb") if args.archive else None
+            try:
+                with open(args.csv, "rb") as csv_file:
+                    job_id = create_job(db, csv_file, archive).job_id
+            except EnrollmentError as e:
+                parser.error(str(e))
+            finally:
+                if archive is not None:
+                    archive.close()
+            db.commit()
+            print(f"created enrollment job {job_id}", file=sys.stderr)
+    finally:
+        db.close()
+
+    try:
+        status = run_job(SessionLocal, job_id, rounds=args.rounds, on_batch=print_progress)
+    except EnrollmentError as e:
+        parser.error(str(e))
+    print(json.dumps(status, default=str, indent=2))
+    if status["status"] != "completed":
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,138 @@
-from fastapi import FastAPI
-from app.routes import attendance_routes, auth_routes, session_routes
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
 
-app = FastAPI()
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from app.database import SessionLocal, async_engine
+from app.routes import admin_routes, attendance_routes, auth_routes, session_routes
+from app.utils.auth_cache import user_state_cache
+from app.utils.bulk_enrollment import enrollment_runner
+from app.utils.executors import ExecutorSaturated, face_executor, io_executor, password_executor
+from app.utils.embedding_cache import embedding_cache
+from app.utils.embedding_index import embedding_index
+from app.utils.face_batcher import face_batcher
+from app.utils.face_model import face_model, warm_up
+from app.utils.image_preprocess import preprocess_stats
+from app.utils.job_queue import job_queue
+from app.utils.live_events import live_events
+from app.utils.session_qr import require_secret
+from app.utils.session_registry import session_registry
+from app.utils.timetable import ensure_window_job
+from app.utils.vpn_check import vpn_checker
+from app.utils.write_behind import ATTENDANCE_WRITE_MODE, WriteBehindFull, write_behind
+
+logger = logging.getLogger(__name__)
+
+FACE_MODEL_PRELOAD = os.getenv("FACE_MODEL_PRELOAD", "1") == "1"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    require_secret()
+    # Build and warm the face model before accepting traffic so the first
+    # check-in doesn't pay for the TensorFlow graph build. With a process
+    # pool this warms one worker; the others warm in their initializer.
+    if FACE_MODEL_PRELOAD:
+        try:
+            await face_executor.run(warm_up)
+        except Exception as e:
+            if face_executor.kind == "process":
+                # The workers' initializer failed: no face request could succeed
+                raise RuntimeError(f"Face worker processes failed to start: {e}") from e
+            logger.error("Face model warm-up failed: %s", e)
+    await face_batcher.start()
+    await io_executor.run(_build_embedding_index)
+    await io_executor.run(_load_session_registry)
+    await session_registry.start()
+    if ATTENDANCE_WRITE_MODE == "write_behind":
+        # Replays any events a crash left in the log before serving; live
+        # counts follow the writer's commits
+        write_behind.on_commit = live_events.threadsafe_publisher(asyncio.get_running_loop())
+        await io_executor.run(write_behind.start)
+    # Enrollment embeddings left queued (or mid-run) by the last process resume
+    # here, as does the job that rolls the timetable window forward
+    await io_executor.run(_ensure_timetable_job)
+    job_queue.start()
+    yield
+    await io_executor.run(job_queue.stop)
+    session_registry.stop()
+    await io_executor.run(write_behind.stop)
+    await face_batcher.stop()
+    await vpn_checker.aclose()
+    face_executor.shutdown()
+    io_executor.shutdown()
+    password_executor.shutdown()
+    enrollment_runner.shutdown()
+    await async_engine.dispose()
+
+
+def _build_embedding_index():
+    db = SessionLocal()
+    try:
+        count = embedding_index.build(db)
+        logger.info("Embedding index built with %d users", count)
+    finally:
+        db.close()
+
+
+def _ensure_timetable_job():
+    db = SessionLocal()
+    try:
+        ensure_window_job(db)
+    finally:
+        db.close()
+
+
+def _load_session_registry():
+    db = SessionLocal()
+    try:
+        count = session_registry.load(db)
+        logger.info("Session registry loaded %d open sessions", count)
+    finally:
+        db.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturated):
+    return JSONResponse(status_code=503, content={"detail": "Server busy, try again"}, headers={"Retry-After": "1"})
+
+@app.exception_handler(WriteBehindFull)
+async def write_behind_full_handler(request: Request, exc: WriteBehindFull):
+    return JSONResponse(status_code=503, content={"detail": "Attendance backlog full, try again"}, headers={"Retry-After": "1"})
 
 # Include routes
 app.include_router(attendance_routes.router, prefix="/attendance", tags=["Attendance"])
 app.include_router(auth_routes.router, prefix="/auth", tags=["Authentication"])
 app.include_router(session_routes.router, prefix="/sessions", tags=["Sessions"])
+app.include_router(admin_routes.router, prefix="/admin", tags=["Admin"])
 
 @app.get("/")
 def root():
     return {"message": "Welcome to Attendly API"}
+
+@app.get("/health")
+def health():
+    return {
+        "status": "ok",
+        "face_model": face_model.stats(),
+        "face_batcher": face_batcher.stats(),
+        "preprocess": preprocess_stats.stats(),
+        "auth": user_state_cache.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "enrollment": enrollment_runner.stats(),
+        "jobs": job_queue.stats(),
+        "embedding_index": embedding_index.stats(),
+        "sessions": session_registry.stats(),
+        "live_events": live_events.stats(),
+        "vpn_check": vpn_checker.stats(),
+        "write_behind": write_behind.stats(),
+        "executors": {
+            "face": face_executor.stats(),
+            "io": io_executor.stats(),
+            "password": password_executor.stats(),
+        },
+    }
@@ -1,7 +1,15 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, TIMESTAMP, UniqueConstraint, func
+from sqlalchemy import Column, Date, Integer, String, Float, Boolean, ForeignKey, Index, LargeBinary, Text, Time, TIMESTAMP, UniqueConstraint, func, true
+from datetime import datetime, timezone
+
 from sqlalchemy.orm import relationship
 from .database import Base
 
+
+def utcnow():
+    # Set in Python as well as by the server so SQLite stores microseconds
+    # in one format everywhere; keyset cursors compare these values
+    return datetime.now(timezone.utc)
+
 class User(Base):
     __tablename__ = "users"
     user_id = Column(Integer, primary_key=True, index=True)
@@ -9,9 +17,24 @@ class User(Base):
     email = Column(String, unique=True, nullable=False)
     password_hash = Column(String, nullable=False)
     role = Column(String, nullable=False)
-    face_embedding = Column(String, nullable=True)
+    # Raw embedding bytes; NULL for roles without a face (admins)
+    face_embedding = Column(LargeBinary, nullable=True)
+    embedding_dtype = Column(String, nullable=True)
+    embedding_model = Column(String, nullable=True)
+    embedding_version = Column(Integer, nullable=True)
     matric_number = Column(String, nullable=True)
-    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    is_active = Column(Boolean, nullable=False, default=True, server_default=true())
+    created_at = Column(TIMESTAMP(timezone=True), default=utcnow, server_default=func.now())
+    # Bumped on every ORM update; token verification reloads users changed recently
+    updated_at = Column(TIMESTAMP(timezone=True), default=utcnow, onupdate=utcnow, server_default=func.now())
+    # pending while a job computes face_embedding (see utils/enrollment_jobs.py), then complete or failed
+    enrollment_status = Column(String, nullable=False, default="complete", server_default="complete")
+    enrollment_job_id = Column(Integer, ForeignKey("jobs.job_id"), nullable=True)
+    __table_args__ = (
+        Index("ix_users_created", "created_at", "user_id"),
+        Index("ix_users_updated_at", "updated_at"),
+        Index("ix_users_role_created", "role", "created_at", "user_id"),
+    )
 
 class AttendanceSession(Base):
     __tablename__ = "attendance_sessions"
@@ -20,11 +43,49 @@ class AttendanceSession(Base):
     title = Column(String, nullable=False)
     start_time = Column(TIMESTAMP(timezone=True), nullable=False)
     end_time = Column(TIMESTAMP(timezone=True), nullable=False)
+    # Path of the QR endpoint; the PNG of the static payload is kept in qr_image
     qr_code = Column(String, nullable=False)
+    qr_image = Column(LargeBinary, nullable=True)
+    # Set: the QR encodes an HMAC token that changes every this many seconds
+    qr_rotation_seconds = Column(Integer, nullable=True)
     gps_lat = Column(Float)
     gps_lon = Column(Float)
     allowed_radius = Column(Integer, default=100)
-    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    # Optional polygon as a JSON list of [lat, lon]; takes precedence over the circle
+    geofence = Column(Text, nullable=True)
+    # Set for occurrences generated from a recurring schedule (see utils/timetable.py)
+    schedule_id = Column(Integer, ForeignKey("recurring_schedules.schedule_id"), nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), default=utcnow, server_default=func.now())
+    __table_args__ = (
+        Index("ix_attendance_sessions_created", "created_at", "session_id"),
+        Index("ix_attendance_sessions_creator_created", "created_by", "created_at", "session_id"),
+        # One occurrence per schedule and start; makes regenerating a range harmless
+        UniqueConstraint("schedule_id", "start_time", name="_schedule_start_uc"),
+    )
+
+class RecurringSchedule(Base):
+    __tablename__ = "recurring_schedules"
+    schedule_id = Column(Integer, primary_key=True)
+    created_by = Column(Integer, ForeignKey("users.user_id"), nullable=True)
+    title = Column(String, nullable=False)
+    # Comma-separated ISO weekdays (1 = Monday); start_time is wall-clock time in `timezone`
+    weekdays = Column(String, nullable=False)
+    start_time = Column(Time, nullable=False)
+    duration_minutes = Column(Integer, nullable=False)
+    timezone = Column(String, nullable=False, default="UTC")
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    # JSON list of ISO dates with no session (holidays, reading week)
+    exceptions = Column(Text, nullable=True)
+    # Template copied onto every generated session
+    gps_lat = Column(Float)
+    gps_lon = Column(Float)
+    allowed_radius = Column(Integer, default=100)
+    geofence = Column(Text, nullable=True)
+    qr_rotation_seconds = Column(Integer, nullable=True)
+    # Sessions exist for every occurrence up to and including this date
+    materialized_through = Column(Date, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), default=utcnow, server_default=func.now())
 
 class AttendanceRecord(Base):
     __tablename__ = "attendance_records"
@@ -37,4 +98,83 @@ class AttendanceRecord(Base):
     gps_lon = Column(Float)
     vpn_detected = Column(Boolean, default=False)
     face_match_score = Column(Float)
-    __table_args__ = (UniqueConstraint("session_id", "user_id", name="_user_session_uc"),)
+    created_at = Column(TIMESTAMP(timezone=True), default=utcnow, server_default=func.now())
+    __table_args__ = (
+        UniqueConstraint("session_id", "user_id", name="_user_session_uc"),
+        Index("ix_attendance_records_check_in_time", "check_in_time"),
+        # Keyset pagination: newest first, optionally within a session or user
+        Index("ix_attendance_records_created", "created_at", "record_id"),
+        Index("ix_attendance_records_session_created", "session_id", "created_at", "record_id"),
+        Index("ix_attendance_records_user_created", "user_id", "created_at", "record_id"),
+    )
+
+# Rollups of attendance_records, bumped in the same transaction as each
+# check-in (see utils/attendance_store.py); days are UTC dates
+
+class AttendanceDailyRollup(Base):
+    __tablename__ = "attendance_daily_rollups"
+    day = Column(Date, primary_key=True)
+    check_ins = Column(Integer, nullable=False, default=0)
+
+class AttendanceSessionRollup(Base):
+    __tablename__ = "attendance_session_rollups"
+    day = Column(Date, primary_key=True)
+    session_id = Column(Integer, ForeignKey("attendance_sessions.session_id"), primary_key=True)
+    check_ins = Column(Integer, nullable=False, default=0)
+
+class AttendanceUserRollup(Base):
+    __tablename__ = "attendance_user_rollups"
+    user_id = Column(Integer, ForeignKey("users.user_id"), primary_key=True)
+    check_ins = Column(Integer, nullable=False, default=0)
+    last_check_in = Column(TIMESTAMP(timezone=True))
+
+# Bulk enrollment (see utils/bulk_enrollment.py): one job per uploaded CSV,
+# one row per CSV line handled, so an interrupted job resumes where it stopped
+
+class EnrollmentJob(Base):
+    __tablename__ = "enrollment_jobs"
+    job_id = Column(Integer, primary_key=True)
+    created_by = Column(Integer, ForeignKey("users.user_id"), nullable=True)
+    # queued -> running -> completed | failed
+    status = Column(String, nullable=False, default="queued")
+    total_rows = Column(Integer, nullable=False, default=0)
+    processed_rows = Column(Integer, nullable=False, default=0)
+    succeeded = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), default=utcnow, server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), default=utcnow, onupdate=utcnow, server_default=func.now())
+    finished_at = Column(TIMESTAMP(timezone=True), nullable=True)
+
+class EnrollmentJobRow(Base):
+    __tablename__ = "enrollment_job_rows"
+    job_id = Column(Integer, ForeignKey("enrollment_jobs.job_id"), primary_key=True)
+    row_number = Column(Integer, primary_key=True)
+    email = Column(String, nullable=True)
+    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=True)
+    # NULL when the user was created
+    error = Column(Text, nullable=True)
+
+# Persistent background work (see utils/job_queue.py); workers claim rows with
+# a lease, so a job whose worker died is picked up again after locked_until
+
+class Job(Base):
+    __tablename__ = "jobs"
+    job_id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    payload = Column(Text, nullable=True)  # JSON
+    data = Column(LargeBinary, nullable=True)  # e.g. an uploaded photo; cleared once the job finishes
+    # queued -> running -> done | failed (running again after an expired lease or a retry)
+    status = Column(String, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(TIMESTAMP(timezone=True), nullable=False, default=utcnow)
+    locked_until = Column(TIMESTAMP(timezone=True), nullable=True)
+    locked_by = Column(String, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), default=utcnow, server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), default=utcnow, onupdate=utcnow, server_default=func.now())
+    finished_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    __table_args__ = (
+        Index("ix_jobs_claim", "status", "run_after"),
+    )
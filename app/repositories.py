@@ -0,0 +1,125 @@
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import AttendanceRecord, AttendanceSession, User
+from app.utils.attendance_store import upsert_attendance_async
+from app.utils.pagination import DEFAULT_PAGE_SIZE, keyset_page, page_result
+
+
+def _created_between(query, column, created_after, created_before):
+    if created_after is not None:
+        query = query.where(column >= created_after)
+    if created_before is not None:
+        query = query.where(column < created_before)
+    return query
+
+
+class UserRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get(self, user_id):
+        return await self.db.get(User, user_id)
+
+    async def get_by_email(self, email):
+        result = await self.db.execute(select(User).where(User.email == email))
+        return result.scalars().first()
+
+    async def get_face_embedding(self, user_id):
+        """
+        Just the (face_embedding, embedding_dtype, enrollment_status) columns,
+        or None if the user doesn't exist.
+        """
+        result = await self.db.execute(
+            select(User.face_embedding, User.embedding_dtype, User.enrollment_status).where(User.user_id == user_id)
+        )
+        return result.first()
+
+    async def list(self, cursor=None, limit=DEFAULT_PAGE_SIZE, role=None, created_after=None, created_before=None):
+        """
+        (users, next_cursor), newest first; see keyset_page.
+        """
+        query = select(User)
+        if role is not None:
+            query = query.where(User.role == role)
+        query = _created_between(query, User.created_at, created_after, created_before)
+        result = await self.db.execute(keyset_page(query, User.created_at, User.user_id, cursor, limit))
+        return page_result(result.scalars().all(), limit, "created_at", "user_id")
+
+
+class SessionRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get(self, session_id):
+        return await self.db.get(AttendanceSession, session_id)
+
+    async def get_qr_image(self, session_id):
+        result = await self.db.execute(
+            select(AttendanceSession.qr_image).where(AttendanceSession.session_id == session_id)
+        )
+        return result.scalar()
+
+    async def add(self, session):
+        """
+        Inserts a session and flushes it so session_id is set; the caller commits.
+        """
+        self.db.add(session)
+        await self.db.flush()
+        return session
+
+    async def list(self, cursor=None, limit=DEFAULT_PAGE_SIZE, created_by=None, created_after=None, created_before=None):
+        query = select(AttendanceSession)
+        if created_by is not None:
+            query = query.where(AttendanceSession.created_by == created_by)
+        query = _created_between(query, AttendanceSession.created_at, created_after, created_before)
+        result = await self.db.execute(
+            keyset_page(query, AttendanceSession.created_at, AttendanceSession.session_id, cursor, limit)
+        )
+        return page_result(result.scalars().all(), limit, "created_at", "session_id")
+
+
+class AttendanceRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get(self, session_id, user_id):
+        result = await self.db.execute(
+            select(AttendanceRecord).where(
+                AttendanceRecord.session_id == session_id, AttendanceRecord.user_id == user_id
+            )
+        )
+        return result.scalars().first()
+
+    async def counts(self, session_id):
+        """
+        (check_ins, check_outs) of a session; served by the (session_id, user_id) unique index.
+        """
+        result = await self.db.execute(
+            select(func.count(), func.count(AttendanceRecord.check_out_time)).where(
+                AttendanceRecord.session_id == session_id
+            )
+        )
+        return tuple(result.one())
+
+    async def list(
+        self, cursor=None, limit=DEFAULT_PAGE_SIZE, session_id=None, user_id=None, created_after=None, created_before=None
+    ):
+        query = select(AttendanceRecord)
+        if session_id is not None:
+            query = query.where(AttendanceRecord.session_id == session_id)
+        if user_id is not None:
+            query = query.where(AttendanceRecord.user_id == user_id)
+        query = _created_between(query, AttendanceRecord.created_at, created_after, created_before)
+        result = await self.db.execute(
+            keyset_page(query, AttendanceRecord.created_at, AttendanceRecord.record_id, cursor, limit)
+        )
+        return page_result(result.scalars().all(), limit, "created_at", "record_id")
+
+    async def toggle(self, session_id, user_id, latitude, longitude, score, vpn_detected=False, now=None):
+        """
+        Check-in or check-out in one upsert (see upsert_attendance); the caller commits.
+        """
+        return await upsert_attendance_async(
+            self.db, session_id, user_id, latitude, longitude, score, vpn_detected, now
+        )
@@ -0,0 +1,100 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.database import Base, create_async_db_engine
+from app.models import AttendanceSession, User
+from app.repositories import AttendanceRepository, SessionRepository, UserRepository
+
+
+def run_with_db(tmp_path, body):
+    async def run():
+        engine = create_async_db_engine(f"sqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+                return await body(db)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+def test_user_lookups(tmp_path):
+    async def body(db):
+        db.add(User(full_name="Ada", email="ada@example.com", password_hash="x", role="student", face_embedding=b"\x00" * 8, embedding_dtype="float32"))
+        await db.commit()
+        users = UserRepository(db)
+        user = await users.get_by_email("ada@example.com")
+        assert user.full_name == "Ada"
+        assert (await users.get(user.user_id)).email == "ada@example.com"
+        assert tuple(await users.get_face_embedding(user.user_id)) == (b"\x00" * 8, "float32", "complete")
+        assert await users.get_face_embedding(999) is None
+        assert await users.get_by_email("nobody@example.com") is None
+
+    run_with_db(tmp_path, body)
+
+
+def test_session_add_and_attendance_toggle(tmp_path):
+    async def body(db):
+        now = datetime.now(timezone.utc)
+        session = await SessionRepository(db).add(
+            AttendanceSession(title="CSC 101", start_time=now, end_time=now + timedelta(hours=1), qr_code="")
+        )
+        assert session.session_id is not None
+        await db.commit()
+
+        records = AttendanceRepository(db)
+        assert await records.toggle(session.session_id, 1, 6.52, 3.37, 0.9) == "check_in"
+        assert await records.toggle(session.session_id, 1, 6.52, 3.37, 0.8) == "check_out"
+        await db.commit()
+        record = await records.get(session.session_id, 1)
+        assert record.check_out_time is not None and record.face_match_score == 0.8
+
+    run_with_db(tmp_path, body)
+
+
+def test_keyset_listing_walks_every_row_once(tmp_path):
+    async def body(db):
+        now = datetime.now(timezone.utc)
+        # Three sessions share a created_at, so the id breaks the tie
+        for i in range(7):
+            db.add(AttendanceSession(
+                title=f"S{i}", created_by=1 + i % 2, start_time=now, end_time=now, qr_code="",
+                created_at=now - timedelta(minutes=0 if i < 3 else i),
+            ))
+        await db.commit()
+        sessions = SessionRepository(db)
+
+        seen, cursor = [], None
+        while True:
+            page, cursor = await sessions.list(cursor=cursor, limit=2)
+            seen += [s.session_id for s in page]
+            if cursor is None:
+                break
+        assert seen == [3, 2, 1, 4, 5, 6, 7]
+
+        page, cursor = await sessions.list(created_by=2, limit=10)
+        assert [s.session_id for s in page] == [2, 4, 6] and cursor is None
+        page, _ = await sessions.list(created_after=now - timedelta(minutes=5), created_before=now)
+        assert [s.session_id for s in page] == [4, 5, 6]
+
+    run_with_db(tmp_path, body)
+
+
+def test_record_listing_filters(tmp_path):
+    async def body(db):
+        records = AttendanceRepository(db)
+        for session_id, user_id in [(1, 1), (1, 2), (2, 1)]:
+            await records.toggle(session_id, user_id, 6.52, 3.37, 0.9)
+        await db.commit()
+
+        page, cursor = await records.list()
+        assert [(r.session_id, r.user_id) for r in page] == [(2, 1), (1, 2), (1, 1)] and cursor is None
+        assert all(r.created_at is not None for r in page)
+        page, _ = await records.list(session_id=1, user_id=2)
+        assert [(r.session_id, r.user_id) for r in page] == [(1, 2)]
+
+    run_with_db(tmp_path, body)
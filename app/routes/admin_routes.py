@@ -1,40 +1,65 @@
 # routes/admin_routes.py
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from database import get_db
-from models import User, AttendanceRecord, AttendanceSession
-from datetime import date, datetime
+from app import auth, schemas
+from app.database import get_async_db, get_db
+from app.models import (
+    User, AttendanceRecord, AttendanceSession,
+    AttendanceDailyRollup, AttendanceSessionRollup, AttendanceUserRollup,
+)
+from app.repositories import AttendanceRepository, SessionRepository, UserRepository
+from app.utils.attendance_store import day_bounds, rebuild_rollups
+from app.utils.auth_cache import user_state_cache
+from app.utils.bulk_enrollment import EnrollmentError, create_job, enrollment_runner, job_status
+from app.utils.embedding_cache import embedding_cache
+from app.utils.embedding_index import embedding_index
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursor
+from datetime import date, datetime, timezone
 from sqlalchemy import func
 
 router = APIRouter()
 
+
+def require_admin(current_user: dict = Depends(auth.get_current_user)):
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view the dashboard")
+    return current_user
+
+
+# Dashboard counts come from the rollup tables (one row per day / session-day / user),
+# so a refresh costs O(days), not O(attendance_records)
+
 @router.get("/dashboard/summary")
-def get_attendance_summary(db: Session = Depends(get_db)):
+def get_attendance_summary(db: Session = Depends(get_db), current_user: dict = Depends(require_admin)):
     try:
-        today = date.today()
+        today = datetime.now(timezone.utc).date()
+        start, end = day_bounds(today)
 
         # Total students/employees present today
-        total_present = db.query(AttendanceRecord).filter(
-            func.date(AttendanceRecord.check_in_time) == today
-        ).count()
+        total_present = db.query(AttendanceDailyRollup.check_ins).filter(
+            AttendanceDailyRollup.day == today
+        ).scalar() or 0
 
-        # List of all students with check-in and check-out times
+        # List of all students with check-in and check-out times (range predicate uses the check_in_time index)
         present_list = db.query(
             User.full_name,
             User.matric_number,
             AttendanceRecord.check_in_time,
             AttendanceRecord.check_out_time
         ).join(User, User.user_id == AttendanceRecord.user_id).filter(
-            func.date(AttendanceRecord.check_in_time) == today
+            AttendanceRecord.check_in_time >= start,
+            AttendanceRecord.check_in_time < end
         ).all()
 
         # Attendance by session
         session_attendance = db.query(
-            AttendanceSession.session_name,
-            func.count(AttendanceRecord.record_id).label("count")
-        ).join(AttendanceRecord, AttendanceSession.session_id == AttendanceRecord.session_id).filter(
-            func.date(AttendanceRecord.check_in_time) == today
-        ).group_by(AttendanceSession.session_name).all()
+            AttendanceSession.title,
+            AttendanceSessionRollup.check_ins
+        ).join(AttendanceSession, AttendanceSession.session_id == AttendanceSessionRollup.session_id).filter(
+            AttendanceSessionRollup.day == today
+        ).all()
 
         return {
             "date": today.isoformat(),
@@ -59,16 +84,14 @@ def get_attendance_summary(db: Session = Depends(get_db)):
 
 
 @router.get("/dashboard/analytics")
-def get_attendance_analytics(db: Session = Depends(get_db)):
+def get_attendance_analytics(db: Session = Depends(get_db), current_user: dict = Depends(require_admin)):
     try:
         total_students = db.query(User).count()
-        total_records = db.query(AttendanceRecord).count()
+        total_records = db.query(func.coalesce(func.sum(AttendanceDailyRollup.check_ins), 0)).scalar()
         last_7_days = db.query(
-            func.date(AttendanceRecord.check_in_time),
-            func.count(AttendanceRecord.record_id)
-        ).group_by(func.date(AttendanceRecord.check_in_time)).order_by(
-            func.date(AttendanceRecord.check_in_time).desc()
-        ).limit(7).all()
+            AttendanceDailyRollup.day,
+            AttendanceDailyRollup.check_ins
+        ).order_by(AttendanceDailyRollup.day.desc()).limit(7).all()
 
         return {
             "total_students": total_students,
@@ -80,3 +103,176 @@ def get_attendance_analytics(db: Session = Depends(get_db)):
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/dashboard/users/{user_id}")
+def get_user_attendance(user_id: int, db: Session = Depends(get_db), current_user: dict = Depends(require_admin)):
+    rollup = db.get(AttendanceUserRollup, user_id)
+    return {
+        "user_id": user_id,
+        "check_ins": rollup.check_ins if rollup else 0,
+        "last_check_in": rollup.last_check_in.isoformat() if rollup and rollup.last_check_in else None
+    }
+
+
+@router.post("/dashboard/rebuild-rollups")
+def rebuild_attendance_rollups(
+    since: date = None,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(require_admin)
+):
+    """
+    Recomputes the rollups from attendance_records (all time, or from `since`).
+    """
+    rebuild_rollups(db, since)
+    db.commit()
+    return {"status": "success", "since": since.isoformat() if since else None}
+
+
+# Paginated listings: pass next_cursor back as ?cursor= for the following
+# (older) page. Keyset pages over (created_at, id) cost the same however deep
+# you go; created_after/created_before bound created_at as [after, before).
+
+def require_admin_async(current_user: dict = Depends(auth.get_current_user_async)):
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can list records")
+    return current_user
+
+
+async def _page(listing, **filters):
+    try:
+        items, next_cursor = await listing(**filters)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@router.get("/users", response_model=schemas.UserPage)
+async def list_users(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    role: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(require_admin_async)
+):
+    return await _page(
+        UserRepository(db).list, cursor=cursor, limit=limit, role=role,
+        created_after=created_after, created_before=created_before
+    )
+
+
+@router.patch("/users/{user_id}", response_model=schemas.UserOut)
+async def update_user(
+    user_id: int,
+    update: schemas.UserUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(require_admin_async)
+):
+    """
+    Changes a user's role or disables/re-enables the account. Tokens they
+    already hold follow within AUTH_CACHE_TTL_SECONDS on every worker
+    (immediately on this one).
+    """
+    user = await UserRepository(db).get(user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if update.role is not None:
+        user.role = update.role.lower().strip()
+    if update.is_active is not None:
+        user.is_active = update.is_active
+    await db.commit()
+    user_state_cache.put(user)
+    return user
+
+
+@router.get("/sessions", response_model=schemas.AttendanceSessionPage)
+async def list_sessions(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    created_by: Optional[int] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(require_admin_async)
+):
+    return await _page(
+        SessionRepository(db).list, cursor=cursor, limit=limit, created_by=created_by,
+        created_after=created_after, created_before=created_before
+    )
+
+
+@router.get("/records", response_model=schemas.AttendanceRecordPage)
+async def list_records(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    session_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(require_admin_async)
+):
+    return await _page(
+        AttendanceRepository(db).list, cursor=cursor, limit=limit, session_id=session_id, user_id=user_id,
+        created_after=created_after, created_before=created_before
+    )
+
+
+# Bulk enrollment: a CSV of users plus a zip of their photos, processed by a
+# background job; poll the job for progress and per-row errors
+
+def _publish_enrolled(job, users):
+    # What register does for one user, for a committed batch
+    for user in users:
+        embedding_cache.invalidate(user.user_id)
+        user_state_cache.put(user)
+        if user.face_embedding:
+            embedding_index.add(user.user_id, user.face_embedding, user.embedding_dtype)
+
+
+@router.post("/enrollments")
+def start_enrollment(
+    users_csv: UploadFile = File(..., description="full_name,email,role,password[,matric_number][,image]"),
+    faces_zip: UploadFile = File(None, description="Photos named in the CSV's image column"),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(require_admin)
+):
+    try:
+        job = create_job(db, users_csv.file, faces_zip.file if faces_zip else None, current_user["user_id"])
+    except EnrollmentError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    db.commit()
+    enrollment_runner.start(job.job_id, on_batch=_publish_enrolled)
+    return job_status(db, job.job_id)
+
+
+@router.get("/enrollments/{job_id}")
+def get_enrollment(
+    job_id: int,
+    errors_limit: int = Query(100, ge=0, le=10000),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(require_admin)
+):
+    status = job_status(db, job_id, errors_limit)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Enrollment job not found")
+    status["active"] = enrollment_runner.is_active(job_id)
+    return status
+
+
+@router.post("/enrollments/{job_id}/resume")
+def resume_enrollment(job_id: int, db: Session = Depends(get_db), current_user: dict = Depends(require_admin)):
+    """
+    Restarts an interrupted or failed job; rows already recorded are skipped.
+    """
+    status = job_status(db, job_id, errors_limit=0)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Enrollment job not found")
+    if status["status"] == "completed":
+        raise HTTPException(status_code=409, detail="Enrollment job already completed")
+    if not enrollment_runner.start(job_id, on_batch=_publish_enrolled):
+        raise HTTPException(status_code=409, detail="Enrollment job is already running")
+    return {"job_id": job_id, "status": "running"}
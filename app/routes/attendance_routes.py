@@ -1,17 +1,32 @@
 # app/routes/attendance_routes.py
+from datetime import date, datetime, timezone
+from typing import Literal, Optional
+
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.utils.face_recognition import verify_face
-from app.utils.gps_check import check_gps_location
-from app.utils.vpn_check import is_vpn
-from app.database import get_db
-from app.models import User, AttendanceRecord, AttendanceSession
-from datetime import datetime
-import numpy as np
-import cv2
+from app.utils import attendance_export
+from app.utils.face_recognition import extract_face_from_bytes, verify_normalized
+from app.utils.embedding_cache import embedding_cache
+from app.utils.embedding_index import embedding_index
+from app.utils.face_batcher import face_batcher
+from app.utils.executors import face_executor, io_executor
+from app.utils.image_preprocess import ImageTooLarge, read_upload
+from app.utils.live_events import live_events
+from app.utils.session_qr import verify_rotating_token
+from app.utils.session_registry import session_registry
+from app.utils.vpn_check import vpn_checker
+from app.utils.write_behind import ATTENDANCE_WRITE_MODE, AttendanceEvent, write_behind
+from app import auth
+from app.database import SessionLocal, get_async_db, get_db
+from app.repositories import AttendanceRepository, SessionRepository, UserRepository
 
 router = APIRouter()
 
+# Same cosine threshold verify_face uses for 1:1 checks
+MATCH_THRESHOLD = 0.4
+
 @router.post("/mark_attendance")
 async def mark_attendance(
     request: Request,
@@ -20,47 +35,82 @@ async def mark_attendance(
     latitude: float = Form(...),
     longitude: float = Form(...),
     image: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    qr_token: Optional[str] = Form(None, description="Scanned QR token; required for rotating-QR sessions"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # --- User
-    user = db.query(User).filter(User.user_id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    # --- Session
-    session = db.query(AttendanceSession).filter(AttendanceSession.session_id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-
-    # --- GPS check (use correct fields: gps_lat/gps_lon/allowed_radius)
-    if session.gps_lat is not None and session.gps_lon is not None and session.allowed_radius:
-        inside = check_gps_location(
-            float(latitude),
-            float(longitude),
-            float(session.gps_lat),
-            float(session.gps_lon),
-            radius_meters=int(session.allowed_radius)
-        )
-        if not inside:
-            raise HTTPException(status_code=403, detail="You are outside the allowed attendance radius")
-
-    # --- VPN check (best-effort; don’t block prototype if lookup fails)
+    # Outcomes go to live subscribers of the session (a no-op if nobody watches)
     try:
-        client_ip = request.client.host if request and request.client else ""
-        if client_ip and is_vpn(client_ip):
-            raise HTTPException(status_code=403, detail="VPN/Proxy usage detected")
-    except Exception:
-        pass
+        result = await process_check_in(request, session_id, user_id, latitude, longitude, image, db, qr_token)
+    except HTTPException as e:
+        live_events.publish_failure(session_id, user_id, e.detail)
+        raise
+    if result["action"] != "queued":
+        # Write-behind check-ins are published by the writer once committed,
+        # when the upsert knows whether they were a check-in or a check-out
+        live_events.publish_attendance(session_id, user_id, result["action"])
+    return result
+
+
+async def process_check_in(request, session_id, user_id, latitude, longitude, image, db, qr_token=None):
+    # Database access is async; face detection runs on the bounded executor
+    # so one slow check-in doesn't stall the event loop
+
+    # --- User (cached, normalized enrollment embedding; DB only on a miss).
+    # Every few seconds one worker-wide query drops users changed elsewhere
+    if embedding_cache.claim_sync():
+        await db.run_sync(embedding_cache.sync)
+    stored_embedding = embedding_cache.get(user_id)
+    if stored_embedding is None:
+        user = await UserRepository(db).get_face_embedding(user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        if user.enrollment_status == "pending":
+            raise HTTPException(status_code=409, detail="Face enrollment is still being processed, try again shortly")
+        if user.enrollment_status == "failed":
+            raise HTTPException(status_code=409, detail="Face enrollment failed, upload a new photo")
+        if user.face_embedding is None:
+            raise HTTPException(status_code=400, detail="No face enrolled for this user")
+        stored_embedding = embedding_cache.put(user_id, user.face_embedding, user.embedding_dtype or "float32")
+
+    # --- Session (registry of open sessions; DB only on a miss)
+    session = session_registry.get(session_id)
+    if session is None:
+        row = await SessionRepository(db).get(session_id)
+        if not row:
+            raise HTTPException(status_code=404, detail="Session not found")
+        session = session_registry.add(row)
+
+    status = session.status()
+    if status == "upcoming":
+        raise HTTPException(status_code=403, detail="Session has not started yet")
+    if status == "ended":
+        raise HTTPException(status_code=403, detail="Session has ended")
 
-    # --- Decode uploaded image into OpenCV
-    image_bytes = await image.read()
-    np_arr = np.frombuffer(image_bytes, np.uint8)
-    frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-    if frame is None:
-        raise HTTPException(status_code=400, detail="Invalid image")
+    # --- Rotating QR: the scanned token must be from the last few seconds (one HMAC)
+    if session.qr_rotation_seconds and not verify_rotating_token(
+        qr_token, session_id, session.qr_rotation_seconds
+    ):
+        raise HTTPException(status_code=403, detail="QR code expired or invalid, scan it again")
 
-    # --- Face verification
-    match, score = verify_face(frame, user.face_embedding)
+    # --- GPS check (polygon geofence if the session has one, else gps_lat/gps_lon/allowed_radius)
+    if session.zone is not None and not session.zone.contains_point(float(latitude), float(longitude)):
+        raise HTTPException(status_code=403, detail="You are outside the allowed attendance radius")
+
+    # --- VPN check (cached + coalesced; VPN_FAIL_MODE decides when the provider is down)
+    client_ip = request.client.host if request and request.client else ""
+    if client_ip and await vpn_checker.is_vpn(client_ip):
+        raise HTTPException(status_code=403, detail="VPN/Proxy usage detected")
+
+    # --- Face verification (decode + detection per request, inference batched across requests)
+    try:
+        image_bytes = await read_upload(image)
+        face = await face_executor.run(extract_face_from_bytes, image_bytes)
+        current_embedding = await face_batcher.embed(face)
+        match, score = verify_normalized(current_embedding, stored_embedding)
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     # Convert NumPy types (e.g., np.float32) to native Python float to avoid 500
     try:
         score = float(score) if score is not None else 0.0
@@ -70,31 +120,96 @@ async def mark_attendance(
     if not match:
         raise HTTPException(status_code=403, detail=f"Face verification failed. Score: {score:.2f}")
 
-    # --- Save attendance (toggle check-in/check-out)
-    record = db.query(AttendanceRecord).filter_by(session_id=session_id, user_id=user_id).first()
-    if not record:
-        record = AttendanceRecord(
-            session_id=int(session_id),
-            user_id=int(user_id),
-            check_in_time=datetime.utcnow(),
-            gps_lat=float(latitude),
-            gps_lon=float(longitude),
-            face_match_score=score,
-            vpn_detected=False
-        )
-        db.add(record)
-    else:
-        record.check_out_time = datetime.utcnow()
-        record.gps_lat = float(latitude)
-        record.gps_lon = float(longitude)
-        record.face_match_score = score
-        record.vpn_detected = False
+    # --- Save attendance (toggle check-in/check-out in one upsert)
+    if ATTENDANCE_WRITE_MODE == "write_behind":
+        # Acknowledged once logged; the writer thread commits it with others
+        event = AttendanceEvent(session_id, user_id, latitude, longitude, score, datetime.now(timezone.utc))
+        await io_executor.run(write_behind.submit, event)
+        return {
+            "status": "success",
+            "message": "Attendance recorded",
+            "action": "queued",
+            "match_score": score
+        }
 
-    db.commit()
+    action = await AttendanceRepository(db).toggle(session_id, user_id, latitude, longitude, score)
+    await db.commit()
 
     # ✅ Return only native Python types
     return {
         "status": "success",
         "message": "Attendance marked",
+        "action": action,
         "match_score": score  # native float now
     }
+
+
+@router.post("/identify")
+async def identify(
+    image: UploadFile = File(...),
+    top_k: int = Form(1),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(auth.get_current_user_async)
+):
+    """
+    1:N identification: finds the enrolled user whose face best matches the
+    upload, without the client claiming a user_id. Admins only: it answers
+    "who is this face" for anyone enrolled.
+    """
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can identify faces")
+
+    await io_executor.run(embedding_index.sync, db)
+
+    try:
+        image_bytes = await read_upload(image)
+        face = await face_executor.run(extract_face_from_bytes, image_bytes)
+        current_embedding = await face_batcher.embed(face)
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    candidates = embedding_index.search(current_embedding, k=max(1, min(top_k, 10)))
+    if not candidates or candidates[0][1] <= 1 - MATCH_THRESHOLD:
+        raise HTTPException(status_code=404, detail="No matching user found")
+
+    user_id, score = candidates[0]
+    return {
+        "status": "success",
+        "user_id": user_id,
+        "match_score": score,
+        "candidates": [{"user_id": uid, "match_score": s} for uid, s in candidates],
+    }
+
+
+@router.get("/export")
+def export_attendance(
+    format: Literal["csv", "parquet"] = "csv",
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    session_id: Optional[int] = None,
+    current_user: dict = Depends(auth.get_current_user)
+):
+    """
+    Streams attendance records joined with users and sessions as CSV or
+    Parquet, optionally filtered by UTC check-in date range (inclusive)
+    or session. Memory use is one batch regardless of the export size.
+    """
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can export attendance")
+    if format == "parquet" and attendance_export.pa is None:
+        raise HTTPException(status_code=501, detail="Parquet export is not available on this server")
+
+    query = attendance_export.export_query(start_date, end_date, session_id)
+    # Each batch opens its own short-lived session, so no connection is held between chunks
+    batches = attendance_export.iter_export_batches(SessionLocal, query)
+    if format == "parquet":
+        body, media_type = attendance_export.iter_parquet(batches), "application/vnd.apache.parquet"
+    else:
+        body, media_type = attendance_export.iter_csv(batches), "text/csv"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="attendance.{format}"'},
+    )
@@ -1,22 +1,21 @@
+import anyio
 from fastapi import APIRouter, Depends, HTTPException, Form, File, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import EmailStr
-import numpy as np
-import cv2
 
 from .. import models, auth, schemas
-from ..database import SessionLocal
-from ..utils.face_recognition import generate_face_embedding  # Custom function
+from ..database import get_async_db, get_db
+from ..repositories import UserRepository
+from ..utils.embedding_cache import embedding_cache
+from ..utils.embedding_index import embedding_index
+from ..utils.enrollment_jobs import enqueue_enrollment
+from ..utils.job_queue import job_queue, job_state
+from ..utils.auth_cache import user_state_cache
+from ..utils.image_preprocess import ImageTooLarge, decode_image, read_limited
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 
 @router.post("/register", response_model=schemas.Token)
 def register(
@@ -37,31 +36,25 @@ def register(
     if matric_number and db.query(models.User).filter(models.User.matric_number == matric_number).first():
         raise HTTPException(status_code=400, detail="Matric number already registered")
 
-    # --- Hash password ---
-    hashed_pw = auth.hash_password(password)
+    # --- Hash password (on the password pool, not this request thread) ---
+    hashed_pw = anyio.from_thread.run(auth.hash_password_async, password)
 
-    embedding_str = None
+    image_bytes = None
 
     if role in ["student", "employee"]:
         if not face_image:
             raise HTTPException(status_code=400, detail="Face image is required for students and employees")
 
-        # Read image
-        image_bytes = face_image.file.read()
-        np_image = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(np_image, cv2.IMREAD_COLOR)
-
-        if img is None:
-            raise HTTPException(status_code=400, detail="Invalid image uploaded")
-
-        # Generate embedding
+        # Read and check the image (size-capped); the embedding is computed by
+        # a background job so registration doesn't wait on the face model
         try:
-            embedding_str = generate_face_embedding(img)
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
+            image_bytes = read_limited(face_image.file)
+            decode_image(image_bytes)
+        except ImageTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid image uploaded")
 
-    else:
-        embedding_str = "NO FACE"
     # --- Save user ---
     new_user = models.User(
         full_name=full_name,
@@ -69,19 +62,20 @@ def register(
         password_hash=hashed_pw,
         role=role,
         matric_number=matric_number,
-        face_embedding=embedding_str
     )
     db.add(new_user)
+    if image_bytes is not None:
+        enqueue_enrollment(db, new_user, image_bytes)
     db.commit()
     db.refresh(new_user)
+    # SQLite can hand out a deleted user's id again; never serve its old face
+    embedding_cache.invalidate(new_user.user_id)
+    user_state_cache.put(new_user)
+    if image_bytes is not None:
+        job_queue.notify()
 
     # Token
-    access_token = auth.create_access_token(data={
-        "sub": str(new_user.user_id),
-        "user_id": new_user.user_id,
-        "role": new_user.role
-
-        })
+    access_token = auth.create_access_token(data=auth.access_token_claims(new_user))
 
     return {
         "access_token": access_token,
@@ -92,16 +86,23 @@ def register(
     }
 
 @router.post("/login", response_model=schemas.Token)
-def login(login_data: schemas.UserLogin, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == login_data.email).first()
-    if not user or not auth.verify_password(login_data.password, user.password_hash):
+async def login(login_data: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)):
+    user = await UserRepository(db).get_by_email(login_data.email)
+    if not user:
+        raise HTTPException(status_code=400, detail="Invalid email or password")
+    # bcrypt is deliberately slow; keep it off the event loop
+    matches, new_hash = await auth.verify_password_async(login_data.password, user.password_hash)
+    if not matches:
         raise HTTPException(status_code=400, detail="Invalid email or password")
+    if not user.is_active:
+        raise HTTPException(status_code=403, detail="Account is disabled")
 
-    access_token = auth.create_access_token(data={
-        "sub": str(user.user_id),
-        "user_id": user.user_id,
-        "role": user.role
-    })
+    if new_hash:
+        # Stored at an outdated cost; the plaintext is only at hand now
+        user.password_hash = new_hash
+        await db.commit()
+
+    access_token = auth.create_access_token(data=auth.access_token_claims(user))
     return {
         "access_token": access_token,
         "token_type": "bearer",
@@ -110,3 +111,54 @@ def login(login_data: schemas.UserLogin, db: Session = Depends(get_db)):
         "role": user.role  
 
     }
+
+
+def _own_or_admin(user_id, current_user):
+    if current_user.get("user_id") != user_id and current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not allowed to access this user's enrollment")
+
+
+@router.get("/users/{user_id}/enrollment")
+def enrollment_status(
+    user_id: int,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(auth.get_current_user)
+):
+    _own_or_admin(user_id, current_user)
+    user = db.get(models.User, user_id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    job = job_state(db, user.enrollment_job_id) if user.enrollment_job_id else None
+    return {"user_id": user_id, "enrollment_status": user.enrollment_status, "job": job}
+
+
+@router.put("/users/{user_id}/face")
+def replace_face(
+    user_id: int,
+    face_image: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(auth.get_current_user)
+):
+    """
+    New photo, e.g. after a failed enrollment; check-ins wait for its
+    embedding. This worker drops the old one immediately; other workers
+    stop accepting it within EMBEDDING_CACHE_SYNC_SECONDS for check-ins and
+    EMBEDDING_INDEX_SYNC_SECONDS for identify.
+    """
+    _own_or_admin(user_id, current_user)
+    user = db.get(models.User, user_id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    try:
+        image_bytes = read_limited(face_image.file)
+        decode_image(image_bytes)
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid image uploaded")
+    enqueue_enrollment(db, user, image_bytes)
+    db.commit()
+    embedding_cache.invalidate(user_id)
+    embedding_index.remove(user_id)
+    job_queue.notify()
+    return {"user_id": user_id, "enrollment_status": user.enrollment_status, "job": job_state(db, user.enrollment_job_id)}
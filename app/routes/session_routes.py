@@ -1,38 +1,55 @@
 # session_routes.py
-import qrcode
-import io
-from fastapi.responses import StreamingResponse
-from datetime import datetime, timedelta, timezone
-from fastapi import APIRouter, Depends, HTTPException
+import math
+import time
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+from datetime import date, datetime, timedelta, timezone
+import json
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from .. import models, auth, schemas
-from ..database import SessionLocal
+from ..database import get_async_db, get_db
+from ..repositories import AttendanceRepository, SessionRepository
+from ..utils.executors import io_executor
+from ..utils.embedding_cache import embedding_cache
+from ..utils.geofence import PolygonZone, audit_session_records
+from ..utils.live_events import TooManySubscribers, live_events
+from ..utils.session_qr import (
+    QR_MEDIA_TYPES, RENDERERS, qr_cache, render_png, rotating_token, rotation_step, static_payload,
+)
+from ..utils.session_registry import session_registry
+from ..utils.timetable import MAX_GENERATE_DAYS, generate_sessions, materialize, new_schedule, schedule_state
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 from .. import schemas
 
 @router.post("/create-session")
-def create_session(
+async def create_session(
     name: str,  # from query
     duration_minutes: int,
     gps_lat: float = None,
     gps_lon: float = None,
     allowed_radius: float = None,
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(auth.get_current_user)
+    geofence: Optional[List[List[float]]] = Body(None, description="Polygon as [[lat, lon], ...]"),
+    qr_rotation_seconds: Optional[int] = Query(
+        None, ge=1, le=3600, description="Rotate the QR as a signed token this often; check-ins must send it"
+    ),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(auth.get_current_user_async)
 ):
     role = current_user.get("role")
     if role != "admin":
         raise HTTPException(status_code=403, detail="Only admins can create sessions")
 
+    if geofence is not None:
+        try:
+            PolygonZone(geofence)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     start_time = datetime.now(timezone.utc)
     end_time = start_time + timedelta(minutes=duration_minutes)
 
@@ -44,24 +61,235 @@ def create_session(
         qr_code="",
         gps_lat=gps_lat,
         gps_lon=gps_lon,
-        allowed_radius=allowed_radius
+        allowed_radius=allowed_radius,
+        geofence=json.dumps(geofence) if geofence is not None else None,
+        qr_rotation_seconds=qr_rotation_seconds
     )
 
-    db.add(new_session)
+    # The flush assigns session_id, so the QR goes in with the same commit;
+    # rendering is CPU work, keep it off the event loop. A rotating session
+    # never shows its static QR, so it has no stored image
+    await SessionRepository(db).add(new_session)
+    session_id = new_session.session_id
+    new_session.qr_code = f"/sessions/{session_id}/qr"
+    if not qr_rotation_seconds:
+        payload = static_payload(session_id, end_time)
+        new_session.qr_image = await io_executor.run(render_png, payload)
+    await db.commit()
+    session = session_registry.add(new_session)
+    if not qr_rotation_seconds:
+        qr_cache.put(payload, "png", new_session.qr_image)
+
+    content, etag, _ = await _current_qr(session, "png", db)
+    return Response(content, media_type="image/png", headers={"ETag": etag, "X-Session-Id": str(session_id)})
+
+
+async def _current_qr(session, fmt, db):
+    """
+    (content, etag, max_age) of what the session's QR shows right now: its
+    static payload, or the signed token of the current rotation step.
+    """
+    now = time.time()
+    if session.qr_rotation_seconds:
+        rotation = session.qr_rotation_seconds
+        payload = rotating_token(session.session_id, rotation_step(rotation, now))
+        max_age = math.ceil(rotation - now % rotation)
+    else:
+        payload = static_payload(session.session_id, session.end_time)
+        max_age = max(0, math.ceil(session.end_time.timestamp() - now))
+
+    cached = qr_cache.get(payload, fmt)
+    if cached is None:
+        content = None
+        if fmt == "png" and not session.qr_rotation_seconds:
+            content = await SessionRepository(db).get_qr_image(session.session_id)
+        if content is None:
+            content = await io_executor.run(RENDERERS[fmt], payload)
+        cached = qr_cache.put(payload, fmt, content)
+    return cached + (max_age,)
+
+
+@router.get("/{session_id}/qr")
+async def session_qr(
+    session_id: int,
+    request: Request,
+    format: Literal["png", "svg"] = "png",
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(auth.get_current_user_async)
+):
+    """
+    The session's QR code for display. Cached by clients until it changes:
+    the end of the session, or of the current rotation step for rotating
+    sessions (poll again then). Renders come from a per-worker cache, so
+    many screens polling a rotating QR cost one render per step.
+    """
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can display session QR codes")
+
+    session = session_registry.get(session_id)
+    if session is None:
+        row = await SessionRepository(db).get(session_id)
+        if not row:
+            raise HTTPException(status_code=404, detail="Session not found")
+        session = session_registry.add(row)
+    if session.status() == "ended":
+        raise HTTPException(status_code=410, detail="Session has ended")
+
+    content, etag, max_age = await _current_qr(session, format, db)
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={max_age}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content, media_type=QR_MEDIA_TYPES[format], headers=headers)
+
+
+# Timetables: recurring weekly schedules whose sessions are generated in bulk,
+# a rolling window ahead (utils/timetable.py), with QR codes rendered on demand
+
+@router.post("/schedules")
+def create_schedules(
+    schedules: List[schemas.RecurringScheduleCreate],
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(auth.get_current_user)
+):
+    """
+    Creates a whole timetable at once and generates its sessions for the
+    next SCHEDULE_WINDOW_DAYS; later ones follow as the window rolls.
+    """
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can create schedules")
+
+    try:
+        rows = [new_schedule(spec, current_user["user_id"]) for spec in schedules]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    db.add_all(rows)
+    db.flush()
+    created = materialize(db, rows)
+    result = {"schedules": [schedule_state(row) for row in rows], "sessions_created": created}
     db.commit()
-    db.refresh(new_session)
+    return result
 
-    qr_data = {"session_id": new_session.session_id, "end_time": end_time.isoformat()}
-    qr = qrcode.QRCode(version=1, box_size=10, border=4)
-    qr.add_data(qr_data)
-    qr.make(fit=True)
 
-    img = qr.make_image(fill_color="black", back_color="white")
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    buf.seek(0)
+@router.post("/schedules/generate")
+def generate_schedule_sessions(
+    from_date: date,
+    to_date: date,
+    schedule_id: Optional[List[int]] = Query(None, description="Defaults to every schedule"),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(auth.get_current_user)
+):
+    """
+    Generates the sessions of a date range now, in one transaction, e.g.
+    for a timetable published further ahead than the rolling window.
+    Occurrences that already exist are left alone.
+    """
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can generate sessions")
+    if to_date < from_date:
+        raise HTTPException(status_code=400, detail="to_date is before from_date")
+    if (to_date - from_date).days >= MAX_GENERATE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is longer than {MAX_GENERATE_DAYS} days")
 
-    new_session.qr_code = f"session_{new_session.session_id}.png"
+    query = db.query(models.RecurringSchedule).filter(
+        models.RecurringSchedule.start_date <= to_date, models.RecurringSchedule.end_date >= from_date
+    )
+    if schedule_id:
+        query = query.filter(models.RecurringSchedule.schedule_id.in_(schedule_id))
+    schedules = query.all()
+    created = generate_sessions(db, schedules, from_date, to_date)
     db.commit()
+    return {"schedules": len(schedules), "sessions_created": created}
+
+
+@router.post("/{session_id}/preload-embeddings")
+def preload_embeddings(
+    session_id: int,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(auth.get_current_user)
+):
+    """
+    Warms the embedding cache with everyone who attended an earlier session
+    of the same title, ahead of the check-in burst. Only the worker that
+    serves this request is warmed.
+    """
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can preload sessions")
+
+    session = db.query(models.AttendanceSession).filter(models.AttendanceSession.session_id == session_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    expected = db.query(models.AttendanceRecord.user_id).join(
+        models.AttendanceSession, models.AttendanceSession.session_id == models.AttendanceRecord.session_id
+    ).filter(models.AttendanceSession.title == session.title).distinct()
+
+    preloaded = embedding_cache.preload(db, [user_id for (user_id,) in expected])
+    return {"session_id": session_id, "preloaded": preloaded, "cache": embedding_cache.stats()}
+
+
+@router.get("/{session_id}/geofence-audit")
+def geofence_audit(
+    session_id: int,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(auth.get_current_user)
+):
+    """
+    Re-checks every stored check-in location of a session against its
+    current geofence, e.g. after the zone was corrected.
+    """
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can audit sessions")
+
+    session = db.query(models.AttendanceSession).filter(models.AttendanceSession.session_id == session_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    outside, checked = audit_session_records(db, session)
+    return {"session_id": session_id, "records_checked": checked, "outside_record_ids": outside}
+
+
+@router.get("/{session_id}/live")
+async def live_attendance(
+    session_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(auth.get_current_user_async)
+):
+    """
+    Server-Sent Events stream of a session's check-ins, check-outs and
+    failed attempts with running counts; starts with a snapshot event.
+    Slow clients skip intermediate events (each event says how many).
+    """
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can watch sessions")
+
+    if not live_events.is_watched(session_id) and not await SessionRepository(db).get(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
 
-    return StreamingResponse(buf, media_type="image/png")
+    # Subscribe before reading the counts: check-ins published meanwhile are
+    # added to them rather than missing from both
+    try:
+        subscription = live_events.subscribe(session_id, seeded=False)
+    except TooManySubscribers as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    try:
+        if live_events.needs_seed(subscription):
+            check_ins, check_outs = await AttendanceRepository(db).counts(session_id)
+            live_events.seed(subscription, check_ins, check_outs)
+    except BaseException:
+        live_events.unsubscribe(subscription)
+        raise
+    finally:
+        # Don't hold a pooled connection for the lifetime of the stream
+        await db.close()
+
+    async def release():
+        # The stream's own cleanup never runs if it is never iterated
+        live_events.unsubscribe(subscription)
+
+    return StreamingResponse(
+        live_events.stream(subscription, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release),
+    )
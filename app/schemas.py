@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field
+from typing import List, Optional
+from datetime import date, datetime, time
 
 
 # =========================
@@ -24,6 +24,9 @@ class UserLogin(BaseModel):
 
 class UserOut(UserBase):
     user_id: int
+    is_active: bool = True
+    # pending until the face embedding job has run; see /auth/users/{id}/enrollment
+    enrollment_status: str = "complete"
     created_at: datetime
 
     class Config:
@@ -33,6 +36,11 @@ class UserOut(UserBase):
 # =========================
 # Token Schemas
 # =========================
+class UserUpdate(BaseModel):
+    role: Optional[str] = None
+    is_active: Optional[bool] = None
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -51,6 +59,7 @@ class AttendanceSessionBase(BaseModel):
     gps_lat: Optional[float] = None
     gps_lon: Optional[float] = None
     allowed_radius: Optional[int] = 100
+    geofence: Optional[str] = None
 
 
 class AttendanceSessionCreate(AttendanceSessionBase):
@@ -61,12 +70,33 @@ class AttendanceSessionOut(AttendanceSessionBase):
     session_id: int
     created_by: int
     qr_code: str
+    qr_rotation_seconds: Optional[int] = None
     created_at: datetime
 
     class Config:
         orm_mode = True
 
 
+# =========================
+# Recurring Schedule Schemas
+# =========================
+# A weekly timetable slot; sessions are generated from it a rolling window ahead
+class RecurringScheduleCreate(BaseModel):
+    title: str
+    weekdays: List[int] = Field(..., description="ISO weekdays, 1 = Monday")
+    start_time: time = Field(..., description="Wall-clock start in `timezone`")
+    duration_minutes: int = Field(..., gt=0, le=24 * 60)
+    timezone: str = "UTC"
+    start_date: date
+    end_date: date
+    exceptions: List[date] = Field(default_factory=list, description="Dates without a session")
+    gps_lat: Optional[float] = None
+    gps_lon: Optional[float] = None
+    allowed_radius: Optional[int] = 100
+    geofence: Optional[List[List[float]]] = None
+    qr_rotation_seconds: Optional[int] = Field(None, ge=1, le=3600)
+
+
 # =========================
 # Attendance Record Schemas
 # =========================
@@ -90,6 +120,27 @@ class AttendanceRecordOut(AttendanceRecordBase):
     user_id: int
     check_in_time: Optional[datetime]
     check_out_time: Optional[datetime]
+    created_at: Optional[datetime] = None
 
     class Config:
         orm_mode = True
+
+
+# =========================
+# Keyset Pages
+# =========================
+# next_cursor is opaque; pass it back as ?cursor= for the next (older) page,
+# it is None on the last page
+class UserPage(BaseModel):
+    items: List[UserOut]
+    next_cursor: Optional[str] = None
+
+
+class AttendanceSessionPage(BaseModel):
+    items: List[AttendanceSessionOut]
+    next_cursor: Optional[str] = None
+
+
+class AttendanceRecordPage(BaseModel):
+    items: List[AttendanceRecordOut]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,172 @@
+# utils/attendance_export.py
+import csv
+import io
+import os
+from datetime import timedelta
+
+from sqlalchemy import select
+
+from app.models import AttendanceRecord, AttendanceSession, User
+from app.utils.attendance_store import day_bounds
+from app.utils.session_registry import as_utc
+
+try:
+    import pyarrow as pa  # optional: Parquet export
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+
+EXPORT_COLUMNS = [
+    ("record_id", AttendanceRecord.record_id),
+    ("session_id", AttendanceRecord.session_id),
+    ("session_title", AttendanceSession.title),
+    ("user_id", AttendanceRecord.user_id),
+    ("full_name", User.full_name),
+    ("email", User.email),
+    ("matric_number", User.matric_number),
+    ("check_in_time", AttendanceRecord.check_in_time),
+    ("check_out_time", AttendanceRecord.check_out_time),
+    ("gps_lat", AttendanceRecord.gps_lat),
+    ("gps_lon", AttendanceRecord.gps_lon),
+    ("face_match_score", AttendanceRecord.face_match_score),
+    ("vpn_detected", AttendanceRecord.vpn_detected),
+]
+COLUMN_NAMES = [name for name, _ in EXPORT_COLUMNS]
+
+
+def export_query(start_date=None, end_date=None, session_id=None):
+    """
+    Records joined with their user and session, ordered by record_id.
+    `end_date` is inclusive; both are UTC dates on check_in_time.
+    """
+    query = (
+        select(*[column.label(name) for name, column in EXPORT_COLUMNS])
+        .select_from(AttendanceRecord)
+        .outerjoin(User, User.user_id == AttendanceRecord.user_id)
+        .outerjoin(AttendanceSession, AttendanceSession.session_id == AttendanceRecord.session_id)
+        .order_by(AttendanceRecord.record_id)
+    )
+    if start_date is not None:
+        query = query.where(AttendanceRecord.check_in_time >= day_bounds(start_date)[0])
+    if end_date is not None:
+        query = query.where(AttendanceRecord.check_in_time < day_bounds(end_date + timedelta(days=1))[0])
+    if session_id is not None:
+        query = query.where(AttendanceRecord.session_id == session_id)
+    return query
+
+
+def iter_export_batches(session_factory, query, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yields lists of rows by keyset pagination on record_id: every batch is
+    an indexed range scan of `batch_size` rows, so memory and per-batch cost
+    stay flat however large the export is. Each batch runs in its own short
+    transaction; stream_results asks drivers that support it for a
+    server-side cursor.
+    """
+    last_id = 0
+    while True:
+        db = session_factory()
+        try:
+            rows = db.execute(
+                query.where(AttendanceRecord.record_id > last_id).limit(batch_size),
+                execution_options={"stream_results": True},
+            ).all()
+        finally:
+            db.close()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].record_id
+        if len(rows) < batch_size:
+            return
+
+
+_TIMESTAMP_COLUMNS = [COLUMN_NAMES.index("check_in_time"), COLUMN_NAMES.index("check_out_time")]
+
+
+def _csv_row(row):
+    row = list(row)
+    for i in _TIMESTAMP_COLUMNS:
+        if row[i] is not None:
+            row[i] = as_utc(row[i]).isoformat()
+    return row
+
+
+def iter_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMN_NAMES)
+    for rows in batches:
+        writer.writerows(map(_csv_row, rows))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def parquet_schema():
+    return pa.schema([
+        ("record_id", pa.int64()),
+        ("session_id", pa.int64()),
+        ("session_title", pa.string()),
+        ("user_id", pa.int64()),
+        ("full_name", pa.string()),
+        ("email", pa.string()),
+        ("matric_number", pa.string()),
+        ("check_in_time", pa.timestamp("us", tz="UTC")),
+        ("check_out_time", pa.timestamp("us", tz="UTC")),
+        ("gps_lat", pa.float64()),
+        ("gps_lon", pa.float64()),
+        ("face_match_score", pa.float64()),
+        ("vpn_detected", pa.bool_()),
+    ])
+
+
+class _DrainableSink(io.RawIOBase):
+    """
+    Write-only file for ParquetWriter whose bytes are handed out (and
+    forgotten) after every row group.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_parquet(batches):
+    """
+    One Parquet row group per batch, yielded as soon as it is written.
+    """
+    if pa is None:
+        raise RuntimeError("Parquet export needs pyarrow installed")
+    schema = parquet_schema()
+    sink = _DrainableSink()
+    with pq.ParquetWriter(sink, schema, compression="snappy") as writer:
+        for rows in batches:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+            ))
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
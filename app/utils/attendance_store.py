@@ -0,0 +1,236 @@
+# utils/attendance_store.py
+from datetime import datetime, time, timedelta, timezone
+
+from sqlalchemy import and_, bindparam, delete, func, insert as sql_insert, or_, select
+
+from app.models import AttendanceDailyRollup, AttendanceRecord, AttendanceSessionRollup, AttendanceUserRollup
+
+
+# One prebuilt statement set per dialect; building them costs far more than running them
+_statements = {}
+
+
+def _dialect_insert(dialect):
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        raise NotImplementedError(f"No upsert support for {dialect}")
+    return insert
+
+
+def _build_statements(dialect):
+    insert = _dialect_insert(dialect)
+
+    upsert = insert(AttendanceRecord).values(
+        session_id=bindparam("session_id"),
+        user_id=bindparam("user_id"),
+        check_in_time=bindparam("now"),
+        gps_lat=bindparam("gps_lat"),
+        gps_lon=bindparam("gps_lon"),
+        face_match_score=bindparam("score"),
+        vpn_detected=bindparam("vpn_detected"),
+    )
+    excluded = upsert.excluded
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[AttendanceRecord.session_id, AttendanceRecord.user_id],
+        set_={
+            "check_out_time": excluded.check_in_time,
+            "gps_lat": excluded.gps_lat,
+            "gps_lon": excluded.gps_lon,
+            "face_match_score": excluded.face_match_score,
+            "vpn_detected": excluded.vpn_detected,
+        },
+        # A replayed event carries a time the row already holds; skip the
+        # update so RETURNING comes back empty
+        where=and_(
+            AttendanceRecord.check_in_time != excluded.check_in_time,
+            or_(AttendanceRecord.check_out_time.is_(None), AttendanceRecord.check_out_time != excluded.check_in_time),
+        ),
+    ).returning(AttendanceRecord.check_out_time)
+
+    # Rollup increments take a count `n` so a batch can apply many check-ins at once
+    daily = insert(AttendanceDailyRollup).values(day=bindparam("day"), check_ins=bindparam("n"))
+    daily = daily.on_conflict_do_update(
+        index_elements=[AttendanceDailyRollup.day],
+        set_={"check_ins": AttendanceDailyRollup.check_ins + daily.excluded.check_ins},
+    )
+    per_session = insert(AttendanceSessionRollup).values(
+        day=bindparam("day"), session_id=bindparam("session_id"), check_ins=bindparam("n")
+    )
+    per_session = per_session.on_conflict_do_update(
+        index_elements=[AttendanceSessionRollup.day, AttendanceSessionRollup.session_id],
+        set_={"check_ins": AttendanceSessionRollup.check_ins + per_session.excluded.check_ins},
+    )
+    per_user = insert(AttendanceUserRollup).values(
+        user_id=bindparam("user_id"), check_ins=bindparam("n"), last_check_in=bindparam("now")
+    )
+    per_user = per_user.on_conflict_do_update(
+        index_elements=[AttendanceUserRollup.user_id],
+        set_={
+            "check_ins": AttendanceUserRollup.check_ins + per_user.excluded.check_ins,
+            "last_check_in": func.max(AttendanceUserRollup.last_check_in, per_user.excluded.last_check_in)
+            if dialect == "sqlite" else func.greatest(AttendanceUserRollup.last_check_in, per_user.excluded.last_check_in),
+        },
+    )
+    return upsert, (daily, per_session, per_user)
+
+
+def _statements_for(db):
+    dialect = db.get_bind().dialect.name
+    statements = _statements.get(dialect)
+    if statements is None:
+        statements = _statements[dialect] = _build_statements(dialect)
+    return statements
+
+
+def _upsert_params(session_id, user_id, latitude, longitude, score, vpn_detected, now):
+    return {
+        "session_id": int(session_id),
+        "user_id": int(user_id),
+        "now": now or datetime.now(timezone.utc),
+        "gps_lat": float(latitude),
+        "gps_lon": float(longitude),
+        "score": float(score),
+        "vpn_detected": bool(vpn_detected),
+    }
+
+
+def _utc_day(moment):
+    return (moment.astimezone(timezone.utc) if moment.tzinfo else moment).date()
+
+
+class RollupBatch:
+    """
+    Collects the rollup increments of many check-ins so a batch writer
+    (the write-behind queue) issues one upsert per day, session-day and
+    user instead of three per check-in. Pass it as `rollups=` to
+    upsert_attendance, then `apply(db)` before committing.
+    """
+
+    def __init__(self):
+        self.days = {}
+        self.sessions = {}
+        self.users = {}
+
+    def add(self, session_id, user_id, now):
+        day = _utc_day(now)
+        self.days[day] = self.days.get(day, 0) + 1
+        self.sessions[(day, session_id)] = self.sessions.get((day, session_id), 0) + 1
+        count, last = self.users.get(user_id, (0, now))
+        self.users[user_id] = (count + 1, max(last, now))
+
+    def _params(self):
+        return (
+            [{"day": day, "n": n} for day, n in self.days.items()],
+            [{"day": day, "session_id": session_id, "n": n} for (day, session_id), n in self.sessions.items()],
+            [{"user_id": user_id, "n": n, "now": last} for user_id, (n, last) in self.users.items()],
+        )
+
+    def apply(self, db):
+        _, statements = _statements_for(db)
+        for statement, params in zip(statements, self._params()):
+            if params:
+                db.execute(statement, params)
+
+
+def _rollup_params(params):
+    now = params["now"]
+    return {"day": _utc_day(now), "session_id": params["session_id"], "user_id": params["user_id"], "now": now, "n": 1}
+
+
+def _action(row):
+    if row is None:
+        return None
+    return "check_in" if row[0] is None else "check_out"
+
+
+def upsert_attendance(db, session_id, user_id, latitude, longitude, score, vpn_detected=False, now=None, rollups=None):
+    """
+    Records a check-in, or a check-out if the user already checked in to
+    this session, in a single INSERT ... ON CONFLICT DO UPDATE on
+    (session_id, user_id). Concurrent duplicates can't hit the unique
+    constraint. A check-in also bumps the day, session and user rollups in
+    the same transaction, or adds to `rollups` (a RollupBatch) if given.
+    The caller commits.
+
+    Returns "check_in" or "check_out", or None when the event (same `now`)
+    was already applied; the write-behind log relies on that on replay.
+    """
+    upsert, rollup_statements = _statements_for(db)
+    params = _upsert_params(session_id, user_id, latitude, longitude, score, vpn_detected, now)
+    action = _action(db.execute(upsert, params).first())
+    if action == "check_in" and rollups is not None:
+        rollups.add(params["session_id"], params["user_id"], params["now"])
+    elif action == "check_in":
+        rollup_params = _rollup_params(params)
+        for statement in rollup_statements:
+            db.execute(statement, rollup_params)
+    return action
+
+
+async def upsert_attendance_async(db, session_id, user_id, latitude, longitude, score, vpn_detected=False, now=None):
+    """
+    upsert_attendance for an AsyncSession.
+    """
+    upsert, rollup_statements = _statements_for(db)
+    params = _upsert_params(session_id, user_id, latitude, longitude, score, vpn_detected, now)
+    action = _action((await db.execute(upsert, params)).first())
+    if action == "check_in":
+        rollup_params = _rollup_params(params)
+        for statement in rollup_statements:
+            await db.execute(statement, rollup_params)
+    return action
+
+
+def day_bounds(day):
+    """
+    [start, end) of a UTC day, for range predicates on check_in_time that
+    can use its index.
+    """
+    start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def rebuild_rollups(db, since=None):
+    """
+    Recomputes the rollups from attendance_records, for every day from
+    `since` (a date) onwards or for all time. A compaction job for
+    backfills and for repairing drift, e.g. after records were edited or
+    deleted by hand. The caller commits.
+    """
+    records = select(AttendanceRecord).where(AttendanceRecord.check_in_time.isnot(None))
+    day_rollups = delete(AttendanceDailyRollup)
+    session_rollups = delete(AttendanceSessionRollup)
+    if since is not None:
+        start, _ = day_bounds(since)
+        records = records.where(AttendanceRecord.check_in_time >= start)
+        day_rollups = day_rollups.where(AttendanceDailyRollup.day >= since)
+        session_rollups = session_rollups.where(AttendanceSessionRollup.day >= since)
+    records = records.subquery()
+    check_in_time = records.c.check_in_time
+    if db.get_bind().dialect.name != "sqlite":
+        # SQLite stores the UTC wall clock; elsewhere convert before truncating
+        check_in_time = func.timezone("UTC", check_in_time)
+    day = func.date(check_in_time)
+
+    db.execute(day_rollups)
+    db.execute(session_rollups)
+    db.execute(sql_insert(AttendanceDailyRollup).from_select(
+        ["day", "check_ins"],
+        select(day, func.count()).group_by(day),
+    ))
+    db.execute(sql_insert(AttendanceSessionRollup).from_select(
+        ["day", "session_id", "check_ins"],
+        select(day, records.c.session_id, func.count()).group_by(day, records.c.session_id),
+    ))
+
+    # Per-user totals span all days, so they are always rebuilt in full
+    db.execute(delete(AttendanceUserRollup))
+    db.execute(sql_insert(AttendanceUserRollup).from_select(
+        ["user_id", "check_ins", "last_check_in"],
+        select(AttendanceRecord.user_id, func.count(), func.max(AttendanceRecord.check_in_time))
+        .where(AttendanceRecord.check_in_time.isnot(None))
+        .group_by(AttendanceRecord.user_id),
+    ))
@@ -0,0 +1,106 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, create_db_engine
+from app.models import AttendanceDailyRollup, AttendanceRecord, AttendanceSessionRollup, AttendanceUserRollup
+from app.utils.attendance_store import rebuild_rollups, upsert_attendance
+
+
+def make_sessionmaker(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def test_toggle_check_in_then_check_out(tmp_path):
+    SessionLocal = make_sessionmaker(tmp_path)
+    db = SessionLocal()
+    assert upsert_attendance(db, 1, 1, 6.52, 3.37, 0.9) == "check_in"
+    db.commit()
+    assert upsert_attendance(db, 1, 1, 6.53, 3.38, 0.8) == "check_out"
+    db.commit()
+
+    record = db.query(AttendanceRecord).one()
+    assert record.check_in_time is not None and record.check_out_time is not None
+    assert (record.gps_lat, record.gps_lon, record.face_match_score) == (6.53, 3.38, 0.8)
+    db.close()
+
+
+def test_parallel_duplicate_submissions(tmp_path):
+    SessionLocal = make_sessionmaker(tmp_path)
+
+    def submit(_):
+        db = SessionLocal()
+        try:
+            action = upsert_attendance(db, 7, 42, 6.52, 3.37, 0.9)
+            db.commit()
+            return action
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        actions = list(pool.map(submit, range(64)))
+
+    assert actions.count("check_in") == 1
+    assert actions.count("check_out") == 63
+    db = SessionLocal()
+    assert db.query(AttendanceRecord).count() == 1
+    db.close()
+
+
+def test_replaying_an_event_is_a_no_op(tmp_path):
+    SessionLocal = make_sessionmaker(tmp_path)
+    db = SessionLocal()
+    check_in_at = datetime.now(timezone.utc)
+    check_out_at = check_in_at + timedelta(minutes=50)
+
+    assert upsert_attendance(db, 1, 1, 6.52, 3.37, 0.9, now=check_in_at) == "check_in"
+    assert upsert_attendance(db, 1, 1, 6.52, 3.37, 0.9, now=check_in_at) is None
+    assert upsert_attendance(db, 1, 1, 6.52, 3.37, 0.9, now=check_out_at) == "check_out"
+    assert upsert_attendance(db, 1, 1, 6.52, 3.37, 0.9, now=check_out_at) is None
+    assert upsert_attendance(db, 1, 1, 6.52, 3.37, 0.9, now=check_in_at) is None
+    db.commit()
+
+    record = db.query(AttendanceRecord).one()
+    assert record.check_out_time == check_out_at.replace(tzinfo=None)
+    db.close()
+
+
+def rollup_rows(db):
+    return (
+        [(r.day, r.check_ins) for r in db.query(AttendanceDailyRollup).order_by(AttendanceDailyRollup.day)],
+        [(r.day, r.session_id, r.check_ins) for r in db.query(AttendanceSessionRollup).order_by(AttendanceSessionRollup.day, AttendanceSessionRollup.session_id)],
+        [(r.user_id, r.check_ins) for r in db.query(AttendanceUserRollup).order_by(AttendanceUserRollup.user_id)],
+    )
+
+
+def test_rollups_count_check_ins_once(tmp_path):
+    SessionLocal = make_sessionmaker(tmp_path)
+    db = SessionLocal()
+    monday = datetime(2026, 10, 12, 9, tzinfo=timezone.utc)
+    tuesday = monday + timedelta(days=1)
+    for session_id, user_id, at in [(1, 1, monday), (1, 2, monday), (2, 1, tuesday)]:
+        upsert_attendance(db, session_id, user_id, 6.52, 3.37, 0.9, now=at)
+    # Check-outs and replays leave the counts alone
+    upsert_attendance(db, 1, 1, 6.52, 3.37, 0.9, now=monday + timedelta(hours=1))
+    upsert_attendance(db, 1, 2, 6.52, 3.37, 0.9, now=monday)
+    db.commit()
+
+    expected = (
+        [(monday.date(), 2), (tuesday.date(), 1)],
+        [(monday.date(), 1, 2), (tuesday.date(), 2, 1)],
+        [(1, 2), (2, 1)],
+    )
+    assert rollup_rows(db) == expected
+    assert db.get(AttendanceUserRollup, 1).last_check_in == tuesday.replace(tzinfo=None)
+
+    # A rebuild from the records lands on the same numbers
+    rebuild_rollups(db)
+    db.commit()
+    assert rollup_rows(db) == expected
+    rebuild_rollups(db, since=tuesday.date())
+    db.commit()
+    assert rollup_rows(db) == expected
+    db.close()
@@ -0,0 +1,130 @@
+# utils/auth_cache.py
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple, Optional
+
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "30"))
+# Must cover the longest-lived access token
+AUTH_REVOCATION_WINDOW_MINUTES = int(os.getenv("AUTH_REVOCATION_WINDOW_MINUTES", "60"))
+
+
+class UserState(NamedTuple):
+    is_active: bool
+    role: Optional[str]
+    email: Optional[str]
+
+
+def user_state(user):
+    """
+    UserState of a User row; a missing user is an inactive one.
+    """
+    if user is None:
+        return UserState(False, None, None)
+    return UserState(bool(user.is_active), user.role, user.email)
+
+
+class UserStateCache:
+    """
+    The users changed (disabled, re-roled, renamed...) within the revocation
+    window, i.e. since the oldest token that may still be valid was signed.
+    A user who isn't in here hasn't changed since their token was issued,
+    so its signed claims are current and need no lookup.
+
+    The set is reloaded with one indexed query on users.updated_at at most
+    every `ttl_seconds`, by whichever request first finds it stale, so a
+    change made by another worker takes effect within the TTL. The worker
+    making the change calls `put()` to apply it immediately. Deleting a
+    user row is not seen; disable users instead.
+    """
+
+    def __init__(self, ttl_seconds=AUTH_CACHE_TTL_SECONDS, window_minutes=AUTH_REVOCATION_WINDOW_MINUTES):
+        self.ttl_seconds = ttl_seconds
+        self.window = timedelta(minutes=window_minutes)
+        self._changed = {}
+        self._pending = {}  # put() while a refresh query runs
+        self._lock = threading.Lock()
+        self._refreshed_at = None
+        self._refreshing = False
+        self._refreshes = 0
+        self._overrides = 0
+
+    @property
+    def ready(self):
+        return self._refreshed_at is not None
+
+    def claim_refresh(self):
+        """
+        True if the set is stale and the caller should refresh() it; only
+        one caller at a time gets True, the others keep using the old set.
+        """
+        with self._lock:
+            if self._refreshing:
+                return False
+            if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.ttl_seconds:
+                return False
+            self._refreshing = True
+            return True
+
+    def refresh(self, db):
+        """
+        Reloads the changed users with a sync Session (use run_sync from async code).
+        """
+        from app.models import User
+
+        try:
+            started = time.monotonic()
+            with self._lock:
+                self._pending = {}
+            since = datetime.now(timezone.utc) - self.window
+            rows = db.query(User.user_id, User.is_active, User.role, User.email).filter(
+                User.updated_at > since
+            ).all()
+            changed = {user_id: UserState(bool(active), role, email) for user_id, active, role, email in rows}
+            with self._lock:
+                # The query may have missed a put() that committed after it started
+                changed.update(self._pending)
+                self._changed = changed
+                self._refreshed_at = started
+                self._refreshes += 1
+        finally:
+            with self._lock:
+                self._refreshing = False
+                self._pending = {}
+
+    def get(self, user_id):
+        """
+        The user's current state if it changed within the window, else None.
+        """
+        entry = self._changed.get(user_id)
+        if entry is None:
+            return None
+        self._overrides += 1
+        return entry
+
+    def put(self, user):
+        state = user_state(user)
+        with self._lock:
+            self._changed[user.user_id] = state
+            self._pending[user.user_id] = state
+        return state
+
+    def clear(self):
+        with self._lock:
+            self._changed = {}
+            self._pending = {}
+            self._refreshed_at = None
+
+    def stats(self):
+        return {
+            "changed_users": len(self._changed),
+            "ttl_seconds": self.ttl_seconds,
+            "window_minutes": self.window.total_seconds() / 60,
+            "age_seconds": time.monotonic() - self._refreshed_at if self._refreshed_at is not None else None,
+            "refreshes": self._refreshes,
+            "overrides": self._overrides,
+        }
+
+
+user_state_cache = UserStateCache()
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, create_db_engine
+from app.models import User
+from app.utils.auth_cache import UserState, UserStateCache
+
+
+def make_db(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)()
+
+
+def add_user(db, email, updated_at, **fields):
+    user = User(full_name=email, email=email, password_hash="x", role="student", updated_at=updated_at, **fields)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_refresh_loads_only_users_changed_within_the_window(tmp_path):
+    db = make_db(tmp_path)
+    now = datetime.now(timezone.utc)
+    old = add_user(db, "old@example.com", now - timedelta(hours=3))
+    disabled = add_user(db, "off@example.com", now - timedelta(minutes=5), is_active=False)
+
+    cache = UserStateCache(ttl_seconds=60, window_minutes=60)
+    assert not cache.ready
+    assert cache.claim_refresh()
+    cache.refresh(db)
+    assert cache.ready
+    assert cache.get(old.user_id) is None
+    assert cache.get(disabled.user_id) == UserState(False, "student", "off@example.com")
+    db.close()
+
+
+def test_only_one_refresher_until_the_ttl_passes(tmp_path):
+    db = make_db(tmp_path)
+    cache = UserStateCache(ttl_seconds=60)
+    assert cache.claim_refresh()
+    assert not cache.claim_refresh()
+    cache.refresh(db)
+    assert not cache.claim_refresh()
+
+    cache.ttl_seconds = 0
+    assert cache.claim_refresh()
+    db.close()
+
+
+def test_put_survives_a_concurrent_refresh(tmp_path):
+    db = make_db(tmp_path)
+    user = add_user(db, "ada@example.com", datetime.now(timezone.utc) - timedelta(hours=3))
+    cache = UserStateCache()
+    assert cache.claim_refresh()
+
+    # The admin change lands while the refresh query is running
+    query = db.query
+    def slow_query(*args):
+        user.role = "admin"
+        cache.put(user)
+        return query(*args)
+    db.query = slow_query
+    cache.refresh(db)
+
+    assert cache.get(user.user_id).role == "admin"
+    db.close()
@@ -0,0 +1,443 @@
+# utils/bulk_enrollment.py
+import csv
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+from passlib.context import CryptContext
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from app.database import SessionLocal
+from app.models import EnrollmentJob, EnrollmentJobRow, User
+from app.utils.image_preprocess import MAX_UPLOAD_BYTES
+
+logger = logging.getLogger(__name__)
+
+ENROLLMENT_DIR = os.getenv("ENROLLMENT_DIR", "enrollments")
+ENROLLMENT_WORKERS = int(os.getenv("ENROLLMENT_WORKERS", str(os.cpu_count() or 1)))
+ENROLLMENT_BATCH_SIZE = int(os.getenv("ENROLLMENT_BATCH_SIZE", "200"))
+# Rows handed to the pool ahead of the results; bounds the photos held in memory
+ENROLLMENT_MAX_IN_FLIGHT = int(os.getenv("ENROLLMENT_MAX_IN_FLIGHT", str(ENROLLMENT_WORKERS * 4)))
+# bcrypt dominates a bulk run (~250 ms/row at cost 12). A lower cost here is
+# raised to BCRYPT_ROUNDS on each user's first login (see auth.verify_password_async)
+ENROLLMENT_BCRYPT_ROUNDS = int(os.getenv("ENROLLMENT_BCRYPT_ROUNDS", os.getenv("BCRYPT_ROUNDS", "12")))
+
+REQUIRED_COLUMNS = ("full_name", "email", "role", "password")
+FACE_ROLES = ("student", "employee")
+
+CSV_NAME = "users.csv"
+ARCHIVE_NAME = "faces.zip"
+
+
+class EnrolledUser(NamedTuple):
+    """What on_batch gets for each created user (read before the commit expires the rows)."""
+    user_id: int
+    email: str
+    role: str
+    is_active: bool
+    face_embedding: Optional[bytes]
+    embedding_dtype: Optional[str]
+
+
+class EnrollmentError(ValueError):
+    """Raised when a job's input as a whole is unusable (bad CSV header, corrupt archive)."""
+
+
+def job_dir(job_id):
+    return os.path.join(ENROLLMENT_DIR, str(job_id))
+
+
+def read_rows(csv_path):
+    """
+    Yields (row_number, row) with stripped values; row 1 is the first line
+    after the header. Columns: full_name, email, role, password and
+    optionally matric_number and image (a file name inside the archive).
+    """
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        missing = [c for c in REQUIRED_COLUMNS if c not in (reader.fieldnames or [])]
+        if missing:
+            raise EnrollmentError(f"CSV is missing columns: {', '.join(missing)}")
+        for row_number, row in enumerate(reader, start=1):
+            yield row_number, {k: (v or "").strip() for k, v in row.items() if k}
+
+
+def create_job(db, csv_file, archive_file=None, created_by=None):
+    """
+    Copies the uploads (file objects) into the job's directory, where they
+    stay until the job completes so it can be resumed, and adds the job.
+    The caller commits.
+    """
+    job = EnrollmentJob(created_by=created_by, status="queued")
+    db.add(job)
+    db.flush()
+    directory = job_dir(job.job_id)
+    os.makedirs(directory, exist_ok=True)
+    try:
+        with open(os.path.join(directory, CSV_NAME), "wb") as out:
+            shutil.copyfileobj(csv_file, out)
+        if archive_file is not None:
+            archive_path = os.path.join(directory, ARCHIVE_NAME)
+            with open(archive_path, "wb") as out:
+                shutil.copyfileobj(archive_file, out)
+            if not zipfile.is_zipfile(archive_path):
+                raise EnrollmentError("Image archive is not a zip file")
+        job.total_rows = sum(1 for _ in read_rows(os.path.join(directory, CSV_NAME)))
+    except Exception:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    return job
+
+
+_hashers = {}
+
+
+def prepare_row(password, image_bytes, rounds):
+    """
+    The CPU-heavy part of enrolling one user, run on a pool worker: bcrypt
+    hash plus, given a photo, the face embedding. Returns User column values.
+    """
+    hasher = _hashers.get(rounds)
+    if hasher is None:
+        hasher = _hashers[rounds] = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+    values = {"password_hash": hasher.hash(password)}
+    if image_bytes is not None:
+        from app.utils.embedding_codec import EMBEDDING_VERSION, FACE_EMBEDDING_DTYPE
+        from app.utils.face_model import face_model
+        from app.utils.face_recognition import generate_face_embedding
+        from app.utils.image_preprocess import decode_image
+
+        values.update(
+            face_embedding=generate_face_embedding(decode_image(image_bytes)),
+            embedding_dtype=FACE_EMBEDDING_DTYPE,
+            embedding_model=face_model.model_name,
+            embedding_version=EMBEDDING_VERSION,
+        )
+    return values
+
+
+def new_pool(workers):
+    """
+    Process pool for prepare_row. Workers are spawned, not forked: the API
+    process has usually loaded TensorFlow by now, which isn't fork-safe.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker
+    )
+
+
+def _init_worker():
+    # Each worker process builds and warms its own copy of the model. If that
+    # fails the pool still hashes; rows with photos then fail individually
+    try:
+        from app.utils.face_model import face_model
+        face_model.warm_up()
+    except Exception as e:
+        logger.error("Face model warm-up failed in enrollment worker: %s", e)
+
+
+def _validate(row, archive, seen_emails):
+    """
+    (image_bytes, error) for one row, before anything is sent to the pool.
+    """
+    # Same normalization as /auth/register
+    row["role"] = row["role"].lower()
+    for column in REQUIRED_COLUMNS:
+        if not row.get(column):
+            return None, f"Missing {column}"
+    if "@" not in row["email"]:
+        return None, "Invalid email"
+    if row["email"] in seen_emails:
+        return None, "Duplicate email in this job"
+    seen_emails.add(row["email"])
+
+    image = row.get("image")
+    if not image:
+        if row["role"] in FACE_ROLES:
+            return None, "Face image is required for students and employees"
+        return None, None
+    if archive is None:
+        return None, "No image archive uploaded"
+    try:
+        info = archive.getinfo(image)
+    except KeyError:
+        return None, f"Image {image} not found in archive"
+    if info.file_size > MAX_UPLOAD_BYTES:
+        return None, f"Image {image} is larger than {MAX_UPLOAD_BYTES} bytes"
+    # Members are read one at a time as rows are dispatched, never all extracted
+    return archive.read(info), None
+
+
+def _save_batch(db, job, results):
+    """
+    Inserts the users of a batch and records every row, in one transaction.
+    `results` holds (row_number, row, values, error). Returns EnrolledUsers.
+    """
+    emails = [row["email"] for _, row, values, error in results if error is None]
+    matrics = [row["matric_number"] for _, row, values, error in results if error is None and row.get("matric_number")]
+    taken_emails = set(db.scalars(select(User.email).where(User.email.in_(emails)))) if emails else set()
+    taken_matrics = set(
+        db.scalars(select(User.matric_number).where(User.matric_number.in_(matrics)))
+    ) if matrics else set()
+
+    users, records = [], []
+    for row_number, row, values, error in results:
+        if error is None and row["email"] in taken_emails:
+            error = "Email already registered"
+        if error is None and row.get("matric_number") and row["matric_number"] in taken_matrics:
+            error = "Matric number already registered"
+        user = None
+        if error is None:
+            taken_matrics.add(row.get("matric_number"))
+            user = User(
+                full_name=row["full_name"],
+                email=row["email"],
+                role=row["role"],
+                matric_number=row.get("matric_number") or None,
+                **values,
+            )
+            users.append(user)
+        records.append((row_number, row["email"] or None, user, error))
+
+    db.add_all(users)
+    try:
+        db.flush()
+    except IntegrityError:
+        # Someone registered one of these emails since the check; fall back
+        # to one savepoint per user so only that row fails
+        db.rollback()
+        return _save_rows_one_by_one(db, job, records)
+    return _record_rows(db, job, records)
+
+
+def _save_rows_one_by_one(db, job, records):
+    job = db.get(EnrollmentJob, job.job_id)
+    saved = []
+    for row_number, email, user, error in records:
+        if user is not None:
+            user = User(**{c: getattr(user, c) for c in (
+                "full_name", "email", "role", "matric_number", "password_hash",
+                "face_embedding", "embedding_dtype", "embedding_model", "embedding_version",
+            )})
+            try:
+                with db.begin_nested():
+                    db.add(user)
+            except IntegrityError:
+                user, error = None, "Email already registered"
+        saved.append((row_number, email, user, error))
+    return _record_rows(db, job, saved)
+
+
+def _record_rows(db, job, records):
+    db.add_all(
+        EnrollmentJobRow(
+            job_id=job.job_id, row_number=row_number, email=email,
+            user_id=user.user_id if user is not None else None, error=error,
+        )
+        for row_number, email, user, error in records
+    )
+    created = [
+        EnrolledUser(user.user_id, user.email, user.role, True, user.face_embedding, user.embedding_dtype)
+        for _, _, user, _ in records if user is not None
+    ]
+    job.processed_rows += len(records)
+    job.succeeded += len(created)
+    job.failed += len(records) - len(created)
+    db.commit()
+    return created
+
+
+def run_job(session_factory, job_id, executor=None, prepare=prepare_row, rounds=ENROLLMENT_BCRYPT_ROUNDS,
+            batch_size=ENROLLMENT_BATCH_SIZE, on_batch=None):
+    """
+    Processes a job's CSV: cheap checks here, hashing and embedding fanned
+    out to `executor` (a process pool of ENROLLMENT_WORKERS by default),
+    inserts every `batch_size` rows in one transaction. Rows already
+    recorded for the job are skipped, so calling it again on a job whose
+    process died or was shut down mid-run resumes it. `on_batch(job,
+    enrolled_users)` runs after each commit. The inputs are deleted once the
+    job completes or fails (the CSV holds passwords). Returns the final
+    job_status.
+    """
+    db = session_factory()
+    own_executor = executor is None
+    interrupted = False
+    try:
+        job = db.get(EnrollmentJob, job_id)
+        if job is None:
+            raise EnrollmentError(f"Enrollment job {job_id} not found")
+        job.status, job.error = "running", None
+        # Counters restart from what is on record, in case the last run died mid-batch
+        job.processed_rows, job.succeeded = db.execute(
+            select(func.count(), func.count(EnrollmentJobRow.user_id)).where(EnrollmentJobRow.job_id == job_id)
+        ).one()
+        job.failed = job.processed_rows - job.succeeded
+        db.commit()
+
+        if own_executor:
+            executor = new_pool(ENROLLMENT_WORKERS)
+        try:
+            _process(db, job, executor, prepare, rounds, batch_size, on_batch)
+        except Exception as e:
+            db.rollback()
+            job = db.get(EnrollmentJob, job_id)
+            job.status, job.error = "failed", str(e)
+            db.commit()
+            logger.exception("Enrollment job %s failed", job_id)
+            return job_status(db, job_id)
+        job.status, job.finished_at = "completed", datetime.now(timezone.utc)
+        db.commit()
+        return job_status(db, job_id)
+    except BaseException as e:
+        # Shutdown mid-job rather than an error: the job stays "running" and
+        # keeps its inputs, so starting it again resumes it
+        interrupted = not isinstance(e, Exception)
+        raise
+    finally:
+        if not interrupted:
+            shutil.rmtree(job_dir(job_id), ignore_errors=True)
+        if own_executor and executor is not None:
+            executor.shutdown(cancel_futures=True)
+        db.close()
+
+
+def _process(db, job, executor, prepare, rounds, batch_size, on_batch):
+    directory = job_dir(job.job_id)
+    recorded = dict(db.execute(
+        select(EnrollmentJobRow.row_number, EnrollmentJobRow.email).where(EnrollmentJobRow.job_id == job.job_id)
+    ).all())
+    seen_emails = {email for email in recorded.values() if email}
+    archive_path = os.path.join(directory, ARCHIVE_NAME)
+    archive = zipfile.ZipFile(archive_path) if os.path.exists(archive_path) else None
+    pending, results = {}, []
+
+    def collect(block):
+        done, _ = wait(pending, return_when=FIRST_COMPLETED) if block else (
+            [f for f in pending if f.done()], None
+        )
+        for future in done:
+            row_number, row = pending.pop(future)
+            try:
+                results.append((row_number, row, future.result(), None))
+            except ValueError as e:
+                results.append((row_number, row, None, str(e)))
+
+    def flush():
+        nonlocal results
+        users = _save_batch(db, job, results)
+        results = []
+        if on_batch is not None:
+            on_batch(job, users)
+
+    try:
+        for row_number, row in read_rows(os.path.join(directory, CSV_NAME)):
+            if row_number in recorded:
+                continue
+            image_bytes, error = _validate(row, archive, seen_emails)
+            if error is not None:
+                results.append((row_number, row, None, error))
+            else:
+                pending[executor.submit(prepare, row["password"], image_bytes, rounds)] = (row_number, row)
+            collect(block=len(pending) >= ENROLLMENT_MAX_IN_FLIGHT)
+            if len(results) >= batch_size:
+                flush()
+        while pending:
+            collect(block=True)
+            if len(results) >= batch_size:
+                flush()
+        if results:
+            flush()
+    finally:
+        if archive is not None:
+            archive.close()
+
+
+def job_status(db, job_id, errors_limit=100):
+    """
+    Progress of a job and the first `errors_limit` failed rows, or None.
+    """
+    job = db.get(EnrollmentJob, job_id)
+    if job is None:
+        return None
+    errors = db.execute(
+        select(EnrollmentJobRow.row_number, EnrollmentJobRow.email, EnrollmentJobRow.error)
+        .where(EnrollmentJobRow.job_id == job_id, EnrollmentJobRow.error.isnot(None))
+        .order_by(EnrollmentJobRow.row_number)
+        .limit(errors_limit)
+    ).all()
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "total_rows": job.total_rows,
+        "processed_rows": job.processed_rows,
+        "succeeded": job.succeeded,
+        "failed": job.failed,
+        "error": job.error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+        "row_errors": [{"row": n, "email": email, "error": error} for n, email, error in errors],
+    }
+
+
+class EnrollmentRunner:
+    """
+    Runs enrollment jobs on background threads of the API process, one
+    thread per job sharing one process pool. A job whose process died stays
+    "running" in the table; `start()` it again to resume.
+    """
+
+    def __init__(self, session_factory=SessionLocal, workers=ENROLLMENT_WORKERS):
+        self.session_factory = session_factory
+        self.workers = workers
+        self._executor = None
+        self._active = set()
+        self._lock = threading.Lock()
+        self._started = 0
+
+    def start(self, job_id, on_batch=None):
+        """
+        False if the job is already running in this process.
+        """
+        with self._lock:
+            if job_id in self._active:
+                return False
+            if self._executor is None:
+                self._executor = new_pool(self.workers)
+            self._active.add(job_id)
+            self._started += 1
+        thread = threading.Thread(
+            target=self._run, args=(job_id, on_batch), name=f"enrollment-{job_id}", daemon=True
+        )
+        thread.start()
+        return True
+
+    def _run(self, job_id, on_batch):
+        try:
+            run_job(self.session_factory, job_id, executor=self._executor, on_batch=on_batch)
+        except Exception:
+            logger.exception("Enrollment job %s crashed", job_id)
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+
+    def is_active(self, job_id):
+        return job_id in self._active
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {"active_jobs": sorted(self._active), "workers": self.workers, "started": self._started}
+
+
+enrollment_runner = EnrollmentRunner()
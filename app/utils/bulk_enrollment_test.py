@@ -0,0 +1,154 @@
+import io
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, create_db_engine
+from app.models import EnrollmentJobRow, User
+from app.utils import bulk_enrollment
+from app.utils.bulk_enrollment import create_job, job_status, run_job
+
+
+def make_sessionmaker(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_enrollment, "ENROLLMENT_DIR", str(tmp_path / "enrollments"))
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def fake_prepare(password, image_bytes, rounds):
+    # Stands in for bcrypt + Facenet; the image bytes become the "embedding"
+    if image_bytes == b"no face":
+        raise ValueError("Embedding generation failed: no face")
+    return {"password_hash": f"hashed:{password}", "face_embedding": image_bytes, "embedding_dtype": "float32"}
+
+
+class Shutdown(BaseException):
+    """Stands in for the process going away mid-job."""
+
+
+def upload(SessionLocal, csv_text, images):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as z:
+        for name, data in images.items():
+            z.writestr(name, data)
+    archive.seek(0)
+    db = SessionLocal()
+    job_id = create_job(db, io.BytesIO(csv_text.encode()), archive).job_id
+    db.commit()
+    db.close()
+    return job_id
+
+
+CSV = """full_name,email,role,password,matric_number,image
+Ada,ada@example.com,Student,pw1,M1,ada.jpg
+Bob,bob@example.com,student,pw2,M2,bob.jpg
+Ada Again,ada@example.com,student,pw3,M3,ada.jpg
+Cy,cy@example.com,student,pw4,M4,missing.jpg
+Dee,dee@example.com,admin,pw5,,
+Eve,eve@example.com,student,pw6,M6,eve.jpg
+Fay,,student,pw7,M7,ada.jpg
+"""
+IMAGES = {"ada.jpg": b"ada-face", "bob.jpg": b"bob-face", "eve.jpg": b"no face"}
+
+
+def test_bulk_enrollment_with_row_errors(tmp_path, monkeypatch):
+    SessionLocal = make_sessionmaker(tmp_path, monkeypatch)
+    job_id = upload(SessionLocal, CSV, IMAGES)
+
+    with ThreadPoolExecutor(2) as pool:
+        status = run_job(SessionLocal, job_id, executor=pool, prepare=fake_prepare, batch_size=2)
+
+    assert status["status"] == "completed"
+    assert (status["total_rows"], status["processed_rows"], status["succeeded"], status["failed"]) == (7, 7, 3, 4)
+    assert [(e["row"], e["error"]) for e in status["row_errors"]] == [
+        (3, "Duplicate email in this job"),
+        (4, "Image missing.jpg not found in archive"),
+        (6, "Embedding generation failed: no face"),
+        (7, "Missing email"),
+    ]
+    db = SessionLocal()
+    users = {u.email: u for u in db.query(User)}
+    assert set(users) == {"ada@example.com", "bob@example.com", "dee@example.com"}
+    assert users["ada@example.com"].role == "student" and users["ada@example.com"].face_embedding == b"ada-face"
+    assert users["dee@example.com"].face_embedding is None
+    db.close()
+    # The CSV holds passwords; it goes once the job is done
+    assert not os.path.exists(bulk_enrollment.job_dir(job_id))
+
+
+def test_interrupted_job_resumes_without_duplicates(tmp_path, monkeypatch):
+    SessionLocal = make_sessionmaker(tmp_path, monkeypatch)
+    csv_text = "full_name,email,role,password,image\n" + "".join(
+        f"User {i},user{i}@example.com,student,pw,face.jpg\n" for i in range(20)
+    )
+    job_id = upload(SessionLocal, csv_text, {"face.jpg": b"face"})
+
+    calls = []
+
+    def interrupted_prepare(password, image_bytes, rounds):
+        calls.append(1)
+        if len(calls) > 9:
+            raise Shutdown()
+        return fake_prepare(password, image_bytes, rounds)
+
+    with ThreadPoolExecutor(1) as pool:
+        with pytest.raises(Shutdown):
+            run_job(SessionLocal, job_id, executor=pool, prepare=interrupted_prepare, batch_size=4)
+    db = SessionLocal()
+    status = job_status(db, job_id)
+    db.close()
+    assert status["status"] == "running" and 0 < status["processed_rows"] < 10
+    assert os.path.exists(bulk_enrollment.job_dir(job_id))
+
+    with ThreadPoolExecutor(2) as pool:
+        status = run_job(SessionLocal, job_id, executor=pool, prepare=fake_prepare, batch_size=4)
+    assert status["status"] == "completed"
+    assert (status["processed_rows"], status["succeeded"], status["failed"]) == (20, 20, 0)
+    db = SessionLocal()
+    assert db.query(User).count() == 20
+    assert db.query(EnrollmentJobRow).count() == 20
+    db.close()
+
+
+def test_failed_job_deletes_its_inputs(tmp_path, monkeypatch):
+    SessionLocal = make_sessionmaker(tmp_path, monkeypatch)
+    job_id = upload(SessionLocal, CSV, IMAGES)
+
+    def failing_prepare(password, image_bytes, rounds):
+        raise RuntimeError("pool broken")
+
+    with ThreadPoolExecutor(1) as pool:
+        status = run_job(SessionLocal, job_id, executor=pool, prepare=failing_prepare)
+    assert status["status"] == "failed"
+    # The CSV holds plaintext passwords
+    assert not os.path.exists(bulk_enrollment.job_dir(job_id))
+
+
+def test_pool_workers_are_spawned_not_forked():
+    pool = bulk_enrollment.new_pool(1)
+    try:
+        assert pool._mp_context.get_start_method() == "spawn"
+    finally:
+        pool.shutdown()
+
+
+def test_existing_users_are_reported_not_duplicated(tmp_path, monkeypatch):
+    SessionLocal = make_sessionmaker(tmp_path, monkeypatch)
+    db = SessionLocal()
+    db.add(User(full_name="Ada", email="ada@example.com", password_hash="x", role="admin"))
+    db.commit()
+    db.close()
+    job_id = upload(SessionLocal, "full_name,email,role,password\nAda,ada@example.com,admin,pw\n", {})
+
+    with ThreadPoolExecutor(1) as pool:
+        status = run_job(SessionLocal, job_id, executor=pool, prepare=fake_prepare)
+    assert status["row_errors"] == [{"row": 1, "email": "ada@example.com", "error": "Email already registered"}]
+
+    db = SessionLocal()
+    assert job_status(db, job_id)["succeeded"] == 0
+    db.close()
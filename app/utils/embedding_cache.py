@@ -0,0 +1,178 @@
+# utils/embedding_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.utils.embedding_codec import decode_embedding
+
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "20000"))
+EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "3600"))
+# How stale an entry may get after another worker replaces the user's face
+EMBEDDING_CACHE_SYNC_SECONDS = float(os.getenv("EMBEDDING_CACHE_SYNC_SECONDS", "5"))
+
+
+def normalize_embedding(vector):
+    """
+    Returns a contiguous float32 unit vector.
+    """
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        raise ValueError("Stored embedding is empty")
+    return np.ascontiguousarray(vector / norm)
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of decoded, L2-normalized enrollment embeddings keyed
+    by user_id.
+
+    The worker that writes a new embedding calls `invalidate()` to see it
+    immediately. Other workers drop it on their next `sync()`: at most every
+    `sync_seconds`, one indexed query on users.updated_at finds the users
+    changed since the last one (a replaced face sets enrollment back to
+    pending), so a compromised face stops verifying within `sync_seconds`
+    everywhere. Entries also expire after `ttl_seconds`.
+    """
+
+    def __init__(
+        self,
+        max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+        ttl_seconds=EMBEDDING_CACHE_TTL_SECONDS,
+        sync_seconds=EMBEDDING_CACHE_SYNC_SECONDS,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.sync_seconds = sync_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        # Anything cached was read after this, so older changes are already in it
+        self._synced_at = datetime.now(timezone.utc)
+        self._synced = time.monotonic()
+        self._syncing = False
+        self._syncs = 0
+        self._stale_dropped = 0
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self._misses += 1
+                return None
+            vector, expires_at = entry
+            if expires_at <= now:
+                self._remove(user_id)
+                self._misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self._hits += 1
+            return vector
+
+    def put(self, user_id, blob, dtype="float32"):
+        """
+        Decodes and normalizes a stored embedding, caches it and returns the
+        cached vector.
+        """
+        vector = normalize_embedding(decode_embedding(blob, dtype))
+        vector.flags.writeable = False
+        with self._lock:
+            self._remove(user_id)
+            self._entries[user_id] = (vector, time.monotonic() + self.ttl_seconds)
+            self._bytes += vector.nbytes
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+        return vector
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._remove(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def claim_sync(self):
+        """
+        True if the last sync() is older than `sync_seconds` and the caller
+        should run one; only one caller at a time gets True.
+        """
+        with self._lock:
+            if self._syncing or time.monotonic() - self._synced < self.sync_seconds:
+                return False
+            self._syncing = True
+            return True
+
+    def sync(self, db):
+        """
+        Drops users changed since the last sync, with some slack for commits
+        that landed late. Takes a sync Session (use run_sync from async code).
+        """
+        from app.models import User
+
+        try:
+            started, started_at = time.monotonic(), datetime.now(timezone.utc)
+            since = self._synced_at - timedelta(seconds=self.sync_seconds)
+            rows = db.query(User.user_id).filter(User.updated_at >= since).all()
+            with self._lock:
+                for (user_id,) in rows:
+                    if user_id in self._entries:
+                        self._remove(user_id)
+                        self._stale_dropped += 1
+                self._synced_at, self._synced = started_at, started
+                self._syncs += 1
+        finally:
+            with self._lock:
+                self._syncing = False
+
+    def preload(self, db, user_ids):
+        """
+        Loads the embeddings of the given users in one query.
+        Returns how many were cached.
+        """
+        from app.models import User
+
+        user_ids = list(user_ids)
+        if not user_ids:
+            return 0
+        rows = db.query(User.user_id, User.face_embedding, User.embedding_dtype).filter(
+            User.user_id.in_(user_ids),
+            User.face_embedding.isnot(None),
+        ).all()
+        for user_id, blob, dtype in rows:
+            self.put(user_id, blob, dtype or "float32")
+        return len(rows)
+
+    def _remove(self, user_id):
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._bytes -= entry[0].nbytes
+
+    def stats(self):
+        lookups = self._hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "evictions": self._evictions,
+            "vector_bytes": self._bytes,
+            "syncs": self._syncs,
+            "stale_dropped": self._stale_dropped,
+        }
+
+
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,154 @@
+import types
+
+import numpy as np
+import pytest
+
+from app.models import User
+from app.utils import embedding_cache as embedding_cache_module
+from app.utils.attendance_store_test import make_sessionmaker
+from app.utils.embedding_cache import EmbeddingCache
+from app.utils.embedding_codec import encode_embedding
+
+DIM = 128
+VECTOR_BYTES = DIM * 4  # cached vectors are float32 whatever the stored dtype
+
+
+def blob(seed, dtype="float32"):
+    return encode_embedding(np.random.default_rng(seed).normal(size=DIM), dtype)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(embedding_cache_module, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_put_returns_a_read_only_unit_vector():
+    cache = EmbeddingCache()
+    vector = cache.put(1, blob(1, "float16"), "float16")
+    assert vector.dtype == np.float32 and vector.shape == (DIM,)
+    assert np.linalg.norm(vector) == pytest.approx(1.0, abs=1e-5)
+    assert not vector.flags.writeable
+    assert cache.get(1) is vector
+
+    with pytest.raises(ValueError):
+        cache.put(2, encode_embedding(np.zeros(DIM), "float32"))
+    assert cache.get(2) is None
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = EmbeddingCache(ttl_seconds=60)
+    cache.put(1, blob(1))
+    clock[0] += 59
+    assert cache.get(1) is not None
+    clock[0] += 1
+    assert cache.get(1) is None
+    stats = cache.stats()
+    assert (stats["entries"], stats["vector_bytes"]) == (0, 0)
+
+    # A fresh put restarts the clock
+    cache.put(1, blob(1))
+    clock[0] += 30
+    assert cache.get(1) is not None
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = EmbeddingCache(max_entries=3)
+    for user_id in (1, 2, 3):
+        cache.put(user_id, blob(user_id))
+    cache.get(1)  # 2 is now the oldest
+    cache.put(4, blob(4))
+    assert cache.get(2) is None
+    assert all(cache.get(user_id) is not None for user_id in (1, 3, 4))
+
+    cache.get(1)
+    cache.put(5, blob(5))  # 3 was used before 4, and 1 was used just now
+    assert cache.get(3) is None
+    stats = cache.stats()
+    assert (stats["entries"], stats["evictions"]) == (3, 2)
+
+
+def test_vector_bytes_follow_put_evict_and_invalidate():
+    cache = EmbeddingCache(max_entries=2)
+    cache.put(1, blob(1))
+    cache.put(2, blob(2, "float16"), "float16")
+    assert cache.stats()["vector_bytes"] == 2 * VECTOR_BYTES
+
+    cache.put(1, blob(11))  # replacing doesn't double count
+    assert cache.stats()["vector_bytes"] == 2 * VECTOR_BYTES
+    cache.put(3, blob(3))  # evicts 2
+    assert cache.stats()["vector_bytes"] == 2 * VECTOR_BYTES
+
+    cache.invalidate(1)
+    cache.invalidate(99)
+    assert cache.stats()["vector_bytes"] == VECTOR_BYTES
+    cache.clear()
+    assert cache.stats()["vector_bytes"] == 0
+
+
+def test_hit_and_miss_stats():
+    cache = EmbeddingCache()
+    assert cache.stats()["hit_rate"] == 0.0
+    cache.get(1)
+    cache.put(1, blob(1))
+    cache.get(1)
+    cache.get(1)
+    cache.invalidate(1)
+    cache.get(1)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 2)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_preload_caches_enrolled_users_in_one_go(tmp_path):
+    SessionLocal = make_sessionmaker(tmp_path)
+    db = SessionLocal()
+    users = [
+        User(full_name="a", email="a@example.com", password_hash="x", role="student", face_embedding=blob(1), embedding_dtype="float32"),
+        User(full_name="b", email="b@example.com", password_hash="x", role="student"),
+    ]
+    db.add_all(users)
+    db.commit()
+
+    cache = EmbeddingCache()
+    assert cache.preload(db, [user.user_id for user in users]) == 1
+    assert cache.get(users[0].user_id) is not None
+    assert cache.get(users[1].user_id) is None
+    assert cache.preload(db, []) == 0
+    db.close()
+
+
+def test_sync_drops_users_changed_by_another_worker(tmp_path):
+    SessionLocal = make_sessionmaker(tmp_path)
+    db = SessionLocal()
+    users = [
+        User(full_name=name, email=f"{name}@example.com", password_hash="x", role="student",
+             face_embedding=blob(seed), embedding_dtype="float32")
+        for seed, name in enumerate(("a", "b"), start=1)
+    ]
+    db.add_all(users)
+    db.commit()
+
+    cache = EmbeddingCache(sync_seconds=0)
+    for user in users:
+        cache.put(user.user_id, user.face_embedding)
+    # Another worker takes a replacement photo for the first user
+    users[0].enrollment_status = "pending"
+    db.commit()
+
+    assert cache.claim_sync()
+    cache.sync(db)
+    assert cache.get(users[0].user_id) is None
+    assert cache.get(users[1].user_id) is not None
+    stats = cache.stats()
+    assert (stats["syncs"], stats["stale_dropped"]) == (1, 1)
+    db.close()
+
+
+def test_one_sync_at_a_time_and_at_most_every_sync_seconds(clock):
+    cache = EmbeddingCache(sync_seconds=5)
+    assert not cache.claim_sync()
+    clock[0] += 5
+    assert cache.claim_sync()
+    assert not cache.claim_sync()  # the first caller is still syncing
@@ -0,0 +1,46 @@
+# utils/embedding_codec.py
+import os
+
+import numpy as np
+
+# Storage dtypes for User.face_embedding; the tag is kept in User.embedding_dtype
+EMBEDDING_DTYPES = {
+    "float32": np.float32,
+    "float16": np.float16,
+    "int8": np.int8,
+}
+
+# Bumped whenever detection/alignment/normalization changes in a way that makes
+# old embeddings incomparable with new ones
+EMBEDDING_VERSION = 1
+
+FACE_EMBEDDING_DTYPE = os.getenv("FACE_EMBEDDING_DTYPE", "float32")
+
+_INT8_SCALE = 127.0
+
+
+def encode_embedding(embedding, dtype=FACE_EMBEDDING_DTYPE):
+    """
+    Serializes an embedding to raw bytes in the given storage dtype.
+
+    int8 stores the L2-normalized vector scaled to [-127, 127]. Only the
+    direction survives, which is all cosine similarity looks at.
+    """
+    if dtype not in EMBEDDING_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+    vector = np.asarray(embedding, dtype=np.float32).ravel()
+    if dtype == "int8":
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            raise ValueError("Cannot quantize a zero embedding")
+        vector = np.clip(np.rint(vector / norm * _INT8_SCALE), -_INT8_SCALE, _INT8_SCALE)
+    return vector.astype(EMBEDDING_DTYPES[dtype]).tobytes()
+
+
+def decode_embedding(blob, dtype="float32"):
+    """
+    Returns a read-only NumPy view over the stored bytes (no copy).
+    """
+    if dtype not in EMBEDDING_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+    return np.frombuffer(blob, dtype=EMBEDDING_DTYPES[dtype])
@@ -0,0 +1,29 @@
+import numpy as np
+
+from app.utils.embedding_codec import decode_embedding, encode_embedding
+
+
+def cosine(a, b):
+    a = a.astype(np.float32)
+    b = b.astype(np.float32)
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def test_float32_round_trip_is_a_view():
+    embedding = np.random.default_rng(0).standard_normal(128).astype(np.float32)
+    blob = encode_embedding(embedding, "float32")
+    decoded = decode_embedding(blob, "float32")
+    assert len(blob) == 128 * 4
+    assert np.array_equal(decoded, embedding)
+    assert not decoded.flags.writeable  # backed by the bytes, not a copy
+
+
+def test_quantized_dtypes_keep_cosine_similarity():
+    rng = np.random.default_rng(1)
+    a = rng.standard_normal(128).astype(np.float32)
+    b = a + 0.3 * rng.standard_normal(128).astype(np.float32)
+    expected = cosine(a, b)
+    for dtype, size in (("float16", 256), ("int8", 128)):
+        blob = encode_embedding(a, dtype)
+        assert len(blob) == size
+        assert abs(cosine(decode_embedding(blob, dtype), b) - expected) < 0.01
@@ -0,0 +1,211 @@
+# utils/embedding_index.py
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.utils.embedding_cache import normalize_embedding
+from app.utils.embedding_codec import decode_embedding
+
+try:
+    import hnswlib  # optional: approximate search for very large enrollments
+except ImportError:
+    hnswlib = None
+
+EMBEDDING_INDEX_ANN_THRESHOLD = int(os.getenv("EMBEDDING_INDEX_ANN_THRESHOLD", "50000"))
+EMBEDDING_INDEX_SYNC_SECONDS = float(os.getenv("EMBEDDING_INDEX_SYNC_SECONDS", "5"))
+
+
+class EmbeddingIndex:
+    """
+    In-memory 1:N face index over every enrolled user.
+
+    Embeddings live L2-normalized in one contiguous (N, D) float32 matrix,
+    so a search is a single matrix-vector product. Past `ann_threshold`
+    rows, and only if hnswlib is installed, searches go through an HNSW
+    graph instead.
+    """
+
+    def __init__(self, ann_threshold=EMBEDDING_INDEX_ANN_THRESHOLD):
+        self.ann_threshold = ann_threshold
+        self._matrix = None
+        self._ids = None
+        self._size = 0
+        self._rows = {}
+        self._ann = None
+        self._ann_deleted = set()
+        self._max_user_id = 0
+        self._last_sync = 0.0
+        self._synced_at = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def dim(self):
+        return None if self._matrix is None else self._matrix.shape[1]
+
+    def build(self, db):
+        """
+        Replaces the index with every enrolled user in the database.
+        """
+        from app.models import User
+
+        synced_at = datetime.now(timezone.utc)
+        rows = db.query(User.user_id, User.face_embedding, User.embedding_dtype).filter(
+            User.face_embedding.isnot(None),
+            User.enrollment_status == "complete",
+        ).all()
+        with self._lock:
+            self._synced_at = synced_at
+            self._matrix = None
+            self._ids = None
+            self._size = 0
+            self._rows = {}
+            self._ann = None
+            self._ann_deleted = set()
+            self._max_user_id = 0
+            if rows:
+                vectors = np.stack([decode_embedding(blob, dtype or "float32") for _, blob, dtype in rows])
+                vectors = vectors.astype(np.float32)
+                vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                self._matrix = np.ascontiguousarray(vectors)
+                self._ids = np.array([user_id for user_id, _, _ in rows], dtype=np.int64)
+                self._size = len(rows)
+                self._rows = {int(user_id): i for i, user_id in enumerate(self._ids)}
+                self._max_user_id = int(self._ids.max())
+            self._last_sync = time.monotonic()
+            self._maybe_build_ann()
+        return self._size
+
+    def sync(self, db, force=False):
+        """
+        Picks up users registered by other worker processes since the last
+        sync (anything with a higher user_id), and users changed since
+        (updated_at, with some slack for commits that landed late): a new
+        embedding replaces the old one, and users whose enrollment went
+        back to pending or failed are dropped. Rate-limited unless forced.
+        """
+        from sqlalchemy import or_
+
+        from app.models import User
+
+        if not force and time.monotonic() - self._last_sync < EMBEDDING_INDEX_SYNC_SECONDS:
+            return 0
+        self._last_sync = time.monotonic()
+        changed = User.user_id > self._max_user_id
+        if self._synced_at is not None:
+            since = self._synced_at - timedelta(seconds=EMBEDDING_INDEX_SYNC_SECONDS)
+            changed = or_(changed, User.updated_at >= since)
+        self._synced_at = datetime.now(timezone.utc)
+        rows = db.query(User.user_id, User.face_embedding, User.embedding_dtype, User.enrollment_status).filter(
+            changed
+        ).all()
+        for user_id, blob, dtype, status in rows:
+            if blob is not None and status == "complete":
+                self.add(user_id, blob, dtype or "float32")
+            else:
+                self.remove(user_id)
+        return len(rows)
+
+    def add(self, user_id, blob, dtype="float32"):
+        vector = normalize_embedding(decode_embedding(blob, dtype))
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.empty((16, vector.shape[0]), dtype=np.float32)
+                self._ids = np.empty(16, dtype=np.int64)
+            row = self._rows.get(user_id)
+            known = row is not None
+            if row is None:
+                if self._size == len(self._ids):
+                    self._grow()
+                row = self._size
+                self._size += 1
+                self._rows[user_id] = row
+            self._matrix[row] = vector
+            self._ids[row] = user_id
+            self._max_user_id = max(self._max_user_id, int(user_id))
+            if self._ann is not None:
+                label = np.array([user_id])
+                if user_id in self._ann_deleted:
+                    # Re-enrolled after remove(): revive its own slot rather than
+                    # take another deleted one, which would leave two entries
+                    self._ann.unmark_deleted(user_id)
+                    self._ann_deleted.discard(user_id)
+                    self._ann.add_items(vector[np.newaxis], label)
+                elif known:
+                    self._ann.add_items(vector[np.newaxis], label)  # updates in place
+                else:
+                    if self._ann.get_max_elements() <= self._ann.get_current_count():
+                        self._ann.resize_index(self._ann.get_max_elements() * 2)
+                    self._ann.add_items(vector[np.newaxis], label, replace_deleted=True)
+            else:
+                self._maybe_build_ann()
+
+    def remove(self, user_id):
+        with self._lock:
+            row = self._rows.pop(user_id, None)
+            if row is None:
+                return
+            # Move the last row into the hole to keep the matrix contiguous
+            last = self._size - 1
+            if row != last:
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = self._ids[last]
+                self._rows[int(self._ids[row])] = row
+            self._size -= 1
+            if self._ann is not None:
+                self._ann.mark_deleted(user_id)
+                self._ann_deleted.add(user_id)
+
+    def search(self, embedding, k=1):
+        """
+        Returns up to k (user_id, cosine_similarity) pairs, best first.
+        """
+        query = normalize_embedding(embedding)
+        with self._lock:
+            if self._size == 0:
+                return []
+            k = min(k, self._size)
+            if self._ann is not None:
+                labels, distances = self._ann.knn_query(query, k=k)
+                return [(int(user_id), float(1 - distance)) for user_id, distance in zip(labels[0], distances[0])]
+            scores = self._matrix[:self._size] @ query
+            if k == 1:
+                top = np.array([np.argmax(scores)])
+            else:
+                top = np.argpartition(-scores, k - 1)[:k]
+                top = top[np.argsort(-scores[top])]
+            return [(int(self._ids[i]), float(scores[i])) for i in top]
+
+    def _grow(self):
+        capacity = len(self._ids) * 2
+        matrix = np.empty((capacity, self._matrix.shape[1]), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        ids = np.empty(capacity, dtype=np.int64)
+        ids[:self._size] = self._ids[:self._size]
+        self._matrix = matrix
+        self._ids = ids
+
+    def _maybe_build_ann(self):
+        if hnswlib is None or self._size < self.ann_threshold:
+            return
+        ann = hnswlib.Index(space="cosine", dim=self.dim)
+        ann.init_index(max_elements=self._size * 2, ef_construction=200, M=16, allow_replace_deleted=True)
+        ann.add_items(self._matrix[:self._size], self._ids[:self._size])
+        ann.set_ef(64)
+        self._ann = ann
+
+    def stats(self):
+        return {
+            "users": self._size,
+            "dim": self.dim,
+            "backend": "hnsw" if self._ann is not None else "exact",
+            "matrix_bytes": 0 if self._matrix is None else self._matrix.nbytes,
+        }
+
+
+embedding_index = EmbeddingIndex()
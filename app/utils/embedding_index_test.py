@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from app.models import User
+from app.utils.attendance_store_test import make_sessionmaker
+from app.utils.embedding_codec import encode_embedding
+from app.utils.embedding_index import EmbeddingIndex, hnswlib
+
+DIM = 16
+
+
+def unit(i):
+    # Orthogonal directions, so every user's best match is unambiguous
+    vector = np.zeros(DIM, dtype=np.float32)
+    vector[i] = 1.0
+    return vector
+
+
+def blob(vector):
+    return encode_embedding(vector, "float32")
+
+
+def near(i, j, weight=0.3):
+    # Mostly i, a little j
+    return unit(i) + weight * unit(j)
+
+
+BACKENDS = ["exact"] + (["hnsw"] if hnswlib is not None else [])
+
+
+def make_index(backend, users=range(1, 9)):
+    # The ANN path kicks in past ann_threshold rows
+    index = EmbeddingIndex(ann_threshold=4 if backend == "hnsw" else 10**9)
+    for user_id in users:
+        index.add(user_id, blob(unit(user_id)))
+    assert index.stats()["backend"] == backend
+    return index
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_top_k_search_is_best_first(backend):
+    index = make_index(backend)
+    results = index.search(near(3, 5), k=3)
+    assert [user_id for user_id, _ in results][:2] == [3, 5]
+    assert results[0][1] == pytest.approx(1 / np.sqrt(1.09), abs=1e-3)
+    assert results[0][1] > results[1][1] >= results[2][1]
+    assert len(index.search(unit(3), k=50)) == 8
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_replacing_a_user_keeps_one_entry(backend):
+    index = make_index(backend)
+    # A deleted slot exists, which a replacement must not take
+    index.remove(5)
+    index.add(3, blob(unit(12)))
+    assert len(index) == 7
+    assert index.search(unit(12), k=1)[0][0] == 3
+    ids = [user_id for user_id, _ in index.search(unit(3), k=7)]
+    assert sorted(ids) == [1, 2, 3, 4, 6, 7, 8]
+    assert 3 not in [user_id for user_id, score in index.search(unit(3), k=7) if score > 0.5]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_removed_user_is_not_found_and_can_come_back(backend):
+    index = make_index(backend)
+    index.remove(3)
+    index.remove(99)
+    assert len(index) == 7
+    assert 3 not in [user_id for user_id, _ in index.search(unit(3), k=7)]
+    # The last row moved into the hole still answers for its user
+    assert index.search(unit(8), k=1)[0][0] == 8
+
+    index.add(3, blob(unit(13)))
+    assert len(index) == 8
+    assert index.search(unit(13), k=1)[0][0] == 3
+    if backend == "hnsw":
+        # A later new user takes no slot of its own twice
+        index.add(20, blob(unit(14)))
+        ids = [user_id for user_id, _ in index.search(unit(13), k=9)]
+        assert sorted(ids) == sorted(set(ids))
+
+
+def add_user(db, email, vector, status="complete"):
+    user = User(
+        full_name=email, email=email, password_hash="x", role="student",
+        face_embedding=blob(vector) if vector is not None else None, embedding_dtype="float32",
+        enrollment_status=status,
+    )
+    db.add(user)
+    db.commit()
+    return user.user_id
+
+
+def test_build_and_sync_follow_enrollment_status(tmp_path):
+    SessionLocal = make_sessionmaker(tmp_path)
+    db = SessionLocal()
+    enrolled = add_user(db, "a@example.com", unit(1))
+    add_user(db, "b@example.com", unit(2), status="pending")
+    add_user(db, "c@example.com", None)
+
+    index = EmbeddingIndex()
+    assert index.build(db) == 1
+    assert index.search(unit(1), k=1)[0][0] == enrolled
+
+    # Another worker registers a user and re-enrolls the first one
+    later = add_user(db, "d@example.com", unit(4))
+    user = db.get(User, enrolled)
+    user.enrollment_status = "pending"
+    db.commit()
+    index.sync(db, force=True)
+    assert [user_id for user_id, _ in index.search(unit(4), k=5)] == [later]
+
+    user.face_embedding = blob(unit(6))
+    user.enrollment_status = "complete"
+    db.commit()
+    index.sync(db, force=True)
+    assert index.search(unit(6), k=1)[0][0] == enrolled
+    assert len(index) == 2
+    db.close()
@@ -0,0 +1,58 @@
+# utils/enrollment_jobs.py
+from app.models import User
+from app.utils.job_queue import PermanentJobError, enqueue, job_queue
+
+EMBEDDING_JOB = "enrollment_embedding"
+
+
+def enqueue_enrollment(db, user, image_bytes):
+    """
+    Marks the user's enrollment pending and queues the embedding of their
+    photo. The caller commits.
+    """
+    user.enrollment_status = "pending"
+    db.flush()
+    job = enqueue(db, EMBEDDING_JOB, {"user_id": user.user_id}, data=image_bytes)
+    user.enrollment_job_id = job.job_id
+    return job
+
+
+def compute_embedding(db, job):
+    from app.utils.embedding_cache import embedding_cache
+    from app.utils.embedding_codec import EMBEDDING_VERSION, FACE_EMBEDDING_DTYPE
+    from app.utils.embedding_index import embedding_index
+    from app.utils.face_model import face_model
+    from app.utils.face_recognition import generate_face_embedding
+    from app.utils.image_preprocess import decode_image
+
+    user = db.get(User, job.payload["user_id"])
+    if user is None or user.enrollment_job_id != job.job_id:
+        # Deleted, or a newer photo was uploaded since; nothing to do
+        return None
+    # A model that fails to load is worth retrying; past this point a
+    # ValueError means the photo itself is unusable
+    face_model.load()
+    try:
+        embedding = generate_face_embedding(decode_image(job.data))
+    except ValueError as e:
+        raise PermanentJobError(str(e))
+    user.face_embedding = embedding
+    user.embedding_dtype = FACE_EMBEDDING_DTYPE
+    user.embedding_model = face_model.model_name
+    user.embedding_version = EMBEDDING_VERSION
+    user.enrollment_status = "complete"
+    user_id = user.user_id
+
+    def publish():
+        embedding_cache.invalidate(user_id)
+        embedding_index.add(user_id, embedding, FACE_EMBEDDING_DTYPE)
+    return publish
+
+
+def enrollment_failed(db, job, error):
+    user = db.get(User, job.payload["user_id"])
+    if user is not None and user.enrollment_job_id == job.job_id:
+        user.enrollment_status = "failed"
+
+
+job_queue.register(EMBEDDING_JOB, compute_embedding, on_failure=enrollment_failed)
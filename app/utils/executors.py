@@ -0,0 +1,151 @@
+# utils/executors.py
+import asyncio
+import functools
+import multiprocessing
+import os
+import time
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class ExecutorSaturated(Exception):
+    """Raised when an executor already has its maximum number of calls in flight."""
+
+
+class BoundedExecutor:
+    """
+    Runs blocking callables off the event loop with a bounded backlog.
+
+    At most `max_workers` calls run at once and at most `max_queue` more may
+    wait for a worker; anything beyond that is rejected with
+    ExecutorSaturated so callers can shed load instead of queueing forever.
+    `kind="process"` uses a process pool, whose workers run `initializer`
+    once (e.g. to load their own copy of the face model); submitted
+    callables must then be picklable module-level functions. Workers are
+    spawned, since the parent may have loaded TensorFlow, which isn't
+    fork-safe. A pool broken by a dead worker or a failing initializer is
+    replaced on the next call.
+    """
+
+    def __init__(self, name, kind="thread", max_workers=4, max_queue=64, initializer=None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.initializer = initializer
+        self._pool = None
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._restarts = 0
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+        self._run_total = 0.0
+
+    def _get_pool(self):
+        if self._pool is None:
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=self.initializer,
+                )
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix=self.name,
+                    initializer=self.initializer,
+                )
+        return self._pool
+
+    async def run(self, fn, *args, **kwargs):
+        if self._in_flight >= self.max_workers + self.max_queue:
+            self._rejected += 1
+            raise ExecutorSaturated(f"{self.name} executor is saturated")
+        self._in_flight += 1
+        submitted = time.perf_counter()
+        pool = self._get_pool()
+        try:
+            started, result = await asyncio.get_running_loop().run_in_executor(
+                pool, functools.partial(_timed_call, fn, *args, **kwargs)
+            )
+        except BrokenExecutor:
+            self._discard(pool)
+            raise
+        finally:
+            self._in_flight -= 1
+        finished = time.perf_counter()
+        # perf_counter is system-wide, so worker timestamps compare across processes
+        queue_wait = max(0.0, started - submitted)
+        self._queue_wait_total += queue_wait
+        self._queue_wait_max = max(self._queue_wait_max, queue_wait)
+        self._run_total += max(0.0, finished - started)
+        self._completed += 1
+        return result
+
+    def _discard(self, pool):
+        # A broken pool rejects every call from then on; the next one builds a new pool
+        if self._pool is pool:
+            self._pool = None
+            self._restarts += 1
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self, wait=True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+    def stats(self):
+        completed = self._completed or 1
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "restarts": self._restarts,
+            "mean_queue_wait_ms": self._queue_wait_total / completed * 1000,
+            "max_queue_wait_ms": self._queue_wait_max * 1000,
+            "mean_run_ms": self._run_total / completed * 1000,
+        }
+
+
+def _timed_call(fn, *args, **kwargs):
+    started = time.perf_counter()
+    return started, fn(*args, **kwargs)
+
+
+def _init_face_worker():
+    # Each worker process builds and warms its own copy of the model
+    from app.utils.face_model import face_model
+    face_model.warm_up()
+
+
+FACE_EXECUTOR = os.getenv("FACE_EXECUTOR", "thread")
+
+# CPU-bound face work: decoding, detection, embedding
+face_executor = BoundedExecutor(
+    "face",
+    kind=FACE_EXECUTOR,
+    max_workers=int(os.getenv("FACE_WORKERS", str(os.cpu_count() or 1))),
+    max_queue=int(os.getenv("FACE_QUEUE_DEPTH", "64")),
+    initializer=_init_face_worker if FACE_EXECUTOR == "process" else None,
+)
+
+# Blocking I/O: synchronous DB sessions, HTTP lookups
+io_executor = BoundedExecutor(
+    "io",
+    max_workers=int(os.getenv("IO_WORKERS", "32")),
+    max_queue=int(os.getenv("IO_QUEUE_DEPTH", "256")),
+)
+
+# Password hashing: bcrypt is deliberately CPU-heavy (~250 ms at cost 12) and
+# releases the GIL, so a thread per core; a login burst queues here instead
+# of tying up the io pool or the request threadpool
+password_executor = BoundedExecutor(
+    "password",
+    max_workers=int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 1))),
+    max_queue=int(os.getenv("PASSWORD_QUEUE_DEPTH", "512")),
+)
@@ -0,0 +1,86 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import BrokenExecutor
+
+import pytest
+
+from app.utils.executors import BoundedExecutor, ExecutorSaturated
+
+
+def test_rejects_once_workers_and_queue_are_full():
+    async def run():
+        executor = BoundedExecutor("test", max_workers=2, max_queue=1)
+        release = threading.Event()
+        held = [asyncio.create_task(executor.run(release.wait, 5)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        assert executor.stats()["in_flight"] == 3
+
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(time.sleep, 0)
+        stats = executor.stats()
+        assert (stats["in_flight"], stats["rejected"], stats["completed"]) == (3, 1, 0)
+
+        release.set()
+        assert await asyncio.gather(*held) == [True] * 3
+        # Capacity is back once the backlog drains
+        assert await executor.run(sum, [1, 2]) == 3
+        stats = executor.stats()
+        assert (stats["in_flight"], stats["rejected"], stats["completed"]) == (0, 1, 4)
+        executor.shutdown()
+
+    asyncio.run(run())
+
+
+def test_in_flight_is_released_when_the_call_raises():
+    async def run():
+        executor = BoundedExecutor("test", max_workers=1, max_queue=0)
+        with pytest.raises(ZeroDivisionError):
+            await executor.run(lambda: 1 / 0)
+        assert executor.stats()["in_flight"] == 0
+        assert await executor.run(int, "7") == 7
+        executor.shutdown()
+
+    asyncio.run(run())
+
+
+def test_queue_wait_and_run_time():
+    async def run():
+        executor = BoundedExecutor("test", max_workers=1, max_queue=4)
+        # The second call waits for the first to finish before it starts
+        await asyncio.gather(executor.run(time.sleep, 0.1), executor.run(time.sleep, 0.1))
+        stats = executor.stats()
+        executor.shutdown()
+        return stats
+
+    stats = asyncio.run(run())
+    assert stats["completed"] == 2
+    assert stats["max_queue_wait_ms"] >= 90
+    assert 45 <= stats["mean_queue_wait_ms"] < stats["max_queue_wait_ms"]
+    assert stats["mean_run_ms"] >= 90
+
+
+def _fail_first_initializer():
+    # Fails in the first pool's workers only; the flag file outlives them
+    flag = os.environ["EXECUTORS_TEST_FLAG"]
+    if not os.path.exists(flag):
+        open(flag, "w").close()
+        raise RuntimeError("model failed to load")
+
+
+def test_broken_process_pool_is_replaced(tmp_path, monkeypatch):
+    monkeypatch.setenv("EXECUTORS_TEST_FLAG", str(tmp_path / "flag"))
+
+    async def run():
+        executor = BoundedExecutor("test", kind="process", max_workers=1, initializer=_fail_first_initializer)
+        try:
+            with pytest.raises(BrokenExecutor):
+                await executor.run(abs, -3)
+            assert executor.stats()["restarts"] == 1
+            assert await executor.run(abs, -3) == 3
+            assert executor._pool._mp_context.get_start_method() == "spawn"
+        finally:
+            executor.shutdown()
+
+    asyncio.run(run())
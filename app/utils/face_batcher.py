@@ -0,0 +1,146 @@
+# utils/face_batcher.py
+import asyncio
+import os
+import time
+
+import numpy as np
+from app.utils.executors import face_executor
+
+FACE_BATCH_MAX_SIZE = int(os.getenv("FACE_BATCH_MAX_SIZE", "16"))
+FACE_BATCH_MAX_WAIT_MS = float(os.getenv("FACE_BATCH_MAX_WAIT_MS", "20"))
+
+
+def embed_faces(faces):
+    # Imported on first use: the batching itself doesn't need deepface
+    from app.utils.face_model import embed_faces
+    return embed_faces(faces)
+
+
+class FaceBatcher:
+    """
+    Queues preprocessed face crops and runs them through the model in batches.
+
+    A batch is dispatched as soon as it holds `max_batch_size` faces or the
+    oldest face has waited `max_wait_ms`, so a lone request is delayed by at
+    most `max_wait_ms` while a burst shares one forward pass per batch.
+    """
+
+    def __init__(self, embed=embed_faces, executor=face_executor, max_batch_size=FACE_BATCH_MAX_SIZE, max_wait_ms=FACE_BATCH_MAX_WAIT_MS):
+        self.embed_batch = embed
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._task = None
+        self._batches = 0
+        self._faces = 0
+        self._largest_batch = 0
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+        self._inference_total = 0.0
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Face batcher stopped"))
+
+    async def embed(self, face):
+        """
+        Embeds one (1, H, W, 3) face crop and returns its (D,) embedding.
+        Falls back to an unbatched call when the batcher isn't running.
+        """
+        if not self.running:
+            return (await self.executor.run(self.embed_batch, face))[0]
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((face, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self, batch):
+        batch.append(await self._queue.get())
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+    async def _run(self):
+        batch = []
+        try:
+            while True:
+                batch = []
+                await self._collect(batch)
+                await self._dispatch(batch)
+        except asyncio.CancelledError:
+            # Faces collected or in flight when stop() cancelled us
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Face batcher stopped"))
+            raise
+
+    async def _dispatch(self, batch):
+        dispatched = time.perf_counter()
+        for _, _, queued_at in batch:
+            wait = dispatched - queued_at
+            self._queue_wait_total += wait
+            self._queue_wait_max = max(self._queue_wait_max, wait)
+
+        faces = np.concatenate([face for face, _, _ in batch], axis=0)
+        try:
+            embeddings = await self.executor.run(self.embed_batch, faces)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._inference_total += time.perf_counter() - dispatched
+            self._batches += 1
+            self._faces += len(batch)
+            self._largest_batch = max(self._largest_batch, len(batch))
+
+        for i, (_, future, _) in enumerate(batch):
+            if not future.done():
+                future.set_result(embeddings[i])
+
+    def stats(self):
+        batches = self._batches or 1
+        faces = self._faces or 1
+        return {
+            "running": self.running,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self._batches,
+            "faces": self._faces,
+            "mean_batch_size": self._faces / batches,
+            "largest_batch": self._largest_batch,
+            "mean_queue_wait_ms": self._queue_wait_total / faces * 1000,
+            "max_queue_wait_ms": self._queue_wait_max * 1000,
+            "mean_inference_ms": self._inference_total / batches * 1000,
+        }
+
+
+face_batcher = FaceBatcher()
@@ -0,0 +1,148 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from app.utils.face_batcher import FaceBatcher
+
+
+class InlineExecutor:
+    """
+    Runs the embed call on the loop, optionally held until `gate` is set.
+    """
+
+    def __init__(self, gate=None):
+        self.gate = gate
+
+    async def run(self, fn, *args):
+        if self.gate is not None:
+            await self.gate.wait()
+        return fn(*args)
+
+
+class RecordingEmbed:
+    def __init__(self, error=None):
+        self.batches = []
+        self.error = error
+
+    def __call__(self, faces):
+        self.batches.append(len(faces))
+        if self.error is not None:
+            raise self.error
+        # Each face's embedding is its own fill value, so results are traceable
+        return faces[:, 0, 0, :1].astype(np.float32)
+
+
+def face(value):
+    return np.full((1, 2, 2, 3), value, dtype=np.float32)
+
+
+def make_batcher(embed, executor=None, **kwargs):
+    return FaceBatcher(embed=embed, executor=executor or InlineExecutor(), **kwargs)
+
+
+def test_full_batch_is_dispatched_without_waiting():
+    async def run():
+        embed = RecordingEmbed()
+        batcher = make_batcher(embed, max_batch_size=4, max_wait_ms=10_000)
+        await batcher.start()
+        started = time.perf_counter()
+        results = await asyncio.wait_for(asyncio.gather(*(batcher.embed(face(i)) for i in range(4))), 2)
+        assert time.perf_counter() - started < 1
+        assert embed.batches == [4]
+        assert batcher.stats()["largest_batch"] == 4
+        await batcher.stop()
+        return results
+
+    assert [float(r[0]) for r in asyncio.run(run())] == [0, 1, 2, 3]
+
+
+def test_partial_batch_is_dispatched_after_max_wait():
+    async def run():
+        embed = RecordingEmbed()
+        batcher = make_batcher(embed, max_batch_size=16, max_wait_ms=50)
+        await batcher.start()
+        started = time.perf_counter()
+        await asyncio.gather(*(batcher.embed(face(i)) for i in range(3)))
+        assert time.perf_counter() - started >= 0.05
+        assert embed.batches == [3]
+        await batcher.stop()
+
+    asyncio.run(run())
+
+
+def test_each_caller_gets_its_own_embedding():
+    async def run():
+        embed = RecordingEmbed()
+        batcher = make_batcher(embed, max_batch_size=3, max_wait_ms=20)
+
+        async def caller(value):
+            await asyncio.sleep(value % 4 / 1000)
+            return value, float((await batcher.embed(face(value)))[0])
+
+        await batcher.start()
+        results = await asyncio.gather(*(caller(i) for i in range(10)))
+        await batcher.stop()
+        assert all(value == embedded for value, embedded in results)
+        assert sum(embed.batches) == 10 and max(embed.batches) <= 3
+
+    asyncio.run(run())
+
+
+def test_a_failed_batch_fails_every_caller_in_it():
+    async def run():
+        embed = RecordingEmbed(error=ValueError("model exploded"))
+        batcher = make_batcher(embed, max_batch_size=3, max_wait_ms=10_000)
+        await batcher.start()
+        results = await asyncio.gather(*(batcher.embed(face(i)) for i in range(3)), return_exceptions=True)
+        assert [type(r) for r in results] == [ValueError] * 3
+
+        # The batcher keeps serving after a failed batch
+        embed.error = None
+        batcher.max_wait = 0.01
+        assert float((await batcher.embed(face(7)))[0]) == 7
+        await batcher.stop()
+
+    asyncio.run(run())
+
+
+def test_stop_fails_queued_and_in_flight_callers():
+    async def run():
+        gate = asyncio.Event()
+        batcher = make_batcher(RecordingEmbed(), InlineExecutor(gate), max_batch_size=2, max_wait_ms=10_000)
+        await batcher.start()
+        callers = [asyncio.create_task(batcher.embed(face(i))) for i in range(5)]
+        await asyncio.sleep(0.05)
+        # One batch of 2 is held in the executor and 3 faces are queued
+        assert batcher.stats()["queued"] == 3
+        await batcher.stop()
+        results = await asyncio.wait_for(asyncio.gather(*callers, return_exceptions=True), 2)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert not batcher.running
+
+    asyncio.run(run())
+
+
+def test_stop_fails_callers_in_a_batch_still_collecting():
+    async def run():
+        batcher = make_batcher(RecordingEmbed(), max_batch_size=16, max_wait_ms=10_000)
+        await batcher.start()
+        callers = [asyncio.create_task(batcher.embed(face(i))) for i in range(3)]
+        await asyncio.sleep(0.05)
+        assert batcher.stats()["queued"] == 0
+        await batcher.stop()
+        results = await asyncio.wait_for(asyncio.gather(*callers, return_exceptions=True), 2)
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    asyncio.run(run())
+
+
+def test_falls_back_to_unbatched_calls_when_not_running():
+    async def run():
+        embed = RecordingEmbed()
+        batcher = make_batcher(embed)
+        assert float((await batcher.embed(face(5)))[0]) == 5
+        assert embed.batches == [1]
+
+    asyncio.run(run())
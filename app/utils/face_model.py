@@ -0,0 +1,147 @@
+# utils/face_model.py
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from deepface import DeepFace
+from deepface.modules import preprocessing
+
+logger = logging.getLogger(__name__)
+
+FACE_MODEL_NAME = os.getenv("FACE_MODEL_NAME", "Facenet")
+FACE_DETECTOR_BACKEND = os.getenv("FACE_DETECTOR_BACKEND", "opencv")
+
+
+class FaceModelManager:
+    """
+    Builds the face recognition model once per process and keeps it warm.
+
+    State goes cold -> loading -> loaded -> ready, or failed if the build
+    raised. `load()` is idempotent and safe to call from several threads.
+    """
+
+    def __init__(self, model_name=FACE_MODEL_NAME, detector_backend=FACE_DETECTOR_BACKEND):
+        self.model_name = model_name
+        self.detector_backend = detector_backend
+        self.state = "cold"
+        self.error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    @property
+    def input_size(self):
+        # DeepFace models declare (height, width); resize_image wants (width, height)
+        height, width = self.load().input_shape
+        return width, height
+
+    def load(self):
+        if self._model is not None:
+            return self._model
+        with self._lock:
+            if self._model is not None:
+                return self._model
+            self.state = "loading"
+            started = time.perf_counter()
+            try:
+                model = DeepFace.build_model(self.model_name)
+            except Exception as e:
+                self.state = "failed"
+                self.error = str(e)
+                raise
+            self.load_seconds = time.perf_counter() - started
+            self.error = None
+            self.state = "loaded"
+            self._model = model
+            logger.info("Loaded %s in %.2fs", self.model_name, self.load_seconds)
+            return model
+
+    def warm_up(self):
+        """
+        Runs one detection and one inference on a blank frame so the detector
+        and the model graph are built before the first real request.
+        """
+        model = self.load()
+        width, height = self.input_size
+        started = time.perf_counter()
+        blank = np.zeros((height * 2, width * 2, 3), dtype=np.uint8)
+        DeepFace.extract_faces(blank, detector_backend=self.detector_backend, enforce_detection=False)
+        model.forward(np.zeros((1, height, width, 3), dtype=np.float32))
+        self.warmup_seconds = time.perf_counter() - started
+        self.state = "ready"
+        logger.info("Warmed up %s in %.3fs", self.model_name, self.warmup_seconds)
+
+    def extract_face(self, image):
+        """
+        Detects and aligns the first face in a BGR image.
+        Returns a model-ready (1, H, W, 3) float32 tensor.
+        """
+        faces = DeepFace.extract_faces(
+            image,
+            detector_backend=self.detector_backend,
+            enforce_detection=True,
+            align=True,
+        )
+        # extract_faces returns RGB in [0, 1]; the model was trained on BGR
+        face = faces[0]["face"][:, :, ::-1]
+        face = preprocessing.resize_image(img=face, target_size=self.input_size)
+        return preprocessing.normalize_input(img=face, normalization="base").astype(np.float32)
+
+    def embed_faces(self, faces):
+        """
+        Runs the model on a (N, H, W, 3) batch of preprocessed faces.
+        Returns an (N, D) float32 array.
+        """
+        model = self.load()
+        network = getattr(model, "model", None)
+        if network is not None and hasattr(network, "predict_on_batch"):
+            # The Keras model itself: depending on the deepface version,
+            # forward() returns only the first row of a batch
+            embeddings = network(faces, training=False)
+        else:
+            # Not a Keras model (e.g. Dlib, SFace): one face at a time
+            embeddings = [model.forward(face[np.newaxis]) for face in faces]
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.ndim != 2 or embeddings.shape[0] != len(faces):
+            raise RuntimeError(
+                f"{self.model_name} returned embeddings of shape {embeddings.shape} for {len(faces)} faces"
+            )
+        return embeddings
+
+    def represent(self, image):
+        return self.embed_faces(self.extract_face(image))[0]
+
+    def stats(self):
+        return {
+            "model": self.model_name,
+            "detector": self.detector_backend,
+            "state": self.state,
+            "ready": self.ready,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "error": self.error,
+        }
+
+
+face_model = FaceModelManager()
+
+
+# Module-level entry points so calls pickle cleanly into a process pool
+def warm_up():
+    face_model.warm_up()
+    return face_model.stats()
+
+
+def extract_face(image):
+    return face_model.extract_face(image)
+
+
+def embed_faces(faces):
+    return face_model.embed_faces(faces)
@@ -0,0 +1,143 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("deepface")
+
+from app.utils import face_model as face_model_module
+from app.utils.face_model import FaceModelManager
+
+
+class StubNetwork:
+    """
+    Stands in for the Keras model DeepFace wraps.
+    """
+
+    def __init__(self, rows=None):
+        self.rows = rows  # a broken model returning the wrong number of rows
+
+    def predict_on_batch(self, faces):
+        return self(faces)
+
+    def __call__(self, faces, training=False):
+        # Row i is face i's mean pixel, so rows are traceable to their faces
+        rows = len(faces) if self.rows is None else self.rows
+        return np.repeat(faces.mean(axis=(1, 2, 3))[:rows, np.newaxis], 128, axis=1)
+
+
+class StubModel:
+    input_shape = (160, 152)  # (height, width), as DeepFace models declare it
+
+    def __init__(self, network=None):
+        self.model = network if network is not None else StubNetwork()
+        self.forward_shapes = []
+
+    def forward(self, faces):
+        # Like older deepface versions: the first face's embedding only
+        self.forward_shapes.append(faces.shape)
+        return np.full(128, faces[0].mean())
+
+
+class StubBuild:
+    def __init__(self, fail=0, delay=0.0):
+        self.calls = 0
+        self.fail = fail
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def __call__(self, model_name):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        time.sleep(self.delay)
+        if calls <= self.fail:
+            raise ValueError(f"cannot build {model_name}")
+        return StubModel()
+
+
+@pytest.fixture
+def build(monkeypatch):
+    def install(**kwargs):
+        stub = StubBuild(**kwargs)
+        monkeypatch.setattr(face_model_module.DeepFace, "build_model", stub)
+        return stub
+    return install
+
+
+def test_states_from_cold_to_ready(build, monkeypatch):
+    build()
+    detections = []
+    monkeypatch.setattr(face_model_module.DeepFace, "extract_faces", lambda image, **kwargs: detections.append(image.shape))
+    manager = FaceModelManager(model_name="Stub")
+    assert manager.stats()["state"] == "cold" and not manager.ready
+
+    model = manager.load()
+    assert manager.state == "loaded" and not manager.ready
+    assert manager.load_seconds is not None
+    assert manager.input_size == (152, 160)
+
+    manager.warm_up()
+    assert manager.ready
+    assert detections == [(320, 304, 3)]
+    assert model.forward_shapes == [(1, 160, 152, 3)]
+    assert manager.stats()["warmup_seconds"] is not None
+
+    embeddings = manager.embed_faces(np.zeros((3, 160, 152, 3), dtype=np.float32))
+    assert embeddings.shape == (3, 128) and embeddings.dtype == np.float32
+
+
+def faces(count):
+    return np.stack([np.full((160, 152, 3), i, dtype=np.float32) for i in range(count)])
+
+
+def test_embed_faces_returns_one_row_per_face(build):
+    build()
+    manager = FaceModelManager(model_name="Stub")
+    assert manager.embed_faces(faces(4))[:, 0].tolist() == [0, 1, 2, 3]
+
+    # Without a Keras model each face goes through forward() alone
+    manager.load().model = None
+    assert manager.embed_faces(faces(3))[:, 0].tolist() == [0, 1, 2]
+
+
+def test_embed_faces_rejects_a_wrong_shape(build):
+    build()
+    manager = FaceModelManager(model_name="Stub")
+    manager.load().model = StubNetwork(rows=1)
+    with pytest.raises(RuntimeError, match="shape"):
+        manager.embed_faces(faces(4))
+
+
+def test_failed_load_is_reported_and_retried(build):
+    stub = build(fail=1)
+    manager = FaceModelManager(model_name="Stub")
+    with pytest.raises(ValueError, match="cannot build Stub"):
+        manager.load()
+    stats = manager.stats()
+    assert (stats["state"], stats["error"], stats["load_seconds"]) == ("failed", "cannot build Stub", None)
+
+    # The next call tries again and clears the error
+    manager.load()
+    assert (manager.state, manager.error, stub.calls) == ("loaded", None, 2)
+
+
+def test_concurrent_loads_build_the_model_once(build):
+    stub = build(delay=0.05)
+    manager = FaceModelManager(model_name="Stub")
+    barrier = threading.Barrier(8)
+    models = []
+
+    def load():
+        barrier.wait()
+        models.append(manager.load())
+
+    threads = [threading.Thread(target=load) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stub.calls == 1
+    assert len(models) == 8 and all(model is models[0] for model in models)
+    assert manager.load() is models[0] and stub.calls == 1
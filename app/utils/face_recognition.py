@@ -1,38 +1,62 @@
 # utils/face_recognition.py
-from deepface import DeepFace
+from app.utils.face_model import face_model
+from app.utils.embedding_codec import FACE_EMBEDDING_DTYPE, decode_embedding, encode_embedding
+from app.utils.embedding_cache import normalize_embedding
+from app.utils.image_preprocess import decode_image
 import numpy as np
-import base64
-import cv2
 
 # Generate embedding from an image file or numpy array
-def generate_face_embedding(image):
+def generate_face_embedding(image, dtype=FACE_EMBEDDING_DTYPE):
     """
-    Takes an image (numpy array or path) and returns a serialized embedding string.
+    Takes an image (numpy array or path) and returns the embedding as raw bytes
+    in the given storage dtype (see embedding_codec).
     """
     try:
-        embedding_result = DeepFace.represent(image, model_name="Facenet")[0]["embedding"]
-        embedding_array = np.array(embedding_result, dtype=np.float32)
-        return base64.b64encode(embedding_array.tobytes()).decode("utf-8")
+        embedding_array = face_model.represent(image)
+        return encode_embedding(embedding_array, dtype)
     except Exception as e:
         raise ValueError(f"Embedding generation failed: {e}")
 
+# Decode an upload and crop its face in one step, so a process pool only
+# has to pickle the raw bytes
+def extract_face_from_bytes(image_bytes):
+    frame = decode_image(image_bytes)
+    return face_model.extract_face(frame)
+
 # Compare face embedding with stored embedding
-def verify_face(image, stored_embedding_str, threshold=0.4):
+def verify_face(image, stored_embedding, threshold=0.4, dtype="float32"):
     """
     Compares an image against stored embedding.
     Returns True if match score is within threshold.
     """
     try:
-        stored_embedding = np.frombuffer(base64.b64decode(stored_embedding_str), dtype=np.float32)
-        current_embedding_result = DeepFace.represent(image, model_name="Facenet")[0]["embedding"]
-        current_embedding = np.array(current_embedding_result, dtype=np.float32)
+        current_embedding = face_model.represent(image)
+    except Exception as e:
+        raise ValueError(f"Face verification failed: {e}")
+    return verify_embedding(current_embedding, stored_embedding, threshold, dtype)
+
+# Compare an already computed embedding with stored embedding
+def verify_embedding(current_embedding, stored_embedding, threshold=0.4, dtype="float32"):
+    """
+    Same as verify_face, for callers that computed the embedding themselves
+    (e.g. through the batcher).
+    """
+    try:
+        stored_vector = normalize_embedding(decode_embedding(stored_embedding, dtype))
+    except Exception as e:
+        raise ValueError(f"Face verification failed: {e}")
+    return verify_normalized(current_embedding, stored_vector, threshold)
 
-        # Cosine similarity
-        similarity = np.dot(stored_embedding, current_embedding) / (
-            np.linalg.norm(stored_embedding) * np.linalg.norm(current_embedding)
-        )
+# Compare against a stored embedding that is already an L2 unit vector
+def verify_normalized(current_embedding, stored_unit_vector, threshold=0.4):
+    """
+    Cosine similarity against a pre-normalized vector (e.g. from the
+    embedding cache); only the fresh embedding needs its norm computed.
+    """
+    try:
+        similarity = np.dot(stored_unit_vector, current_embedding) / np.linalg.norm(current_embedding)
 
         # DeepFace returns cosine similarity; higher is more similar
         return similarity > (1 - threshold), similarity
     except Exception as e:
-        raise ValueError(f"Face verification failed: {e}")
\ No newline at end of file
+        raise ValueError(f"Face verification failed: {e}")
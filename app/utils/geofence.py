@@ -0,0 +1,132 @@
+# utils/geofence.py
+import json
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000
+METERS_PER_DEGREE_LAT = 111320.0
+
+
+def haversine_np(lat1, lon1, lat2, lon2):
+    """
+    Vectorized haversine distance in meters; arguments broadcast like NumPy arrays.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class Zone:
+    """
+    Base for geofence zones. `contains` takes arrays of latitudes and
+    longitudes and returns a boolean mask; points outside the zone's
+    bounding box are rejected before the exact test runs.
+    """
+
+    min_lat = max_lat = min_lon = max_lon = 0.0
+
+    def contains(self, lats, lons):
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        result = np.zeros(lats.shape, dtype=bool)
+        candidates = np.flatnonzero(
+            (lats >= self.min_lat) & (lats <= self.max_lat) & (lons >= self.min_lon) & (lons <= self.max_lon)
+        )
+        if candidates.size:
+            result.flat[candidates] = self._contains_exact(lats.flat[candidates], lons.flat[candidates])
+        return result
+
+    def contains_point(self, lat, lon):
+        return bool(self.contains(np.array([lat]), np.array([lon]))[0])
+
+    def _contains_exact(self, lats, lons):
+        raise NotImplementedError
+
+
+class CircleZone(Zone):
+    def __init__(self, lat, lon, radius_meters):
+        self.lat = float(lat)
+        self.lon = float(lon)
+        self.radius_meters = float(radius_meters)
+        dlat = self.radius_meters / METERS_PER_DEGREE_LAT
+        # Widen the longitude box towards the poles; give up on it past ~89°
+        cos_lat = np.cos(np.radians(min(abs(self.lat) + dlat, 89.0)))
+        dlon = self.radius_meters / (METERS_PER_DEGREE_LAT * cos_lat)
+        self.min_lat, self.max_lat = self.lat - dlat, self.lat + dlat
+        self.min_lon, self.max_lon = self.lon - dlon, self.lon + dlon
+
+    def _contains_exact(self, lats, lons):
+        return haversine_np(lats, lons, self.lat, self.lon) <= self.radius_meters
+
+
+class PolygonZone(Zone):
+    """
+    Simple polygon given as [(lat, lon), ...]; not valid across the antimeridian.
+
+    Points are projected onto a local equirectangular plane (fine at building
+    scale) and tested with even-odd ray casting, one vectorized pass per edge.
+    """
+
+    def __init__(self, vertices):
+        vertices = np.asarray(vertices, dtype=np.float64)
+        if vertices.ndim != 2 or vertices.shape[1] != 2 or len(vertices) < 3:
+            raise ValueError("A polygon needs at least three [lat, lon] points")
+        self.vertices = vertices
+        self.min_lat, self.min_lon = vertices.min(axis=0)
+        self.max_lat, self.max_lon = vertices.max(axis=0)
+        self._lon_scale = np.cos(np.radians((self.min_lat + self.max_lat) / 2))
+        self._ys = vertices[:, 0]
+        self._xs = vertices[:, 1] * self._lon_scale
+
+    def _contains_exact(self, lats, lons):
+        xs = lons * self._lon_scale
+        inside = np.zeros(lats.shape, dtype=bool)
+        x1, y1 = self._xs[-1], self._ys[-1]
+        for x2, y2 in zip(self._xs, self._ys):
+            crosses = (y1 > lats) != (y2 > lats)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                x_at = (x2 - x1) * (lats - y1) / (y2 - y1) + x1
+            inside ^= crosses & (xs < x_at)
+            x1, y1 = x2, y2
+        return inside
+
+
+def parse_geofence(value):
+    """
+    Parses a stored geofence (JSON list of [lat, lon] pairs) into a PolygonZone.
+    """
+    points = json.loads(value) if isinstance(value, str) else value
+    return PolygonZone(points)
+
+
+def zone_for_session(session):
+    """
+    The zone a session enforces: its polygon if it has one, else its circle,
+    else None (no location restriction).
+    """
+    if getattr(session, "geofence", None):
+        return parse_geofence(session.geofence)
+    if session.gps_lat is not None and session.gps_lon is not None and session.allowed_radius:
+        return CircleZone(session.gps_lat, session.gps_lon, session.allowed_radius)
+    return None
+
+
+def audit_session_records(db, session):
+    """
+    Re-validates every stored check-in of a session against its current zone.
+    Returns (record_ids_outside, records_checked).
+    """
+    from app.models import AttendanceRecord
+
+    zone = zone_for_session(session)
+    rows = db.query(AttendanceRecord.record_id, AttendanceRecord.gps_lat, AttendanceRecord.gps_lon).filter(
+        AttendanceRecord.session_id == session.session_id,
+        AttendanceRecord.gps_lat.isnot(None),
+        AttendanceRecord.gps_lon.isnot(None),
+    ).all()
+    if zone is None or not rows:
+        return [], len(rows)
+    data = np.array([(lat, lon) for _, lat, lon in rows], dtype=np.float64)
+    ids = np.array([record_id for record_id, _, _ in rows])
+    outside = ~zone.contains(data[:, 0], data[:, 1])
+    return ids[outside].tolist(), len(rows)
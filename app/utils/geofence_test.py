@@ -0,0 +1,47 @@
+import numpy as np
+
+from app.utils.geofence import CircleZone, PolygonZone, haversine_np
+from app.utils.gps_check import haversine_distance
+
+# Lecture hall footprint (roughly 100 m x 60 m), in [lat, lon]
+HALL = [
+    [6.5240, 3.3790],
+    [6.5240, 3.3799],
+    [6.5245, 3.3799],
+    [6.5245, 3.3790],
+]
+
+
+def test_haversine_matches_scalar_version():
+    rng = np.random.default_rng(0)
+    lats = rng.uniform(-80, 80, 100)
+    lons = rng.uniform(-180, 180, 100)
+    vectorized = haversine_np(lats, lons, 6.5244, 3.3792)
+    scalar = [haversine_distance(lat, lon, 6.5244, 3.3792) for lat, lon in zip(lats, lons)]
+    assert np.allclose(vectorized, scalar)
+
+
+def test_circle_zone_agrees_with_exact_distance():
+    zone = CircleZone(6.5244, 3.3792, 100)
+    rng = np.random.default_rng(1)
+    lats = 6.5244 + rng.uniform(-0.002, 0.002, 5000)
+    lons = 3.3792 + rng.uniform(-0.002, 0.002, 5000)
+    expected = haversine_np(lats, lons, 6.5244, 3.3792) <= 100
+    assert np.array_equal(zone.contains(lats, lons), expected)
+    assert expected.any() and not expected.all()
+
+
+def test_polygon_zone():
+    zone = PolygonZone(HALL)
+    lats = np.array([6.52425, 6.52425, 6.5250, 6.52401, 6.5239])
+    lons = np.array([3.37945, 3.3800, 3.37945, 3.37901, 3.37945])
+    assert zone.contains(lats, lons).tolist() == [True, False, False, True, False]
+    assert zone.contains_point(6.52425, 3.37945)
+
+
+def test_concave_polygon():
+    # L-shape: the notch at the top right is outside
+    zone = PolygonZone([[0, 0], [0, 2], [1, 2], [1, 1], [2, 1], [2, 0]])
+    assert zone.contains_point(0.5, 1.5)
+    assert zone.contains_point(1.5, 0.5)
+    assert not zone.contains_point(1.5, 1.5)
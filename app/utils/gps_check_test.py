@@ -1,9 +1,18 @@
-from gps_check import is_within_location
+from app.utils.gps_check import check_gps_location, haversine_distance
 
 # Office/lecture hall location
 OFFICE_LAT, OFFICE_LON = 6.5244, 3.3792  # Example: Lagos coordinates
 
-if is_within_location(6.5244, 3.3791, OFFICE_LAT, OFFICE_LON):
-    print("User is within the location.")
-else:
-    print("User is outside allowed location.")
+
+def test_user_within_location():
+    # ~11 m west of the office
+    assert check_gps_location(6.5244, 3.3791, OFFICE_LAT, OFFICE_LON)
+
+
+def test_user_outside_location():
+    # ~1.1 km north of the office
+    assert not check_gps_location(6.5344, 3.3792, OFFICE_LAT, OFFICE_LON)
+
+
+def test_haversine_distance():
+    assert abs(haversine_distance(6.5244, 3.3791, OFFICE_LAT, OFFICE_LON) - 11.05) < 0.1
@@ -0,0 +1,159 @@
+# utils/image_preprocess.py
+import os
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(8 * 1024 * 1024)))
+# Longest edge handed to the face detector; phone photos are often 4000+ px
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1024"))
+
+# JPEG decoders can downscale by 2/4/8 in the DCT domain, far cheaper than
+# decoding full size and resizing afterwards
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# JPEG start-of-frame markers carrying the image size (excludes DHT/JPG/DAC)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+class ImageTooLarge(ValueError):
+    """Raised when an upload exceeds MAX_UPLOAD_BYTES."""
+
+
+class PreprocessStats:
+    """
+    Running decode/resize timings for this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.images = 0
+        self.bytes_in = 0
+        self.reduced_decodes = 0
+        self.decode_seconds = 0.0
+        self.resize_seconds = 0.0
+        self.source_pixels = 0
+        self.output_pixels = 0
+
+    def record(self, size, reduced, decode_seconds, resize_seconds, source_pixels, output_pixels):
+        with self._lock:
+            self.images += 1
+            self.bytes_in += size
+            self.reduced_decodes += reduced
+            self.decode_seconds += decode_seconds
+            self.resize_seconds += resize_seconds
+            self.source_pixels += source_pixels
+            self.output_pixels += output_pixels
+
+    def stats(self):
+        images = self.images or 1
+        return {
+            "images": self.images,
+            "reduced_decodes": self.reduced_decodes,
+            "mean_bytes_in": self.bytes_in / images,
+            "mean_decode_ms": self.decode_seconds / images * 1000,
+            "mean_resize_ms": self.resize_seconds / images * 1000,
+            "mean_source_megapixels": self.source_pixels / images / 1e6,
+            "mean_output_megapixels": self.output_pixels / images / 1e6,
+        }
+
+
+preprocess_stats = PreprocessStats()
+
+
+async def read_upload(upload, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Reads an UploadFile, refusing anything over max_bytes.
+    """
+    if upload.size is not None and upload.size > max_bytes:
+        raise ImageTooLarge(f"Image exceeds {max_bytes} bytes")
+    data = await upload.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise ImageTooLarge(f"Image exceeds {max_bytes} bytes")
+    return data
+
+
+def read_limited(fileobj, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Synchronous read_upload for plain file objects (sync routes, CLI).
+    """
+    data = fileobj.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise ImageTooLarge(f"Image exceeds {max_bytes} bytes")
+    return data
+
+
+def image_dimensions(data):
+    """
+    Returns (width, height) from a JPEG or PNG header without decoding,
+    or None if the format isn't recognised.
+    """
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        width, height = struct.unpack(">II", data[16:24])
+        return width, height
+    if data[:2] != b"\xff\xd8":
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:  # standalone markers
+            i += 2
+            continue
+        (length,) = struct.unpack(">H", data[i + 2:i + 4])
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    return None
+
+
+def decode_image(data, max_edge=IMAGE_MAX_EDGE):
+    """
+    Decodes image bytes to a BGR frame whose longest edge is at most
+    max_edge. Raises ValueError if the bytes aren't a decodable image.
+    """
+    dims = image_dimensions(data)
+    flag, reduced = cv2.IMREAD_COLOR, False
+    if dims is not None and data[:2] == b"\xff\xd8":
+        longest = max(dims)
+        for factor, reduced_flag in _REDUCED_FLAGS:
+            # Never reduce below max_edge; the resize below does the rest
+            if longest // factor >= max_edge:
+                flag, reduced = reduced_flag, True
+                break
+
+    if not data:
+        raise ValueError("Invalid image")
+    started = time.perf_counter()
+    frame = cv2.imdecode(np.frombuffer(data, np.uint8), flag)
+    decoded = time.perf_counter()
+    if frame is None:
+        raise ValueError("Invalid image")
+
+    source_pixels = dims[0] * dims[1] if dims else frame.shape[0] * frame.shape[1]
+    height, width = frame.shape[:2]
+    if max(height, width) > max_edge:
+        scale = max_edge / max(height, width)
+        # After a reduced decode the remaining step is under 2x, where linear
+        # interpolation doesn't alias and is much cheaper than INTER_AREA
+        interpolation = cv2.INTER_LINEAR if scale >= 0.5 else cv2.INTER_AREA
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        frame = cv2.resize(frame, size, interpolation=interpolation)
+    resized = time.perf_counter()
+
+    preprocess_stats.record(
+        len(data), reduced, decoded - started, resized - decoded, source_pixels, frame.shape[0] * frame.shape[1]
+    )
+    return frame
@@ -0,0 +1,94 @@
+import asyncio
+import io
+
+import cv2
+import numpy as np
+import pytest
+from starlette.datastructures import UploadFile
+
+from app.utils.image_preprocess import (
+    ImageTooLarge, decode_image, image_dimensions, preprocess_stats, read_limited, read_upload,
+)
+
+
+def frame(width, height):
+    # A gradient, so encoders can't collapse it and sizes are realistic
+    x = np.linspace(0, 255, width, dtype=np.uint8)
+    y = np.linspace(0, 255, height, dtype=np.uint8)
+    return np.dstack([np.tile(x, (height, 1)), np.tile(y[:, None], (1, width)), np.full((height, width), 128, np.uint8)])
+
+
+def encode(ext, width, height, params=()):
+    ok, data = cv2.imencode(ext, frame(width, height), list(params))
+    assert ok
+    return data.tobytes()
+
+
+@pytest.mark.parametrize("data", [
+    encode(".jpg", 640, 480),
+    encode(".jpg", 640, 480, (cv2.IMWRITE_JPEG_PROGRESSIVE, 1)),
+    encode(".png", 640, 480),
+], ids=["baseline-jpeg", "progressive-jpeg", "png"])
+def test_dimensions_come_from_the_header(data):
+    assert image_dimensions(data) == (640, 480)
+    assert decode_image(data).shape == (480, 640, 3)
+
+
+def test_progressive_jpeg_uses_the_sof2_marker():
+    data = encode(".jpg", 300, 200, (cv2.IMWRITE_JPEG_PROGRESSIVE, 1))
+    assert b"\xff\xc2" in data and b"\xff\xc0" not in data
+    assert image_dimensions(data) == (300, 200)
+
+
+@pytest.mark.parametrize("data", [b"", b"garbage", b"\xff\xd8\xff", b"\x89PNG\r\n\x1a\n", b"GIF89a" + b"\x00" * 20])
+def test_unrecognised_headers(data):
+    assert image_dimensions(data) is None
+    with pytest.raises(ValueError):
+        decode_image(data)
+
+
+def test_truncated_jpeg_header_has_no_dimensions():
+    data = encode(".jpg", 640, 480)
+    sof = data.index(b"\xff\xc0")
+    assert image_dimensions(data[:sof + 4]) is None
+
+
+def test_large_jpeg_is_reduced_then_resized_to_max_edge():
+    data = encode(".jpg", 4000, 3000)
+    before = preprocess_stats.reduced_decodes
+    decoded = decode_image(data, max_edge=1024)
+    # A 1/2 reduced decode (2000 px), then a resize to exactly max_edge
+    assert decoded.shape == (768, 1024, 3)
+    assert preprocess_stats.reduced_decodes == before + 1
+
+
+def test_reduced_decode_never_goes_below_max_edge():
+    data = encode(".jpg", 1500, 1000)
+    before = preprocess_stats.reduced_decodes
+    # 1500 / 2 < 1024, so full decode and a resize
+    assert decode_image(data, max_edge=1024).shape == (683, 1024, 3)
+    assert preprocess_stats.reduced_decodes == before
+
+
+def test_large_png_is_resized_without_a_reduced_decode():
+    data = encode(".png", 2048, 1024)
+    before = preprocess_stats.reduced_decodes
+    assert decode_image(data, max_edge=512).shape == (256, 512, 3)
+    assert preprocess_stats.reduced_decodes == before
+
+
+def test_small_images_are_left_alone():
+    assert decode_image(encode(".jpg", 320, 240), max_edge=1024).shape == (240, 320, 3)
+
+
+def test_upload_limit():
+    assert read_limited(io.BytesIO(b"x" * 10), max_bytes=10) == b"x" * 10
+    with pytest.raises(ImageTooLarge):
+        read_limited(io.BytesIO(b"x" * 11), max_bytes=10)
+
+    assert asyncio.run(read_upload(UploadFile(io.BytesIO(b"x" * 10)), max_bytes=10)) == b"x" * 10
+    # Refused from the declared size before reading, or from what was read
+    with pytest.raises(ImageTooLarge):
+        asyncio.run(read_upload(UploadFile(io.BytesIO(b"x"), size=11), max_bytes=10))
+    with pytest.raises(ImageTooLarge):
+        asyncio.run(read_upload(UploadFile(io.BytesIO(b"x" * 11)), max_bytes=10))
@@ -0,0 +1,156 @@
+# utils/ip_ranges.py
+import glob
+import ipaddress
+import logging
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_right
+
+logger = logging.getLogger(__name__)
+
+VPN_CIDR_DIR = os.getenv("VPN_CIDR_DIR", "data/ip_ranges")
+VPN_CIDR_RELOAD_SECONDS = float(os.getenv("VPN_CIDR_RELOAD_SECONDS", "30"))
+
+
+class IPRangeSet:
+    """
+    Immutable set of IP ranges stored as sorted, merged integer intervals.
+
+    IPv4 bounds sit in compact unsigned 32-bit arrays; IPv6 bounds are
+    Python ints. A lookup is one binary search.
+    """
+
+    def __init__(self, cidrs=()):
+        v4, v6 = [], []
+        for cidr in cidrs:
+            network = ipaddress.ip_network(cidr, strict=False)
+            bounds = (int(network.network_address), int(network.broadcast_address))
+            (v4 if network.version == 4 else v6).append(bounds)
+        v4_starts, v4_ends = self._merge(v4)
+        self._v4_starts = array("I", v4_starts)
+        self._v4_ends = array("I", v4_ends)
+        self._v6_starts, self._v6_ends = self._merge(v6)
+
+    @staticmethod
+    def _merge(ranges):
+        starts, ends = [], []
+        for start, end in sorted(ranges):
+            if ends and start <= ends[-1] + 1:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        return starts, ends
+
+    def __len__(self):
+        return len(self._v4_starts) + len(self._v6_starts)
+
+    def contains(self, address):
+        if address.version == 4:
+            starts, ends = self._v4_starts, self._v4_ends
+        else:
+            starts, ends = self._v6_starts, self._v6_ends
+        value = int(address)
+        i = bisect_right(starts, value) - 1
+        return i >= 0 and value <= ends[i]
+
+
+def read_cidr_file(path):
+    """
+    One CIDR (or bare address) per line; blank lines and # comments ignored.
+    """
+    cidrs = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                cidrs.append(line)
+    return cidrs
+
+
+class OfflineIPDatabase:
+    """
+    Datacenter/hosting/VPN ranges loaded from `<directory>/<category>.txt`.
+
+    Files are re-checked at most every `reload_seconds`; when any mtime
+    changes the sets are rebuilt off to the side and swapped in, so workers
+    pick up new data without a restart and lookups never see a half-loaded
+    state.
+    """
+
+    def __init__(self, directory=VPN_CIDR_DIR, reload_seconds=VPN_CIDR_RELOAD_SECONDS):
+        self.directory = directory
+        self.reload_seconds = reload_seconds
+        self._categories = {}
+        self._signature = None
+        self._checked_at = 0.0
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self.reload()
+
+    def _files(self):
+        return sorted(glob.glob(os.path.join(self.directory, "*.txt")))
+
+    def _current_signature(self):
+        signature = []
+        for path in self._files():
+            try:
+                signature.append((path, os.stat(path).st_mtime_ns))
+            except FileNotFoundError:
+                continue
+        return tuple(signature)
+
+    def reload(self, force=True):
+        with self._lock:
+            self._checked_at = time.monotonic()
+            signature = self._current_signature()
+            if not force and signature == self._signature:
+                return False
+            categories = {}
+            for path, _ in signature:
+                category = os.path.splitext(os.path.basename(path))[0]
+                try:
+                    categories[category] = IPRangeSet(read_cidr_file(path))
+                except (OSError, ValueError) as e:
+                    # Keep serving the previous data rather than a partial set
+                    logger.error("Skipping reload, %s is unreadable: %s", path, e)
+                    return False
+            if not categories:
+                logger.warning("No CIDR files found in %s", self.directory)
+            self._categories = categories
+            self._signature = signature
+            self._loaded_at = time.time()
+            return True
+
+    def reload_due(self):
+        """
+        True at most once per `reload_seconds`; the caller should then run
+        `reload(force=False)`, ideally off the event loop.
+        """
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_seconds:
+            return False
+        self._checked_at = now
+        return True
+
+    def lookup(self, ip_address):
+        """
+        Returns the category the address falls in (e.g. "vpn"), or None.
+        An IPv4-mapped IPv6 address (::ffff:a.b.c.d, as a dual-stack
+        listener reports IPv4 clients) is matched against the IPv4 ranges.
+        """
+        address = ipaddress.ip_address(ip_address)
+        address = getattr(address, "ipv4_mapped", None) or address
+        for category, ranges in self._categories.items():
+            if ranges.contains(address):
+                return category
+        return None
+
+    def stats(self):
+        return {
+            "directory": self.directory,
+            "ranges": {category: len(ranges) for category, ranges in self._categories.items()},
+            "loaded_at": self._loaded_at,
+        }
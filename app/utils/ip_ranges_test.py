@@ -0,0 +1,49 @@
+import ipaddress
+import os
+import time
+
+from app.utils.ip_ranges import IPRangeSet, OfflineIPDatabase
+
+
+def contains(ranges, ip):
+    return ranges.contains(ipaddress.ip_address(ip))
+
+
+def test_ranges_merge_and_match_both_families():
+    ranges = IPRangeSet(["10.0.0.0/24", "10.0.1.0/24", "10.0.0.128/25", "2001:db8::/32", "192.0.2.7"])
+    assert len(ranges) == 3  # the two /24s merge, the /25 is inside them
+    assert contains(ranges, "10.0.0.0")
+    assert contains(ranges, "10.0.1.255")
+    assert not contains(ranges, "10.0.2.0")
+    assert not contains(ranges, "9.255.255.255")
+    assert contains(ranges, "192.0.2.7")
+    assert not contains(ranges, "192.0.2.8")
+    assert contains(ranges, "2001:db8:ffff::1")
+    assert not contains(ranges, "2001:db9::1")
+
+
+def test_database_categories_and_hot_reload(tmp_path):
+    (tmp_path / "vpn.txt").write_text("# provider list\n203.0.113.0/24\n")
+    (tmp_path / "datacenter.txt").write_text("198.51.100.0/24  # rack 1\n")
+    database = OfflineIPDatabase(str(tmp_path), reload_seconds=0)
+
+    assert database.lookup("203.0.113.9") == "vpn"
+    assert database.lookup("198.51.100.1") == "datacenter"
+    assert database.lookup("8.8.8.8") is None
+
+    path = tmp_path / "vpn.txt"
+    path.write_text("8.8.8.0/24\n")
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 1_000_000_000))
+    assert database.reload_due()
+    assert database.reload(force=False)
+    assert database.lookup("8.8.8.8") == "vpn"
+    assert database.lookup("203.0.113.9") is None
+
+
+def test_ipv4_mapped_addresses_match_ipv4_ranges(tmp_path):
+    (tmp_path / "vpn.txt").write_text("203.0.113.0/24\n2001:db8::/32\n")
+    database = OfflineIPDatabase(str(tmp_path), reload_seconds=0)
+
+    assert database.lookup("::ffff:203.0.113.9") == "vpn"
+    assert database.lookup("::ffff:8.8.8.8") is None
+    assert database.lookup("2001:db8::1") == "vpn"
@@ -0,0 +1,269 @@
+# utils/job_queue.py
+import json
+import logging
+import os
+import random
+import socket
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, or_, select, update
+
+from app.database import SessionLocal
+from app.models import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+# A running job whose worker hasn't finished it by then is handed to another
+JOB_VISIBILITY_TIMEOUT_SECONDS = float(os.getenv("JOB_VISIBILITY_TIMEOUT_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_BACKOFF_SECONDS = float(os.getenv("JOB_BACKOFF_SECONDS", "5"))
+JOB_BACKOFF_MAX_SECONDS = float(os.getenv("JOB_BACKOFF_MAX_SECONDS", "600"))
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying can't help (e.g. no face in the photo)."""
+
+
+def enqueue(db, kind, payload=None, data=None, max_attempts=JOB_MAX_ATTEMPTS, run_after=None):
+    """
+    Adds a job; the caller commits, so the job only exists if the work that
+    asked for it does.
+    """
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload) if payload is not None else None,
+        data=data,
+        max_attempts=max_attempts,
+        run_after=run_after or datetime.now(timezone.utc),
+    )
+    db.add(job)
+    db.flush()
+    return job
+
+
+def backoff_seconds(attempts, base=JOB_BACKOFF_SECONDS, cap=JOB_BACKOFF_MAX_SECONDS):
+    """
+    Exponential backoff with jitter before retry number `attempts` + 1.
+    """
+    return min(cap, base * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+
+class ClaimedJob:
+    def __init__(self, row):
+        self.job_id = row.job_id
+        self.kind = row.kind
+        self.payload = json.loads(row.payload) if row.payload else None
+        self.data = row.data
+        self.attempts = row.attempts
+        self.max_attempts = row.max_attempts
+
+
+class JobQueue:
+    """
+    A job queue in the application database: no broker, jobs survive
+    restarts, and any number of worker threads or processes can share it.
+
+    A worker claims the oldest due job with one conditional UPDATE (SKIP
+    LOCKED on PostgreSQL), which leases it until now + visibility timeout.
+    The handler's writes and the job's completion commit together, and only
+    if the lease is still ours. Failures are retried with exponential
+    backoff up to the job's max_attempts, then the job is marked failed.
+
+    Handlers are registered per kind: `handler(db, job)` does the work
+    without committing and may return a callable to run after the commit;
+    `on_failure(db, job, error)` runs in the transaction that gives up.
+    """
+
+    def __init__(self, session_factory, workers=JOB_WORKERS, poll_seconds=JOB_POLL_SECONDS,
+                 visibility_timeout=JOB_VISIBILITY_TIMEOUT_SECONDS):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.visibility_timeout = timedelta(seconds=visibility_timeout)
+        self._handlers = {}
+        self._threads = []
+        self._stopping = threading.Event()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._counts = {"claimed": 0, "done": 0, "retried": 0, "failed": 0, "lost_leases": 0}
+
+    def register(self, kind, handler, on_failure=None):
+        self._handlers[kind] = (handler, on_failure)
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopping.clear()
+        for i in range(max(1, self.workers)):
+            thread = threading.Thread(
+                target=self._run, args=(f"{self._worker_prefix}:{i}",), name=f"job-worker-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=30):
+        """
+        Lets running jobs finish, then stops the workers. Anything still
+        running at the timeout is retried after its lease expires.
+        """
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        """
+        Wakes an idle worker now instead of at its next poll.
+        """
+        self._wakeup.set()
+
+    def _run(self, worker_id):
+        while not self._stopping.is_set():
+            try:
+                job = self.claim(worker_id)
+            except Exception as e:
+                logger.error("Claiming a job failed: %s", e)
+                job = None
+            if job is None:
+                self._wakeup.wait(self.poll_seconds)
+                self._wakeup.clear()
+                continue
+            self.execute(job, worker_id)
+
+    def _claimable(self, now):
+        return or_(
+            and_(Job.status == "queued", Job.run_after <= now),
+            and_(Job.status == "running", Job.locked_until < now),
+        )
+
+    def claim(self, worker_id, now=None):
+        """
+        Leases the next due job (or one whose lease expired) to `worker_id`.
+        """
+        now = now or datetime.now(timezone.utc)
+        db = self.session_factory()
+        try:
+            candidate = select(Job.job_id).where(self._claimable(now)).order_by(Job.run_after, Job.job_id).limit(1)
+            if db.get_bind().dialect.name == "postgresql":
+                candidate = candidate.with_for_update(skip_locked=True)
+            # The claim condition is repeated so a job another worker took in
+            # between doesn't match
+            row = db.execute(
+                update(Job)
+                .where(Job.job_id == candidate.scalar_subquery(), self._claimable(now))
+                .values(
+                    status="running",
+                    attempts=Job.attempts + 1,
+                    locked_by=worker_id,
+                    locked_until=now + self.visibility_timeout,
+                    updated_at=now,
+                )
+                .returning(Job.job_id, Job.kind, Job.payload, Job.data, Job.attempts, Job.max_attempts)
+            ).first()
+            db.commit()
+        finally:
+            db.close()
+        if row is None:
+            return None
+        with self._lock:
+            self._counts["claimed"] += 1
+        return ClaimedJob(row)
+
+    def _release(self, db, job, worker_id, **values):
+        """
+        Updates the job if this worker still holds its lease; False otherwise.
+        """
+        result = db.execute(
+            update(Job)
+            .where(Job.job_id == job.job_id, Job.status == "running", Job.locked_by == worker_id)
+            .values(locked_by=None, locked_until=None, updated_at=datetime.now(timezone.utc), **values)
+        )
+        return result.rowcount == 1
+
+    def execute(self, job, worker_id):
+        handler, on_failure = self._handlers.get(job.kind, (None, None))
+        db = self.session_factory()
+        try:
+            if handler is None:
+                raise PermanentJobError(f"No handler for job kind {job.kind!r}")
+            after_commit = handler(db, job)
+            if not self._release(db, job, worker_id, status="done", data=None, last_error=None,
+                                 finished_at=datetime.now(timezone.utc)):
+                db.rollback()
+                self._count("lost_leases")
+                logger.warning("Lost the lease on job %s; its result was discarded", job.job_id)
+                return
+            db.commit()
+            self._count("done")
+        except Exception as e:
+            db.rollback()
+            self._failed(db, job, worker_id, e, on_failure)
+            return
+        finally:
+            db.close()
+        if after_commit is not None:
+            try:
+                after_commit()
+            except Exception as e:
+                logger.error("After-commit hook of job %s failed: %s", job.job_id, e)
+
+    def _failed(self, db, job, worker_id, error, on_failure):
+        permanent = isinstance(error, PermanentJobError) or job.attempts >= job.max_attempts
+        try:
+            if permanent:
+                released = self._release(db, job, worker_id, status="failed", data=None, last_error=str(error),
+                                         finished_at=datetime.now(timezone.utc))
+                if released and on_failure is not None:
+                    on_failure(db, job, error)
+            else:
+                delay = backoff_seconds(job.attempts)
+                released = self._release(db, job, worker_id, status="queued", last_error=str(error),
+                                         run_after=datetime.now(timezone.utc) + timedelta(seconds=delay))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error("Recording the failure of job %s failed: %s", job.job_id, e)
+            return
+        if not released:
+            self._count("lost_leases")
+        elif permanent:
+            self._count("failed")
+            logger.error("Job %s (%s) failed after %d attempt(s): %s", job.job_id, job.kind, job.attempts, error)
+        else:
+            self._count("retried")
+            logger.warning("Job %s (%s) attempt %d failed, retrying: %s", job.job_id, job.kind, job.attempts, error)
+
+    def _count(self, key):
+        with self._lock:
+            self._counts[key] += 1
+
+    def stats(self):
+        return {"workers": len(self._threads), **self._counts}
+
+
+def job_state(db, job_id):
+    """
+    Public view of a job row, or None.
+    """
+    job = db.get(Job, job_id)
+    if job is None:
+        return None
+    return {
+        "job_id": job.job_id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "next_attempt_at": job.run_after if job.status == "queued" else None,
+        "last_error": job.last_error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
+
+
+job_queue = JobQueue(SessionLocal)
@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta, timezone
+
+from app.models import Job, User
+from app.utils.attendance_store_test import make_sessionmaker
+from app.utils.enrollment_jobs import enqueue_enrollment, enrollment_failed
+from app.utils.job_queue import JobQueue, PermanentJobError, enqueue
+
+
+def add_job(SessionLocal, kind="test", payload=None, **kwargs):
+    db = SessionLocal()
+    job_id = enqueue(db, kind, payload or {}, **kwargs).job_id
+    db.commit()
+    db.close()
+    return job_id
+
+
+def load(SessionLocal, job_id):
+    db = SessionLocal()
+    job = db.get(Job, job_id)
+    db.close()
+    return job
+
+
+def test_job_runs_once_and_its_writes_commit_with_it(tmp_path):
+    SessionLocal = make_sessionmaker(tmp_path)
+    queue = JobQueue(SessionLocal)
+    published = []
+
+    def handler(db, job):
+        db.add(User(full_name="A", email=job.payload["email"], password_hash="x", role="student"))
+        return lambda: published.append(job.job_id)
+
+    queue.register("test", handler)
+    job_id = add_job(SessionLocal, payload={"email": "a@example.com"}, data=b"photo")
+
+    job = queue.claim("w1")
+    assert job.job_id == job_id and job.data == b"photo" and job.attempts == 1
+    # Leased: nobody else gets it
+    assert queue.claim("w2") is None
+    queue.execute(job, "w1")
+
+    row = load(SessionLocal, job_id)
+    assert row.status == "done" and row.data is None and row.locked_by is None
+    assert published == [job_id]
+    db = SessionLocal()
+    assert db.query(User).filter(User.email == "a@example.com").count() == 1
+    db.close()
+    assert queue.claim("w1") is None
+
+
+def test_failures_are_retried_with_backoff_then_given_up(tmp_path):
+    SessionLocal = make_sessionmaker(tmp_path)
+    queue = JobQueue(SessionLocal)
+    failures = []
+
+    def handler(db, job):
+        db.add(User(full_name="A", email="a@example.com", password_hash="x", role="student"))
+        raise RuntimeError("model not loaded")
+
+    queue.register("test", handler, on_failure=lambda db, job, error: failures.append(str(error)))
+    job_id = add_job(SessionLocal, max_attempts=2)
+
+    queue.execute(queue.claim("w1"), "w1")
+    row = load(SessionLocal, job_id)
+    assert row.status == "queued" and row.attempts == 1 and row.last_error == "model not loaded"
+    # Not due until the backoff has passed
+    assert queue.claim("w1") is None
+    later = datetime.now(timezone.utc) + timedelta(hours=1)
+    queue.execute(queue.claim("w1", now=later), "w1")
+
+    row = load(SessionLocal, job_id)
+    assert row.status == "failed" and row.attempts == 2 and row.finished_at is not None
+    assert failures == ["model not loaded"]
+    # The handler's writes were rolled back each time
+    db = SessionLocal()
+    assert db.query(User).count() == 0
+    db.close()
+    assert queue.stats()["retried"] == 1 and queue.stats()["failed"] == 1
+
+
+def test_permanent_error_fails_without_retrying(tmp_path):
+    SessionLocal = make_sessionmaker(tmp_path)
+    queue = JobQueue(SessionLocal)
+
+    def handler(db, job):
+        raise PermanentJobError("No face detected")
+
+    queue.register("test", handler)
+    job_id = add_job(SessionLocal)
+    queue.execute(queue.claim("w1"), "w1")
+    row = load(SessionLocal, job_id)
+    assert row.status == "failed" and row.attempts == 1 and row.last_error == "No face detected"
+
+
+def test_expired_lease_is_reclaimed_and_the_old_result_discarded(tmp_path):
+    SessionLocal = make_sessionmaker(tmp_path)
+    queue = JobQueue(SessionLocal, visibility_timeout=60)
+    runs = []
+
+    def handler(db, job):
+        runs.append(job.attempts)
+        db.add(User(full_name="A", email=f"a{job.attempts}@example.com", password_hash="x", role="student"))
+
+    queue.register("test", handler)
+    job_id = add_job(SessionLocal)
+    stalled = queue.claim("w1")
+    # w1 stops responding; after the visibility timeout w2 takes over
+    assert queue.claim("w2", now=datetime.now(timezone.utc) + timedelta(seconds=30)) is None
+    retaken = queue.claim("w2", now=datetime.now(timezone.utc) + timedelta(seconds=61))
+    assert retaken.job_id == job_id and retaken.attempts == 2
+
+    queue.execute(stalled, "w1")
+    queue.execute(retaken, "w2")
+
+    assert runs == [1, 2]
+    row = load(SessionLocal, job_id)
+    assert row.status == "done"
+    db = SessionLocal()
+    assert [u.email for u in db.query(User)] == ["a2@example.com"]
+    db.close()
+    assert queue.stats()["lost_leases"] == 1
+
+
+def test_failed_enrollment_marks_the_user(tmp_path):
+    SessionLocal = make_sessionmaker(tmp_path)
+    queue = JobQueue(SessionLocal)
+
+    def handler(db, job):
+        raise PermanentJobError("No face detected")
+
+    queue.register("enrollment_embedding", handler, on_failure=enrollment_failed)
+    db = SessionLocal()
+    user = User(full_name="A", email="a@example.com", password_hash="x", role="student")
+    db.add(user)
+    enqueue_enrollment(db, user, b"photo")
+    db.commit()
+    user_id = user.user_id
+    db.close()
+
+    db = SessionLocal()
+    assert db.get(User, user_id).enrollment_status == "pending"
+    db.close()
+    queue.execute(queue.claim("w1"), "w1")
+    db = SessionLocal()
+    assert db.get(User, user_id).enrollment_status == "failed"
+    db.close()
@@ -0,0 +1,221 @@
+# utils/live_events.py
+import asyncio
+import json
+import os
+from collections import deque
+from datetime import datetime, timezone
+
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "100"))
+LIVE_MAX_SUBSCRIBERS = int(os.getenv("LIVE_MAX_SUBSCRIBERS", "1000"))
+LIVE_RECENT_FAILURES = int(os.getenv("LIVE_RECENT_FAILURES", "20"))
+LIVE_KEEPALIVE_SECONDS = float(os.getenv("LIVE_KEEPALIVE_SECONDS", "15"))
+
+
+class TooManySubscribers(Exception):
+    """Raised when a session already has LIVE_MAX_SUBSCRIBERS listeners."""
+
+
+class Subscription:
+    """
+    One client's bounded buffer. When it is full the oldest event is
+    dropped; every event carries the running counts, so a lagging client
+    only loses intermediate steps and is told how many it missed.
+    """
+
+    def __init__(self, session_id, max_queue):
+        self.session_id = session_id
+        self.max_queue = max_queue
+        self._events = deque()
+        self._ready = asyncio.Event()
+        self.dropped = 0  # since the last delivered event
+        self.lost = 0  # over the subscription's lifetime
+
+    def push(self, event):
+        if len(self._events) >= self.max_queue:
+            self._events.popleft()
+            self.dropped += 1
+            self.lost += 1
+        self._events.append(event)
+        self._ready.set()
+
+    async def get(self, timeout=None):
+        """
+        Next event, or None after `timeout` seconds without one.
+        """
+        if not self._events:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        event = self._events.popleft()
+        if self.dropped:
+            event = {**event, "dropped": self.dropped}
+            self.dropped = 0
+        return event
+
+
+class _SessionState:
+    def __init__(self, check_ins, check_outs, seeded=True):
+        self.check_ins = check_ins
+        self.check_outs = check_outs
+        self.seeded = seeded
+        self.failures = deque(maxlen=LIVE_RECENT_FAILURES)
+        self.subscribers = set()
+
+
+class LiveEventHub:
+    """
+    In-process pub/sub of check-in activity per attendance session, fed by
+    mark_attendance. Running counts are only tracked for sessions somebody
+    is watching; they are seeded from the database on the first subscribe.
+
+    Each uvicorn worker has its own hub and only sees the check-ins it
+    served, so run a single worker (or a sticky balancer) for exact live
+    counts. All methods must be called on the event loop.
+    """
+
+    def __init__(self, max_queue=LIVE_QUEUE_SIZE, max_subscribers=LIVE_MAX_SUBSCRIBERS):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self._sessions = {}
+        self._published = 0
+        self._dropped = 0
+
+    def subscribe(self, session_id, check_ins=0, check_outs=0, seeded=True):
+        """
+        Registers a listener. `check_ins`/`check_outs` seed the counts if
+        nobody was watching this session yet. The first event queued is a
+        snapshot.
+
+        With `seeded=False` an unwatched session starts counting from zero
+        and queues nothing until `seed()` adds the database counts, so a
+        check-in published between subscribing and reading them is not lost.
+        """
+        state = self._sessions.get(session_id)
+        if state is None:
+            state = self._sessions[session_id] = _SessionState(check_ins, check_outs, seeded)
+        if len(state.subscribers) >= self.max_subscribers:
+            raise TooManySubscribers(f"Session {session_id} has too many live subscribers")
+        subscription = Subscription(session_id, self.max_queue)
+        state.subscribers.add(subscription)
+        if state.seeded:
+            subscription.push(self._snapshot(session_id, state))
+        return subscription
+
+    def needs_seed(self, subscription):
+        state = self._sessions.get(subscription.session_id)
+        return state is not None and not state.seeded
+
+    def seed(self, subscription, check_ins, check_outs):
+        """
+        Adds counts read after subscribing to what was published since, then
+        queues the snapshot for every subscriber. A no-op once seeded, e.g.
+        by a concurrent subscriber.
+        """
+        state = self._sessions.get(subscription.session_id)
+        if state is None or state.seeded:
+            return
+        state.check_ins += check_ins
+        state.check_outs += check_outs
+        state.seeded = True
+        snapshot = self._snapshot(subscription.session_id, state)
+        for subscriber in state.subscribers:
+            subscriber.push(snapshot)
+
+    def unsubscribe(self, subscription):
+        """
+        Idempotent: called both when the stream ends and after the response.
+        """
+        state = self._sessions.get(subscription.session_id)
+        if state is None or subscription not in state.subscribers:
+            return
+        state.subscribers.discard(subscription)
+        self._dropped += subscription.lost
+        if not state.subscribers:
+            # Nobody is watching; the next subscriber re-seeds from the database
+            del self._sessions[subscription.session_id]
+
+    def is_watched(self, session_id):
+        return session_id in self._sessions
+
+    def publish_attendance(self, session_id, user_id, action):
+        state = self._sessions.get(session_id)
+        if state is None:
+            return
+        if action == "check_in":
+            state.check_ins += 1
+        elif action == "check_out":
+            state.check_outs += 1
+        self._broadcast(state, self._event(session_id, state, action, user_id=user_id))
+
+    def threadsafe_publisher(self, loop):
+        """
+        publish_attendance for callers on other threads (the write-behind
+        writer), scheduled onto `loop`, the loop the hub is used from.
+        """
+        def publish(session_id, user_id, action):
+            loop.call_soon_threadsafe(self.publish_attendance, session_id, user_id, action)
+        return publish
+
+    def publish_failure(self, session_id, user_id, reason):
+        state = self._sessions.get(session_id)
+        if state is None:
+            return
+        failure = {"user_id": user_id, "reason": reason, "at": _now()}
+        state.failures.append(failure)
+        self._broadcast(state, self._event(session_id, state, "failure", **failure))
+
+    def _snapshot(self, session_id, state):
+        return self._event(session_id, state, "snapshot", recent_failures=list(state.failures))
+
+    def _event(self, session_id, state, kind, **fields):
+        return {
+            "type": kind,
+            "session_id": session_id,
+            "check_ins": state.check_ins,
+            "check_outs": state.check_outs,
+            "at": _now(),
+            **fields,
+        }
+
+    def _broadcast(self, state, event):
+        self._published += 1
+        if not state.seeded:
+            # Counted; subscribers get it as part of the snapshot
+            return
+        for subscription in state.subscribers:
+            subscription.push(event)
+
+    async def stream(self, subscription, is_disconnected, keepalive=LIVE_KEEPALIVE_SECONDS):
+        """
+        Server-Sent Events for one subscription, with a comment line every
+        `keepalive` seconds so proxies keep the connection open. Stops when
+        `is_disconnected()` says the client went away.
+        """
+        try:
+            while not await is_disconnected():
+                event = await subscription.get(timeout=keepalive)
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self):
+        return {
+            "watched_sessions": len(self._sessions),
+            "subscribers": sum(len(state.subscribers) for state in self._sessions.values()),
+            "published": self._published,
+            "dropped": self._dropped + sum(
+                subscription.lost for state in self._sessions.values() for subscription in state.subscribers
+            ),
+        }
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+live_events = LiveEventHub()
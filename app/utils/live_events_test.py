@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from app.utils.live_events import LiveEventHub, TooManySubscribers
+
+
+def test_subscribers_get_snapshot_then_events():
+    async def run():
+        hub = LiveEventHub()
+        first = hub.subscribe(1, check_ins=5, check_outs=2)
+        hub.publish_attendance(1, 10, "check_in")
+        hub.publish_failure(1, 11, "Face verification failed. Score: 0.71")
+        second = hub.subscribe(1, check_ins=999)  # already watched; seed ignored
+        hub.publish_attendance(1, 10, "check_out")
+        hub.publish_attendance(2, 10, "check_in")  # nobody watches session 2
+
+        events = [await first.get(timeout=1) for _ in range(4)]
+        assert [e["type"] for e in events] == ["snapshot", "check_in", "failure", "check_out"]
+        assert (events[-1]["check_ins"], events[-1]["check_outs"]) == (6, 3)
+
+        snapshot = await second.get(timeout=1)
+        assert snapshot["check_ins"] == 6
+        assert [f["user_id"] for f in snapshot["recent_failures"]] == [11]
+        assert await first.get(timeout=0.01) is None
+        assert not hub.is_watched(2)
+
+    asyncio.run(run())
+
+
+def test_slow_subscriber_drops_oldest_events():
+    async def run():
+        hub = LiveEventHub(max_queue=3)
+        slow = hub.subscribe(1)
+        for user_id in range(10):
+            hub.publish_attendance(1, user_id, "check_in")
+
+        event = await slow.get(timeout=1)
+        assert event["dropped"] == 8 and event["user_id"] == 7
+        assert (await slow.get(timeout=1))["check_ins"] == 9
+        assert hub.stats()["dropped"] == 8
+
+        hub.unsubscribe(slow)
+        assert not hub.is_watched(1)
+
+    asyncio.run(run())
+
+
+def test_subscriber_limit_and_stream_cleanup():
+    async def run():
+        hub = LiveEventHub(max_subscribers=1)
+        subscription = hub.subscribe(1)
+        with pytest.raises(TooManySubscribers):
+            hub.subscribe(1)
+
+        disconnected = False
+
+        async def is_disconnected():
+            return disconnected
+
+        stream = hub.stream(subscription, is_disconnected, keepalive=0.01)
+        assert (await stream.__anext__()).startswith("event: snapshot\n")
+        assert await stream.__anext__() == ": keepalive\n\n"
+        disconnected = True
+        with pytest.raises(StopAsyncIteration):
+            await stream.__anext__()
+        assert hub.stats()["subscribers"] == 0
+
+    asyncio.run(run())
+
+
+def test_counts_published_while_seeding_are_kept():
+    async def run():
+        hub = LiveEventHub()
+        first = hub.subscribe(1, seeded=False)
+        second = hub.subscribe(1, seeded=False)
+        assert hub.needs_seed(first) and hub.needs_seed(second)
+        # Published after subscribing, before the database counts came back
+        hub.publish_attendance(1, 10, "check_in")
+        hub.publish_failure(1, 11, "Face verification failed. Score: 0.71")
+        assert await first.get(timeout=0.01) is None
+
+        hub.seed(first, check_ins=5, check_outs=2)
+        hub.seed(second, check_ins=999, check_outs=999)  # already seeded; ignored
+        assert not hub.needs_seed(second)
+        for subscription in (first, second):
+            snapshot = await subscription.get(timeout=1)
+            assert (snapshot["type"], snapshot["check_ins"], snapshot["check_outs"]) == ("snapshot", 6, 2)
+            assert [f["user_id"] for f in snapshot["recent_failures"]] == [11]
+
+        hub.publish_attendance(1, 10, "check_out")
+        assert (await first.get(timeout=1))["check_outs"] == 3
+
+    asyncio.run(run())
+
+
+def test_unsubscribe_is_idempotent():
+    hub = LiveEventHub(max_queue=1)
+    first = hub.subscribe(1)
+    hub.subscribe(1)
+    hub.publish_attendance(1, 10, "check_in")  # pushes the snapshot out of first's buffer
+    hub.unsubscribe(first)
+    hub.unsubscribe(first)
+    stats = hub.stats()
+    assert (stats["subscribers"], stats["dropped"]) == (1, 2)
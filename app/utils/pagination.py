@@ -0,0 +1,53 @@
+# utils/pagination.py
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor that wasn't issued by keyset_page."""
+
+
+def encode_cursor(created_at, row_id):
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Invalid page cursor") from e
+
+
+def keyset_page(query, created_column, id_column, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Newest-first page of `query` ordered by (created_at, id). With a
+    cursor the page starts right after the row it names, via a row-value
+    comparison that a (..., created_at, id) index answers with a seek, so
+    page N costs the same as page 1. Fetches one extra row to know whether
+    there is a next page.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.where(tuple_(created_column, id_column) < tuple_(created_at, row_id))
+    return query.order_by(created_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+def page_result(rows, limit, created_attr, id_attr):
+    """
+    (items, next_cursor) from the rows of a keyset_page query.
+    """
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, created_attr), getattr(last, id_attr))
+    return items, next_cursor
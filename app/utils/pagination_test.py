@@ -0,0 +1,30 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.utils.pagination import InvalidCursor, decode_cursor, encode_cursor, page_result
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 3, 1, 8, 30, 15, 123456, tzinfo=timezone.utc)
+    cursor = encode_cursor(created_at, 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_cursor(datetime(2026, 1, 1), 1)[:-3], "WzFd"])
+def test_bad_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_page_result_only_sets_cursor_when_there_is_more():
+    class Row:
+        def __init__(self, row_id):
+            self.row_id = row_id
+            self.created_at = datetime(2026, 1, 1)
+
+    items, cursor = page_result([Row(3), Row(2)], 2, "created_at", "row_id")
+    assert len(items) == 2 and cursor is None
+    items, cursor = page_result([Row(3), Row(2), Row(1)], 2, "created_at", "row_id")
+    assert [r.row_id for r in items] == [3, 2] and decode_cursor(cursor)[1] == 2
@@ -0,0 +1,174 @@
+# utils/session_qr.py
+import base64
+import hashlib
+import hmac
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import qrcode
+
+QR_SECRET_KEY = os.getenv("QR_SECRET_KEY") or os.getenv("JWT_SECRET_KEY") or ""
+# Tokens from this many earlier rotation steps are still accepted, so a scan
+# just before a rotation (plus upload time) doesn't fail
+QR_TOKEN_GRACE_STEPS = int(os.getenv("QR_TOKEN_GRACE_STEPS", "1"))
+QR_CACHE_MAX_ENTRIES = int(os.getenv("QR_CACHE_MAX_ENTRIES", "2048"))
+
+QR_MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+def static_payload(session_id, end_time):
+    return json.dumps({"session_id": session_id, "end_time": end_time.isoformat()})
+
+
+def rotation_step(rotation_seconds, now=None):
+    return int((now if now is not None else time.time()) // rotation_seconds)
+
+
+def require_secret():
+    """
+    Called at startup: with an empty key anyone could compute valid
+    rotating tokens.
+    """
+    if not QR_SECRET_KEY:
+        raise RuntimeError("Set QR_SECRET_KEY (or JWT_SECRET_KEY): rotating QR tokens are signed with it")
+
+
+def _signature(session_id, step, secret):
+    if not secret:
+        raise RuntimeError("No QR signing key configured")
+    digest = hmac.new(secret.encode(), f"{session_id}.{step}".encode(), hashlib.sha256).digest()
+    # 96 bits is plenty for a token that lives a few seconds, and keeps the QR small
+    return base64.urlsafe_b64encode(digest[:12]).decode()
+
+
+def rotating_token(session_id, step, secret=None):
+    """
+    "<session_id>.<step>.<signature>": what a rotating session's QR encodes
+    during rotation step `step`.
+    """
+    return f"{session_id}.{step}.{_signature(session_id, step, secret or QR_SECRET_KEY)}"
+
+
+def verify_rotating_token(token, session_id, rotation_seconds, now=None, secret=None,
+                          grace_steps=QR_TOKEN_GRACE_STEPS):
+    """
+    True if `token` was issued for this session in the current rotation
+    step or one of the `grace_steps` before it.
+    """
+    try:
+        token_session, step, signature = token.split(".")
+        token_session, step = int(token_session), int(step)
+    except (AttributeError, ValueError):
+        return False
+    current = rotation_step(rotation_seconds, now)
+    if token_session != session_id or not current - grace_steps <= step <= current:
+        return False
+    return hmac.compare_digest(signature, _signature(session_id, step, secret or QR_SECRET_KEY))
+
+
+def _qr(data):
+    # A fixed mask skips scoring all eight patterns, most of the encode time;
+    # any mask scans fine on a screen
+    qr = qrcode.QRCode(border=4, mask_pattern=0)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr
+
+
+def render_png(data, box_size=10):
+    qr = _qr(data)
+    qr.box_size = box_size
+    buf = io.BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def render_svg(data):
+    """
+    A single-path SVG with one rectangle per horizontal run of dark modules,
+    built straight from the module matrix; it scales to any screen size.
+    """
+    modules = _qr(data).modules
+    border = 4
+    size = len(modules) + 2 * border
+    path = []
+    for y, row in enumerate(modules, start=border):
+        x = 0
+        while x < len(row):
+            if not row[x]:
+                x += 1
+                continue
+            run = x
+            while run < len(row) and row[run]:
+                run += 1
+            path.append(f"M{x + border} {y}h{run - x}v1h{x - run}z")
+            x = run
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="#fff"/><path d="{"".join(path)}" fill="#000"/></svg>'
+    ).encode()
+
+
+RENDERERS = {"png": render_png, "svg": render_svg}
+
+
+def etag_for(content):
+    return '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+
+
+class QrCache:
+    """
+    Bounded LRU of rendered QR images keyed by (payload, format), with
+    their ETag. A rotating session renders once per step per format, however
+    many screens poll it.
+    """
+
+    def __init__(self, max_entries=QR_CACHE_MAX_ENTRIES):
+        self.max_entries = max(1, max_entries)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, data, fmt):
+        """
+        (content, etag) for `data` rendered as `fmt`, or None.
+        """
+        key = (data, fmt)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def put(self, data, fmt, content):
+        """
+        Caches a rendered image and returns its (content, etag).
+        """
+        entry = (content, etag_for(content))
+        with self._lock:
+            self._entries[(data, fmt)] = entry
+            self._entries.move_to_end((data, fmt))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def stats(self):
+        lookups = self._hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+        }
+
+
+qr_cache = QrCache()
@@ -0,0 +1,58 @@
+import re
+
+import pytest
+
+from app.utils import session_qr
+from app.utils.session_qr import QrCache, _qr, render_svg, rotating_token, verify_rotating_token
+
+
+def test_rotating_token_window():
+    token = rotating_token(7, 100, secret="k")
+    # Rotation of 10 s: step 100 is [1000, 1010)
+    assert verify_rotating_token(token, 7, 10, now=1005, secret="k")
+    assert verify_rotating_token(token, 7, 10, now=1015, secret="k", grace_steps=1)
+    assert not verify_rotating_token(token, 7, 10, now=1025, secret="k", grace_steps=1)
+    assert not verify_rotating_token(token, 7, 10, now=995, secret="k")
+
+
+def test_rotating_token_rejects_forgeries():
+    token = rotating_token(7, 100, secret="k")
+    assert not verify_rotating_token(token, 8, 10, now=1005, secret="k")
+    assert not verify_rotating_token(token, 7, 10, now=1005, secret="other")
+    assert not verify_rotating_token(token.replace("7.100", "7.101"), 7, 10, now=1015, secret="k")
+    for bad in (None, "", "7.100", "a.b.c"):
+        assert not verify_rotating_token(bad, 7, 10, now=1005, secret="k")
+
+
+def test_svg_draws_exactly_the_dark_modules():
+    data = rotating_token(12, 2930000, secret="k")
+    modules = _qr(data).modules
+    drawn = set()
+    for x, y, width in re.findall(r"M(\d+) (\d+)h(\d+)v1h-\d+z", render_svg(data).decode()):
+        drawn.update((int(y) - 4, int(x) - 4 + i) for i in range(int(width)))
+    assert drawn == {(y, x) for y, row in enumerate(modules) for x, dark in enumerate(row) if dark}
+
+
+def test_cache_keys_by_payload_and_format():
+    cache = QrCache(max_entries=2)
+    assert cache.get("a", "png") is None
+    content, etag = cache.put("a", "png", b"png-bytes")
+    assert cache.get("a", "png") == (b"png-bytes", etag)
+    assert cache.get("a", "svg") is None
+    cache.put("b", "png", b"x")
+    cache.put("c", "png", b"y")
+    assert cache.get("a", "png") is None
+
+
+def test_an_empty_signing_key_is_refused(monkeypatch):
+    monkeypatch.setattr(session_qr, "QR_SECRET_KEY", "")
+    with pytest.raises(RuntimeError):
+        session_qr.require_secret()
+    with pytest.raises(RuntimeError):
+        rotating_token(7, 100)
+    with pytest.raises(RuntimeError):
+        verify_rotating_token("7.100.x", 7, 10, now=1005)
+
+    monkeypatch.setattr(session_qr, "QR_SECRET_KEY", "k")
+    session_qr.require_secret()
+    assert verify_rotating_token(rotating_token(7, 100), 7, 10, now=1005)
@@ -0,0 +1,135 @@
+# utils/session_registry.py
+import asyncio
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.utils.geofence import Zone, zone_for_session
+
+
+def as_utc(value):
+    # SQLite hands TIMESTAMP(timezone=True) back as naive datetimes; they were stored as UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+@dataclass(frozen=True)
+class ActiveSession:
+    session_id: int
+    title: str
+    start_time: datetime
+    end_time: datetime
+    zone: Optional[Zone]
+    qr_rotation_seconds: Optional[int] = None
+
+    @classmethod
+    def from_model(cls, session):
+        return cls(
+            session_id=session.session_id,
+            title=session.title,
+            start_time=as_utc(session.start_time),
+            end_time=as_utc(session.end_time),
+            zone=zone_for_session(session),
+            qr_rotation_seconds=getattr(session, "qr_rotation_seconds", None),
+        )
+
+    def status(self, now=None):
+        now = now or datetime.now(timezone.utc)
+        if now < self.start_time:
+            return "upcoming"
+        if now > self.end_time:
+            return "ended"
+        return "active"
+
+
+class SessionRegistry:
+    """
+    In-process map of sessions that haven't ended yet, with their parsed
+    geofence and time window, so check-ins don't query attendance_sessions.
+
+    Each entry is evicted by an event-loop timer at its end_time. Sessions
+    created by another worker aren't pushed here; callers fall back to the
+    database on a miss and `add()` the row they found.
+    """
+
+    def __init__(self):
+        self._sessions = {}
+        self._timers = {}
+        self._loop = None
+        self._lock = threading.Lock()
+        self._expired = 0
+
+    def load(self, db):
+        from app.models import AttendanceSession
+
+        now = datetime.now(timezone.utc)
+        rows = db.query(AttendanceSession).filter(AttendanceSession.end_time > now).all()
+        for row in rows:
+            self.add(row)
+        return len(self._sessions)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        with self._lock:
+            session_ids = list(self._sessions)
+        for session_id in session_ids:
+            self._schedule_eviction(session_id)
+
+    def stop(self):
+        for handle in self._timers.values():
+            handle.cancel()
+        self._timers.clear()
+        self._loop = None
+
+    def get(self, session_id):
+        return self._sessions.get(session_id)
+
+    def add(self, session):
+        """
+        Registers a session row (or ActiveSession) and returns its
+        ActiveSession. Sessions that already ended are returned but not kept.
+        """
+        entry = session if isinstance(session, ActiveSession) else ActiveSession.from_model(session)
+        if entry.status() == "ended":
+            return entry
+        with self._lock:
+            self._sessions[entry.session_id] = entry
+        if self._loop is not None:
+            # add() may run on a threadpool worker (sync routes)
+            self._loop.call_soon_threadsafe(self._schedule_eviction, entry.session_id)
+        return entry
+
+    def remove(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        handle = self._timers.pop(session_id, None)
+        if handle is not None:
+            handle.cancel()
+
+    def _schedule_eviction(self, session_id):
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return
+        previous = self._timers.pop(session_id, None)
+        if previous is not None:
+            previous.cancel()
+        delay = max(0.0, (entry.end_time - datetime.now(timezone.utc)).total_seconds())
+        self._timers[session_id] = self._loop.call_later(delay, self._evict, session_id)
+
+    def _evict(self, session_id):
+        self._timers.pop(session_id, None)
+        with self._lock:
+            if self._sessions.pop(session_id, None) is not None:
+                self._expired += 1
+
+    def stats(self):
+        now = datetime.now(timezone.utc)
+        statuses = [entry.status(now) for entry in list(self._sessions.values())]
+        return {
+            "active": statuses.count("active"),
+            "upcoming": statuses.count("upcoming"),
+            "expired": self._expired,
+        }
+
+
+session_registry = SessionRegistry()
@@ -0,0 +1,52 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from app.utils.session_registry import SessionRegistry
+
+
+def make_session(session_id, starts_in, ends_in, **fields):
+    now = datetime.now(timezone.utc)
+    values = dict(
+        session_id=session_id,
+        title=f"Lecture {session_id}",
+        start_time=now + timedelta(seconds=starts_in),
+        # naive, the way SQLite returns it
+        end_time=(now + timedelta(seconds=ends_in)).replace(tzinfo=None),
+        gps_lat=6.5244,
+        gps_lon=3.3792,
+        allowed_radius=100,
+        geofence=None,
+    )
+    values.update(fields)
+    return SimpleNamespace(**values)
+
+
+def test_status_and_zone():
+    registry = SessionRegistry()
+    active = registry.add(make_session(1, -60, 60))
+    upcoming = registry.add(make_session(2, 60, 120))
+    ended = registry.add(make_session(3, -120, -60))
+
+    assert active.status() == "active" and active.zone.contains_point(6.5244, 3.3792)
+    assert upcoming.status() == "upcoming"
+    assert ended.status() == "ended"
+    assert registry.get(1) is active
+    assert registry.get(3) is None  # ended sessions aren't kept
+    assert registry.stats() == {"active": 1, "upcoming": 1, "expired": 0}
+
+
+def test_sessions_are_evicted_at_end_time():
+    registry = SessionRegistry()
+
+    async def run():
+        await registry.start()
+        registry.add(make_session(1, -60, 0.05))
+        registry.add(make_session(2, -60, 60))
+        await asyncio.sleep(0.2)
+        registry.stop()
+
+    asyncio.run(run())
+    assert registry.get(1) is None
+    assert registry.get(2) is not None
+    assert registry.stats()["expired"] == 1
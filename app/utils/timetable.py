@@ -0,0 +1,215 @@
+# utils/timetable.py
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import String, cast, insert, select, update
+
+from app.models import AttendanceSession, Job, RecurringSchedule
+from app.utils.geofence import PolygonZone
+from app.utils.job_queue import enqueue, job_queue
+from app.utils.session_registry import as_utc
+
+logger = logging.getLogger(__name__)
+
+# Occurrences are turned into attendance_sessions rows this many days ahead
+SCHEDULE_WINDOW_DAYS = int(os.getenv("SCHEDULE_WINDOW_DAYS", "14"))
+SCHEDULE_REFRESH_SECONDS = float(os.getenv("SCHEDULE_REFRESH_SECONDS", "21600"))
+MAX_GENERATE_DAYS = int(os.getenv("MAX_GENERATE_DAYS", "400"))
+
+WINDOW_JOB = "timetable_window"
+
+
+def parse_weekdays(value):
+    return {int(day) for day in value.split(",") if day}
+
+
+def new_schedule(spec, created_by=None):
+    """
+    RecurringSchedule from a schemas.RecurringScheduleCreate. Raises
+    ValueError for a rule that can't produce sessions.
+    """
+    if not spec.weekdays or not set(spec.weekdays) <= set(range(1, 8)):
+        raise ValueError("weekdays must be ISO weekday numbers, 1 (Monday) to 7")
+    if spec.end_date < spec.start_date:
+        raise ValueError("end_date is before start_date")
+    try:
+        ZoneInfo(spec.timezone)
+    except (ValueError, KeyError):
+        raise ValueError(f"Unknown timezone {spec.timezone!r}")
+    if spec.geofence is not None:
+        PolygonZone(spec.geofence)
+    return RecurringSchedule(
+        created_by=created_by,
+        title=spec.title,
+        weekdays=",".join(str(day) for day in sorted(set(spec.weekdays))),
+        start_time=spec.start_time,
+        duration_minutes=spec.duration_minutes,
+        timezone=spec.timezone,
+        start_date=spec.start_date,
+        end_date=spec.end_date,
+        exceptions=json.dumps(sorted(day.isoformat() for day in spec.exceptions)) if spec.exceptions else None,
+        gps_lat=spec.gps_lat,
+        gps_lon=spec.gps_lon,
+        allowed_radius=spec.allowed_radius,
+        geofence=json.dumps(spec.geofence) if spec.geofence is not None else None,
+        qr_rotation_seconds=spec.qr_rotation_seconds,
+    )
+
+
+def schedule_state(schedule):
+    return {
+        "schedule_id": schedule.schedule_id,
+        "title": schedule.title,
+        "weekdays": sorted(parse_weekdays(schedule.weekdays)),
+        "start_time": schedule.start_time.isoformat(),
+        "duration_minutes": schedule.duration_minutes,
+        "timezone": schedule.timezone,
+        "start_date": schedule.start_date.isoformat(),
+        "end_date": schedule.end_date.isoformat(),
+        "exceptions": json.loads(schedule.exceptions or "[]"),
+        "materialized_through": schedule.materialized_through.isoformat() if schedule.materialized_through else None,
+    }
+
+
+def occurrences(schedule, first_day, last_day):
+    """
+    Yields (start, end) in UTC for each meeting of the schedule between
+    first_day and last_day inclusive, skipping its exception dates. Times
+    are wall-clock in the schedule's timezone, so a 09:00 class stays at
+    09:00 across a DST change.
+    """
+    first_day = max(first_day, schedule.start_date)
+    last_day = min(last_day, schedule.end_date)
+    weekdays = parse_weekdays(schedule.weekdays)
+    skipped = {date.fromisoformat(day) for day in json.loads(schedule.exceptions or "[]")}
+    zone = ZoneInfo(schedule.timezone or "UTC")
+    duration = timedelta(minutes=schedule.duration_minutes)
+    day = first_day
+    while day <= last_day:
+        if day.isoweekday() in weekdays and day not in skipped:
+            start = datetime.combine(day, schedule.start_time, tzinfo=zone).astimezone(timezone.utc)
+            yield start, start + duration
+        day += timedelta(days=1)
+
+
+def generate_sessions(db, schedules, first_day, last_day):
+    """
+    Inserts the sessions of `schedules` between first_day and last_day
+    with one multi-row INSERT, skipping occurrences that already exist, and
+    returns how many were created. No QR is rendered: qr_code is the path
+    of the QR endpoint, which derives the payload from the session id on
+    the first request. The caller commits.
+    """
+    schedules = list(schedules)
+    if not schedules or last_day < first_day:
+        return 0
+    by_id = {schedule.schedule_id: schedule for schedule in schedules}
+    window_start = datetime.combine(first_day - timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+    window_end = datetime.combine(last_day + timedelta(days=2), datetime.min.time(), tzinfo=timezone.utc)
+    existing = {
+        (schedule_id, as_utc(start))
+        for schedule_id, start in db.execute(
+            select(AttendanceSession.schedule_id, AttendanceSession.start_time).where(
+                AttendanceSession.schedule_id.in_(by_id),
+                AttendanceSession.start_time >= window_start,
+                AttendanceSession.start_time < window_end,
+            )
+        )
+    }
+
+    rows = []
+    for schedule in schedules:
+        for start, end in occurrences(schedule, first_day, last_day):
+            if (schedule.schedule_id, start) in existing:
+                continue
+            rows.append({
+                "schedule_id": schedule.schedule_id,
+                "created_by": schedule.created_by,
+                "title": schedule.title,
+                "start_time": start,
+                "end_time": end,
+                "qr_code": "",
+                "gps_lat": schedule.gps_lat,
+                "gps_lon": schedule.gps_lon,
+                "allowed_radius": schedule.allowed_radius,
+                "geofence": schedule.geofence,
+                "qr_rotation_seconds": schedule.qr_rotation_seconds,
+            })
+    if rows:
+        db.execute(insert(AttendanceSession), rows)
+        # The QR path needs the id, which the database just assigned
+        db.execute(
+            update(AttendanceSession)
+            .where(AttendanceSession.schedule_id.in_(by_id), AttendanceSession.qr_code == "")
+            .values(qr_code="/sessions/" + cast(AttendanceSession.session_id, String) + "/qr")
+            .execution_options(synchronize_session=False)
+        )
+    return len(rows)
+
+
+def materialize_window(db, today=None, window_days=SCHEDULE_WINDOW_DAYS):
+    """
+    Generates every schedule's sessions up to `window_days` ahead of today,
+    starting where it last stopped. Returns how many were created. The
+    caller commits.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    horizon = today + timedelta(days=window_days)
+    schedules = db.execute(
+        select(RecurringSchedule).where(
+            RecurringSchedule.end_date >= today,
+            RecurringSchedule.start_date <= horizon,
+            (RecurringSchedule.materialized_through.is_(None)) | (RecurringSchedule.materialized_through < horizon),
+        )
+    ).scalars().all()
+    return materialize(db, schedules, today, window_days)
+
+
+def materialize(db, schedules, today=None, window_days=SCHEDULE_WINDOW_DAYS):
+    """
+    materialize_window for the given schedules only.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    horizon = today + timedelta(days=window_days)
+    # Schedules that stopped on the same day continue together, one INSERT each.
+    # Days already past are never back-filled
+    groups = {}
+    for schedule in schedules:
+        resume = today
+        if schedule.materialized_through is not None:
+            resume = max(resume, schedule.materialized_through + timedelta(days=1))
+        groups.setdefault(resume, []).append(schedule)
+    created = sum(generate_sessions(db, group, first_day, horizon) for first_day, group in groups.items())
+    for schedule in schedules:
+        if schedule.materialized_through is None or schedule.materialized_through < horizon:
+            schedule.materialized_through = min(horizon, schedule.end_date)
+    return created
+
+
+def extend_window(db, job):
+    created = materialize_window(db)
+    pending = db.execute(
+        select(Job.job_id).where(Job.kind == WINDOW_JOB, Job.status == "queued").limit(1)
+    ).first()
+    if pending is None:
+        enqueue(db, WINDOW_JOB, run_after=datetime.now(timezone.utc) + timedelta(seconds=SCHEDULE_REFRESH_SECONDS))
+    logger.info("Timetable window extended by %d sessions", created)
+
+
+def ensure_window_job(db):
+    """
+    Queues the job that keeps the window rolling, unless one already is
+    (another worker process may have started first).
+    """
+    active = db.execute(
+        select(Job.job_id).where(Job.kind == WINDOW_JOB, Job.status.in_(("queued", "running"))).limit(1)
+    ).first()
+    if active is None:
+        enqueue(db, WINDOW_JOB)
+        db.commit()
+
+
+job_queue.register(WINDOW_JOB, extend_window)
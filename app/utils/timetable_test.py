@@ -0,0 +1,85 @@
+from datetime import date, datetime, time, timezone
+
+import pytest
+
+from app.models import AttendanceSession
+from app.schemas import RecurringScheduleCreate
+from app.utils.attendance_store_test import make_sessionmaker
+from app.utils.session_registry import as_utc
+from app.utils.timetable import generate_sessions, materialize, materialize_window, new_schedule, occurrences
+
+
+def spec(**overrides):
+    fields = dict(
+        title="CSC 101", weekdays=[1, 3], start_time=time(9, 0), duration_minutes=60,
+        start_date=date(2026, 1, 5), end_date=date(2026, 4, 17), gps_lat=6.52, gps_lon=3.37, allowed_radius=80,
+    )
+    fields.update(overrides)
+    return RecurringScheduleCreate(**fields)
+
+
+def add_schedule(db, **overrides):
+    schedule = new_schedule(spec(**overrides), created_by=1)
+    db.add(schedule)
+    db.flush()
+    return schedule
+
+
+def test_occurrences_follow_weekdays_exceptions_and_local_time():
+    schedule = new_schedule(spec(
+        timezone="Europe/London", start_date=date(2026, 3, 23), end_date=date(2026, 4, 3),
+        exceptions=[date(2026, 3, 25)],
+    ))
+    starts = [start for start, _ in occurrences(schedule, date(2026, 1, 1), date(2026, 12, 31))]
+    # Mondays and Wednesdays minus the exception; 09:00 London is 09:00 UTC
+    # before the clocks change on 29 March and 08:00 UTC after
+    assert starts == [
+        datetime(2026, 3, 23, 9, tzinfo=timezone.utc),
+        datetime(2026, 3, 30, 8, tzinfo=timezone.utc),
+        datetime(2026, 4, 1, 8, tzinfo=timezone.utc),
+    ]
+
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(ValueError):
+        new_schedule(spec(weekdays=[0]))
+    with pytest.raises(ValueError):
+        new_schedule(spec(end_date=date(2025, 1, 1)))
+    with pytest.raises(ValueError):
+        new_schedule(spec(timezone="Mars/Olympus"))
+
+
+def test_generated_sessions_copy_the_template_and_are_not_duplicated(tmp_path):
+    SessionLocal = make_sessionmaker(tmp_path)
+    db = SessionLocal()
+    schedule = add_schedule(db)
+    assert generate_sessions(db, [schedule], date(2026, 1, 5), date(2026, 1, 18)) == 4
+    assert generate_sessions(db, [schedule], date(2026, 1, 1), date(2026, 1, 31)) == 4
+    db.commit()
+
+    sessions = db.query(AttendanceSession).order_by(AttendanceSession.start_time).all()
+    assert len(sessions) == 8
+    first = sessions[0]
+    assert as_utc(first.start_time) == datetime(2026, 1, 5, 9, tzinfo=timezone.utc)
+    assert (first.title, first.allowed_radius, first.schedule_id) == ("CSC 101", 80, schedule.schedule_id)
+    assert first.qr_image is None
+    assert all(s.qr_code == f"/sessions/{s.session_id}/qr" for s in sessions)
+    db.close()
+
+
+def test_window_rolls_forward_without_backfilling(tmp_path):
+    SessionLocal = make_sessionmaker(tmp_path)
+    db = SessionLocal()
+    schedule = add_schedule(db)
+    # Created mid-semester: nothing before today, two weeks ahead
+    assert materialize(db, [schedule], today=date(2026, 2, 2), window_days=13) == 4
+    assert schedule.materialized_through == date(2026, 2, 15)
+    db.commit()
+
+    assert materialize_window(db, today=date(2026, 2, 2), window_days=13) == 0
+    assert materialize_window(db, today=date(2026, 2, 9), window_days=13) == 2
+    assert materialize_window(db, today=date(2026, 4, 13), window_days=13) == 2
+    assert schedule.materialized_through == date(2026, 4, 17)
+    db.commit()
+    assert db.query(AttendanceSession).count() == 8
+    db.close()
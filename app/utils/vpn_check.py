@@ -1,19 +1,297 @@
 # vpn_check.py
-import requests
+import asyncio
+import ipaddress
+import os
+import time
+from collections import OrderedDict
 
-def is_vpn(ip_address: str) -> bool:
+import httpx
+
+from app.utils.ip_ranges import VPN_CIDR_RELOAD_SECONDS, OfflineIPDatabase
+
+VPN_CHECK_MODE = os.getenv("VPN_CHECK_MODE", "online")  # "online", "offline" or "hybrid"
+VPN_FAIL_MODE = os.getenv("VPN_FAIL_MODE", "open")  # "open": allow on lookup failure, "closed": reject
+VPN_CACHE_TTL_SECONDS = float(os.getenv("VPN_CACHE_TTL_SECONDS", "3600"))
+VPN_CACHE_MAX_ENTRIES = int(os.getenv("VPN_CACHE_MAX_ENTRIES", "50000"))
+# Off by default: a /24 can straddle a provider's range boundaries, so one
+# answer would be applied to neighbours it isn't true for
+VPN_CACHE_BY_PREFIX = os.getenv("VPN_CACHE_BY_PREFIX", "0") == "1"
+VPN_LOOKUP_TIMEOUT = float(os.getenv("VPN_LOOKUP_TIMEOUT", "2"))
+VPN_SLOW_SECONDS = float(os.getenv("VPN_SLOW_SECONDS", "1"))
+VPN_BREAKER_FAILURES = int(os.getenv("VPN_BREAKER_FAILURES", "5"))
+VPN_BREAKER_COOLDOWN_SECONDS = float(os.getenv("VPN_BREAKER_COOLDOWN_SECONDS", "30"))
+
+
+class VPNLookupError(Exception):
+    """Raised by a provider when it can't give an answer for an IP."""
+
+
+class IpApiProvider:
     """
-    Detect if an IP belongs to a VPN/Proxy using ip-api.com.
-    Returns True if VPN/Proxy is detected.
+    ip-api.com over a shared async HTTP client.
     """
-    try:
-        url = f"http://ip-api.com/json/{ip_address}?fields=proxy,hosting"
-        response = requests.get(url, timeout=5)
+
+    name = "ip-api"
+
+    def __init__(self, timeout=VPN_LOOKUP_TIMEOUT):
+        self.timeout = timeout
+        self._client = None
+
+    async def lookup(self, ip_address):
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        response = await self._client.get(f"http://ip-api.com/json/{ip_address}?fields=status,message,proxy,hosting")
         data = response.json()
+        if data.get("status") == "fail":
+            raise VPNLookupError(data.get("message", "lookup failed"))
+        return bool(data.get("proxy", False) or data.get("hosting", False))
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class StaticProvider:
+    """
+    Answers from a fixed {ip: is_vpn} map; for tests and local development.
+    """
+
+    name = "static"
+
+    def __init__(self, answers=None, default=False):
+        self.answers = dict(answers or {})
+        self.default = default
+        self.calls = 0
+
+    async def lookup(self, ip_address):
+        self.calls += 1
+        return self.answers.get(ip_address, self.default)
+
+    async def aclose(self):
+        pass
+
+
+class OfflineProvider:
+    """
+    Answers from local datacenter/hosting/VPN CIDR files; no network calls.
+    """
+
+    name = "offline"
+
+    def __init__(self, database=None):
+        self.database = database or OfflineIPDatabase()
+
+    async def lookup(self, ip_address):
+        if self.database.reload_due():
+            await asyncio.to_thread(self.database.reload, False)
+        return self.database.lookup(ip_address) is not None
+
+    async def aclose(self):
+        pass
+
+
+class HybridProvider:
+    """
+    Offline ranges first; only addresses they don't flag go to the online provider.
+    """
+
+    name = "hybrid"
+
+    def __init__(self, offline, online):
+        self.offline = offline
+        self.online = online
+
+    async def lookup(self, ip_address):
+        if await self.offline.lookup(ip_address):
+            return True
+        return await self.online.lookup(ip_address)
+
+    async def aclose(self):
+        await self.online.aclose()
+
+
+class _TTLCache:
+    def __init__(self, ttl_seconds, max_entries):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class VPNChecker:
+    """
+    Async VPN/proxy check in front of a pluggable provider.
+
+    Answers are cached per IP and, optionally, per /24 (IPv4) or /64 (IPv6)
+    prefix so a campus NAT costs one lookup per TTL. IPv4-mapped IPv6
+    addresses are treated as the IPv4 address they carry. Concurrent lookups of
+    the same IP share one provider call. After `breaker_failures`
+    consecutive failures or slow answers the provider is skipped for
+    `breaker_cooldown` seconds, then retried with a single probe. While no
+    answer is available, `fail_open` decides: False (allow) or True (block).
+    """
+
+    def __init__(
+        self,
+        provider,
+        ttl_seconds=VPN_CACHE_TTL_SECONDS,
+        max_entries=VPN_CACHE_MAX_ENTRIES,
+        cache_by_prefix=VPN_CACHE_BY_PREFIX,
+        fail_open=VPN_FAIL_MODE != "closed",
+        slow_seconds=VPN_SLOW_SECONDS,
+        breaker_failures=VPN_BREAKER_FAILURES,
+        breaker_cooldown=VPN_BREAKER_COOLDOWN_SECONDS,
+    ):
+        self.provider = provider
+        self.cache_by_prefix = cache_by_prefix
+        self.fail_open = fail_open
+        self.slow_seconds = slow_seconds
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self._cache = _TTLCache(ttl_seconds, max_entries)
+        self._in_flight = {}
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+        self._probing = False
+        self._counts = {"lookups": 0, "cache_hits": 0, "prefix_hits": 0, "coalesced": 0, "provider_calls": 0, "failures": 0, "short_circuited": 0}
+
+    @staticmethod
+    def prefix_key(address):
+        bits = 24 if address.version == 4 else 64
+        return str(ipaddress.ip_network(f"{address}/{bits}", strict=False))
+
+    @property
+    def breaker_state(self):
+        if self._open_until == 0.0:
+            return "closed"
+        return "open" if time.monotonic() < self._open_until else "half-open"
+
+    async def is_vpn(self, ip_address):
+        self._counts["lookups"] += 1
+        try:
+            address = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return self._fallback()
+        # A dual-stack listener reports IPv4 clients as ::ffff:a.b.c.d, which
+        # would otherwise all share one ::/64 prefix
+        address = getattr(address, "ipv4_mapped", None) or address
+        if not address.is_global:
+            # Private, loopback and link-local clients can't be looked up
+            return False
+
+        key = str(address)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._counts["cache_hits"] += 1
+            return cached
+        if self.cache_by_prefix:
+            cached = self._cache.get(self.prefix_key(address))
+            if cached is not None:
+                self._counts["prefix_hits"] += 1
+                return cached
+
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self._counts["coalesced"] += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if pending.cancelled():  # the leading request went away, not us
+                    return self._fallback()
+                raise
+
+        state = self.breaker_state
+        if state == "open" or (state == "half-open" and self._probing):
+            self._counts["short_circuited"] += 1
+            return self._fallback()
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        self._probing = state == "half-open"
+        try:
+            result = await self._lookup(address)
+            future.set_result(result)
+            return result
+        except BaseException:
+            # Only cancellation gets here; _lookup turns errors into the fallback
+            future.cancel()
+            raise
+        finally:
+            self._probing = False
+            del self._in_flight[key]
+
+    async def _lookup(self, address):
+        self._counts["provider_calls"] += 1
+        started = time.monotonic()
+        try:
+            result = await self.provider.lookup(str(address))
+        except Exception:
+            self._counts["failures"] += 1
+            self._record_failure()
+            return self._fallback()
+
+        if time.monotonic() - started > self.slow_seconds:
+            self._record_failure()
+        else:
+            self._consecutive_failures = 0
+            self._open_until = 0.0
+        self._cache.set(str(address), result)
+        if self.cache_by_prefix:
+            self._cache.set(self.prefix_key(address), result)
+        return result
+
+    def _record_failure(self):
+        self._consecutive_failures += 1
+        if self._consecutive_failures >= self.breaker_failures or self.breaker_state == "half-open":
+            self._open_until = time.monotonic() + self.breaker_cooldown
+
+    def _fallback(self):
+        # Failures are never cached, so the next request tries again
+        return not self.fail_open
+
+    async def aclose(self):
+        await self.provider.aclose()
+
+    def stats(self):
+        lookups = self._counts["lookups"] or 1
+        return {
+            "provider": self.provider.name,
+            "fail_mode": "open" if self.fail_open else "closed",
+            "breaker": self.breaker_state,
+            "cached_entries": len(self._cache),
+            "hit_rate": (self._counts["cache_hits"] + self._counts["prefix_hits"]) / lookups,
+            **self._counts,
+        }
+
+
+def build_vpn_checker(mode=VPN_CHECK_MODE):
+    if mode == "offline":
+        # Lookups are microseconds; the short TTL lets hot-reloaded ranges
+        # take effect, and a /24 may straddle range boundaries
+        return VPNChecker(OfflineProvider(), ttl_seconds=VPN_CIDR_RELOAD_SECONDS, cache_by_prefix=False)
+    if mode == "hybrid":
+        return VPNChecker(HybridProvider(OfflineProvider(), IpApiProvider()))
+    return VPNChecker(IpApiProvider())
 
-        # If 'proxy' or 'hosting' is True, it might be VPN/Datacenter IP
-        return data.get("proxy", False) or data.get("hosting", False)
 
-    except Exception as e:
-        print("VPN check error:", e)
-        return False
+vpn_checker = build_vpn_checker()
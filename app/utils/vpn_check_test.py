@@ -1,7 +1,91 @@
-from vpn_check import is_vpn
+import asyncio
 
-user_ip = "8.8.8.8"  # Example IP
-if is_vpn(user_ip):
-    print("VPN detected! Access denied.")
-else:
-    print("No VPN detected.")
+from app.utils.vpn_check import StaticProvider, VPNChecker
+
+
+class SlowProvider(StaticProvider):
+    async def lookup(self, ip_address):
+        await asyncio.sleep(0.05)
+        return await super().lookup(ip_address)
+
+
+class FailingProvider(StaticProvider):
+    async def lookup(self, ip_address):
+        self.calls += 1
+        raise TimeoutError("provider down")
+
+
+def test_detects_vpn_and_caches_by_ip_and_prefix():
+    provider = StaticProvider({"8.8.8.8": True})
+    checker = VPNChecker(provider, cache_by_prefix=True)
+
+    async def run():
+        assert await checker.is_vpn("8.8.8.8") is True
+        assert await checker.is_vpn("8.8.8.8") is True
+        # Same /24 answered from the prefix entry
+        assert await checker.is_vpn("8.8.8.9") is True
+        assert await checker.is_vpn("1.1.1.1") is False
+
+    asyncio.run(run())
+    assert provider.calls == 2
+
+
+def test_private_addresses_skip_the_provider():
+    provider = StaticProvider(default=True)
+    checker = VPNChecker(provider)
+    assert asyncio.run(checker.is_vpn("192.168.1.10")) is False
+    assert provider.calls == 0
+
+
+def test_concurrent_lookups_are_coalesced():
+    provider = SlowProvider({"8.8.8.8": True})
+    checker = VPNChecker(provider, cache_by_prefix=False)
+
+    async def run():
+        return await asyncio.gather(*[checker.is_vpn("8.8.8.8") for _ in range(20)])
+
+    assert asyncio.run(run()) == [True] * 20
+    assert provider.calls == 1
+
+
+def test_breaker_opens_and_fail_policy_applies():
+    provider = FailingProvider()
+    fail_open = VPNChecker(provider, breaker_failures=3, breaker_cooldown=60)
+    fail_closed = VPNChecker(FailingProvider(), fail_open=False)
+
+    async def run():
+        results = [await fail_open.is_vpn(f"8.8.{i}.8") for i in range(10)]
+        return results, await fail_closed.is_vpn("8.8.8.8")
+
+    open_results, closed_result = asyncio.run(run())
+    assert open_results == [False] * 10
+    assert provider.calls == 3
+    assert fail_open.breaker_state == "open"
+    assert closed_result is True
+
+
+def test_ipv4_mapped_addresses_are_checked_as_ipv4():
+    provider = StaticProvider({"8.8.8.8": True})
+    checker = VPNChecker(provider, cache_by_prefix=True)
+
+    async def run():
+        assert await checker.is_vpn("::ffff:8.8.8.8") is True
+        # A different client, not the same ::/64 as the first
+        assert await checker.is_vpn("::ffff:1.1.1.1") is False
+        assert await checker.is_vpn("8.8.8.8") is True
+        assert await checker.is_vpn("::ffff:192.168.1.10") is False
+
+    asyncio.run(run())
+    assert provider.calls == 2
+
+
+def test_prefix_caching_is_off_by_default():
+    provider = StaticProvider({"8.8.8.8": True})
+    checker = VPNChecker(provider)
+
+    async def run():
+        assert await checker.is_vpn("8.8.8.8") is True
+        assert await checker.is_vpn("8.8.8.9") is False
+
+    asyncio.run(run())
+    assert provider.calls == 2
@@ -0,0 +1,353 @@
+# utils/write_behind.py
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+
+from sqlalchemy.exc import InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+
+from app.utils.attendance_store import RollupBatch, upsert_attendance
+
+try:
+    import fcntl  # the log is per worker process, claimed with flock
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+ATTENDANCE_WRITE_MODE = os.getenv("ATTENDANCE_WRITE_MODE", "direct")  # "direct" or "write_behind"
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "200"))
+WRITE_BEHIND_FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "50"))
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000"))
+WRITE_BEHIND_LOG = os.getenv("WRITE_BEHIND_LOG", "")  # empty disables the durability log
+WRITE_BEHIND_LOG_FSYNC = os.getenv("WRITE_BEHIND_LOG_FSYNC", "0") == "1"
+# Attempts at a whole batch before its events are written one by one
+WRITE_BEHIND_MAX_RETRIES = int(os.getenv("WRITE_BEHIND_MAX_RETRIES", "5"))
+# Events the database rejects go here as JSON lines; defaults to <WRITE_BEHIND_LOG>.dead
+WRITE_BEHIND_DEAD_LETTER = os.getenv("WRITE_BEHIND_DEAD_LETTER", "")
+
+# Errors that say nothing about the event itself (database down, locked, pool exhausted)
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, PoolTimeoutError)
+
+
+class WriteBehindFull(Exception):
+    """Raised when the write-behind queue already holds its maximum backlog."""
+
+
+@dataclass
+class AttendanceEvent:
+    session_id: int
+    user_id: int
+    latitude: float
+    longitude: float
+    score: float
+    at: datetime
+    vpn_detected: bool = False
+
+    def to_json(self):
+        data = asdict(self)
+        data["at"] = self.at.isoformat()
+        return json.dumps(data)
+
+    @classmethod
+    def from_json(cls, line):
+        data = json.loads(line)
+        data["at"] = datetime.fromisoformat(data["at"])
+        return cls(**data)
+
+
+class WriteBehindQueue:
+    """
+    Buffers validated attendance events and writes them in grouped
+    transactions: a flush happens every `batch_size` events or
+    `flush_interval_ms` after the first buffered one, whichever is first.
+
+    With `log_path` set, each event is appended to a local log before it is
+    acknowledged and the log is truncated whenever everything buffered has
+    been committed. Every worker process writes its own log,
+    `<log_path>.<n>`, holding an flock on it while it runs. `start()`
+    replays whatever a crash left in its log and in any other log no live
+    worker holds; replays are safe because upsert_attendance is idempotent
+    per event.
+
+    A batch that keeps failing is retried `max_retries` times, then written
+    event by event: events the database rejects are moved to the
+    dead-letter file, so one bad event can't stall the writer. Events that
+    fail because the database is unreachable stay queued and are retried.
+
+    `on_commit(session_id, user_id, action)` is called from the writer
+    thread for each event once its transaction commits, with the action the
+    upsert resolved ("check_in" or "check_out"); replayed events that were
+    already applied are skipped.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        batch_size=WRITE_BEHIND_BATCH_SIZE,
+        flush_interval_ms=WRITE_BEHIND_FLUSH_MS,
+        max_pending=WRITE_BEHIND_MAX_PENDING,
+        log_path=WRITE_BEHIND_LOG or None,
+        log_fsync=WRITE_BEHIND_LOG_FSYNC,
+        max_retries=WRITE_BEHIND_MAX_RETRIES,
+        dead_letter_path=WRITE_BEHIND_DEAD_LETTER or None,
+        on_commit=None,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_pending = max_pending
+        self.log_path = log_path
+        self.log_fsync = log_fsync
+        self.max_retries = max(1, max_retries)
+        self.dead_letter_path = dead_letter_path or (f"{log_path}.dead" if log_path else None)
+        self.on_commit = on_commit
+        self._log_file = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._log = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self._submitted = 0
+        self._flushed = 0
+        self._batches = 0
+        self._failures = 0
+        self._dead_lettered = 0
+        self._flush_seconds = 0.0
+
+    @property
+    def pending(self):
+        return self._submitted - self._flushed
+
+    def start(self):
+        if self._thread is not None:
+            return
+        if self.log_path:
+            self._log = self._claim_log()
+            self._log_file = self._log.name
+            try:
+                # Ours first, then any left by workers that are gone
+                replayed = self._replay(self._log)
+                for path in sorted(glob.glob(glob.escape(self.log_path) + ".*")) + [self.log_path]:
+                    if path != self._log_file and not path.endswith(".dead"):
+                        replayed += self._replay_orphan(path)
+            except Exception:
+                self._log.close()
+                self._log = None
+                raise
+            if replayed:
+                logger.warning("Replayed %d attendance events from %s*", replayed, self.log_path)
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="attendance-write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=30):
+        """
+        Flushes everything still buffered, then stops the writer thread.
+        """
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join(timeout)
+            self._thread = None
+        if self._log is not None:
+            # Closing releases the flock; the file stays for the next start
+            self._log.close()
+            self._log = None
+
+    def submit(self, event):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise WriteBehindFull("Attendance write queue is full")
+            if self._log is not None:
+                self._log.write(event.to_json() + "\n")
+                self._log.flush()
+                if self.log_fsync:
+                    os.fsync(self._log.fileno())
+            self._submitted += 1
+        self._queue.put(event)
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        unwritten = self._commit(batch, keep_trying=lambda: not self._stopping.is_set())
+        if unwritten:
+            # Give up on shutdown; the events are still in the log for the next start
+            logger.error("Dropping %d buffered attendance events at shutdown", len(unwritten))
+            return
+        self._flush_seconds += time.perf_counter() - started
+        self._batches += 1
+        with self._lock:
+            self._flushed += len(batch)
+            if self._log is not None and self.pending == 0:
+                self._log.truncate(0)
+                self._log.seek(0)
+
+    def _commit(self, batch, keep_trying):
+        """
+        Writes a batch, dead-lettering the events the database rejects.
+        Returns the events still unwritten once `keep_trying()` is false
+        because the database stayed unreachable.
+        """
+        delay = 0.05
+        attempts = 0
+        while batch:
+            try:
+                self._write(batch)
+                return []
+            except Exception as e:
+                self._failures += 1
+                attempts += 1
+                logger.error("Attendance batch of %d failed (attempt %d): %s", len(batch), attempts, e)
+            if attempts >= self.max_retries:
+                batch = self._write_one_by_one(batch)
+                attempts = 0
+                if batch and not keep_trying():
+                    return batch
+            if batch:
+                time.sleep(delay)
+                delay = min(delay * 2, 2.0)
+        return []
+
+    def _write_one_by_one(self, batch):
+        unwritten = []
+        for event in batch:
+            try:
+                self._write([event])
+            except TRANSIENT_ERRORS:
+                unwritten.append(event)
+            except Exception as e:
+                self._dead_letter(event, e)
+        return unwritten
+
+    def _dead_letter(self, event, error):
+        self._dead_lettered += 1
+        line = json.dumps({"event": json.loads(event.to_json()), "error": str(error)})
+        logger.error("Attendance event rejected, dead-lettered: %s", line)
+        if self.dead_letter_path:
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def _write(self, batch):
+        db = self.session_factory()
+        rollups = RollupBatch()
+        try:
+            actions = [
+                upsert_attendance(
+                    db, event.session_id, event.user_id, event.latitude, event.longitude,
+                    event.score, event.vpn_detected, now=event.at, rollups=rollups,
+                )
+                for event in batch
+            ]
+            rollups.apply(db)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        if self.on_commit is not None:
+            self._notify(batch, actions)
+
+    def _notify(self, batch, actions):
+        for event, action in zip(batch, actions):
+            if action is None:
+                continue
+            try:
+                self.on_commit(event.session_id, event.user_id, action)
+            except Exception:
+                # Committed already; a listener failing mustn't cause a retry
+                logger.exception("Attendance on_commit callback failed")
+
+    def _claim_log(self):
+        """
+        Opens and locks the first of <log_path>.0, .1, ... that no other
+        worker process holds.
+        """
+        if fcntl is None:
+            raise RuntimeError("WRITE_BEHIND_LOG needs flock (POSIX) to give each worker its own log")
+        n = 0
+        while True:
+            f = open(f"{self.log_path}.{n}", "a+", encoding="utf-8")
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return f
+            except BlockingIOError:
+                f.close()
+                n += 1
+
+    def _replay_orphan(self, path):
+        try:
+            f = open(path, "r+", encoding="utf-8")
+        except FileNotFoundError:
+            return 0
+        with f:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0  # a live worker's log
+            return self._replay(f)
+
+    def _replay(self, f):
+        """
+        Writes the events in a locked log, then empties it.
+        """
+        f.seek(0)
+        events = []
+        for line in f:
+            try:
+                events.append(AttendanceEvent.from_json(line))
+            except (ValueError, TypeError, KeyError):
+                # A torn last line from a crash mid-write
+                continue
+        for i in range(0, len(events), self.batch_size):
+            if self._commit(events[i:i + self.batch_size], keep_trying=lambda: False):
+                raise RuntimeError(f"Database unavailable while replaying {f.name}")
+        f.truncate(0)
+        f.seek(0)
+        return len(events)
+
+    def stats(self):
+        batches = self._batches or 1
+        return {
+            "running": self._thread is not None,
+            "pending": self.pending,
+            "flushed": self._flushed,
+            "batches": self._batches,
+            "mean_batch_size": self._flushed / batches,
+            "mean_flush_ms": self._flush_seconds / batches * 1000,
+            "failures": self._failures,
+            "dead_lettered": self._dead_lettered,
+            "log": self._log_file,
+        }
+
+
+def _session_factory():
+    from app.database import SessionLocal
+    return SessionLocal()
+
+
+write_behind = WriteBehindQueue(_session_factory)
@@ -0,0 +1,176 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models import AttendanceDailyRollup, AttendanceRecord, AttendanceUserRollup
+from app.utils.attendance_store_test import make_sessionmaker
+from app.utils.live_events import LiveEventHub
+from app.utils.write_behind import AttendanceEvent, WriteBehindFull, WriteBehindQueue
+
+
+def event(user_id, at):
+    return AttendanceEvent(1, user_id, 6.52, 3.37, 0.9, at)
+
+
+def test_events_are_flushed_in_batches(tmp_path):
+    SessionLocal = make_sessionmaker(tmp_path)
+    queue = WriteBehindQueue(SessionLocal, batch_size=50, flush_interval_ms=20, log_path=str(tmp_path / "wb.log"))
+    queue.start()
+    now = datetime.now(timezone.utc)
+    for user_id in range(200):
+        queue.submit(event(user_id, now))
+    queue.stop()
+
+    stats = queue.stats()
+    assert stats["pending"] == 0 and stats["flushed"] == 200
+    assert stats["batches"] < 200
+    assert (tmp_path / "wb.log.0").read_text() == ""
+    db = SessionLocal()
+    assert db.query(AttendanceRecord).count() == 200
+    # Rollups are applied once per batch, not per event
+    assert db.get(AttendanceDailyRollup, now.date()).check_ins == 200
+    assert db.query(AttendanceUserRollup).count() == 200
+    db.close()
+
+
+def test_log_is_replayed_on_start(tmp_path):
+    SessionLocal = make_sessionmaker(tmp_path)
+    log = tmp_path / "wb.log"
+    check_in_at = datetime.now(timezone.utc)
+    check_out_at = check_in_at + timedelta(minutes=50)
+    # A crash after logging (and maybe committing) these, plus a torn last line
+    log.write_text(
+        event(1, check_in_at).to_json() + "\n" + event(1, check_out_at).to_json() + "\n" + event(1, check_out_at).to_json() + '\n{"session_id": 1'
+    )
+
+    queue = WriteBehindQueue(SessionLocal, log_path=str(log))
+    queue.start()
+    queue.stop()
+
+    db = SessionLocal()
+    record = db.query(AttendanceRecord).one()
+    assert record.check_out_time == check_out_at.replace(tzinfo=None)
+    db.close()
+    assert log.read_text() == ""
+
+
+def test_submit_rejects_when_backlog_is_full(tmp_path):
+    queue = WriteBehindQueue(make_sessionmaker(tmp_path), max_pending=2)
+    now = datetime.now(timezone.utc)
+    queue.submit(event(1, now))
+    queue.submit(event(2, now))
+    with pytest.raises(WriteBehindFull):
+        queue.submit(event(3, now))
+
+
+def test_each_worker_gets_its_own_log_and_replays_orphans(tmp_path):
+    SessionLocal = make_sessionmaker(tmp_path)
+    log = tmp_path / "wb.log"
+    now = datetime.now(timezone.utc)
+    # Left by a worker that crashed; nobody holds its lock
+    (tmp_path / "wb.log.3").write_text(event(7, now).to_json() + "\n")
+
+    first = WriteBehindQueue(SessionLocal, log_path=str(log))
+    second = WriteBehindQueue(SessionLocal, log_path=str(log))
+    first.start()
+    second.start()
+    assert first.stats()["log"] != second.stats()["log"]
+    # The first worker's writer dies; the second worker's flush must not
+    # touch the events the first has only logged
+    first._stopping.set()
+    first._thread.join()
+    first._thread = None
+    first.submit(event(1, now))
+    second.submit(event(2, now))
+    second.stop()
+    assert event(1, now).to_json() in (tmp_path / "wb.log.0").read_text()
+    first.stop()
+
+    db = SessionLocal()
+    assert {r.user_id for r in db.query(AttendanceRecord)} == {2, 7}
+    db.close()
+    assert (tmp_path / "wb.log.3").read_text() == ""
+
+    # The next start replays what the first worker logged but never wrote
+    third = WriteBehindQueue(SessionLocal, log_path=str(log))
+    third.start()
+    third.stop()
+    db = SessionLocal()
+    assert {r.user_id for r in db.query(AttendanceRecord)} == {1, 2, 7}
+    db.close()
+
+
+def test_rejected_event_is_dead_lettered_without_stalling_the_batch(tmp_path):
+    SessionLocal = make_sessionmaker(tmp_path)
+    dead = tmp_path / "dead.jsonl"
+    queue = WriteBehindQueue(SessionLocal, flush_interval_ms=20, max_retries=2, dead_letter_path=str(dead))
+    write = queue._write
+
+    def failing_write(batch):
+        if any(e.user_id == 13 for e in batch):
+            raise ValueError("bad event")
+        write(batch)
+
+    queue._write = failing_write
+    queue.start()
+    now = datetime.now(timezone.utc)
+    for user_id in (12, 13, 14):
+        queue.submit(event(user_id, now))
+    queue.stop()
+
+    stats = queue.stats()
+    assert stats["pending"] == 0 and stats["dead_lettered"] == 1 and stats["failures"] == 2
+    assert '"user_id": 13' in dead.read_text() and "bad event" in dead.read_text()
+    db = SessionLocal()
+    assert {r.user_id for r in db.query(AttendanceRecord)} == {12, 14}
+    db.close()
+
+
+def test_unreachable_database_keeps_events_queued(tmp_path):
+    from sqlalchemy.exc import OperationalError
+
+    SessionLocal = make_sessionmaker(tmp_path)
+    queue = WriteBehindQueue(SessionLocal, max_retries=1)
+    calls = []
+
+    def down(batch):
+        calls.append(len(batch))
+        if len(calls) < 4:
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        write(batch)
+
+    write = queue._write
+    queue._write = down
+    now = datetime.now(timezone.utc)
+    queue.submit(event(1, now))
+    queue.submit(event(2, now))
+    queue._flush([event(1, now), event(2, now)])
+
+    assert queue.stats()["dead_lettered"] == 0 and queue.pending == 0
+    db = SessionLocal()
+    assert db.query(AttendanceRecord).count() == 2
+    db.close()
+
+
+def test_committed_actions_reach_live_subscribers(tmp_path):
+    async def run():
+        hub = LiveEventHub()
+        subscription = hub.subscribe(1)
+        queue = WriteBehindQueue(make_sessionmaker(tmp_path), flush_interval_ms=20)
+        queue.on_commit = hub.threadsafe_publisher(asyncio.get_running_loop())
+        queue.start()
+        now = datetime.now(timezone.utc)
+        queue.submit(event(1, now))
+        queue.submit(event(2, now))
+        queue.submit(event(1, now + timedelta(minutes=50)))
+        # A replayed duplicate changes nothing and publishes nothing
+        queue.submit(event(2, now))
+
+        events = [await subscription.get(timeout=2) for _ in range(4)]
+        queue.stop()
+        assert [e["type"] for e in events] == ["snapshot", "check_in", "check_in", "check_out"]
+        assert (events[-1]["check_ins"], events[-1]["check_outs"]) == (2, 1)
+        assert await subscription.get(timeout=0.1) is None
+
+    asyncio.run(run())
@@ -0,0 +1,87 @@
+# benchmarks/auth_bench.py
+"""
+Per-request cost of get_current_user: a user lookup per request vs.
+signed claims checked against the recently-changed-users set.
+
+    python -m benchmarks.auth_bench [--users 10000] [--requests 20000]
+
+Seeds a fresh SQLite file and calls the dependency the way FastAPI does,
+with a new Session per request, for tokens of random users. Also times
+bare JWT decoding with the secret string vs. the cached key object.
+"""
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from jose import jwt
+from sqlalchemy.orm import sessionmaker
+
+from app import auth
+from app.database import Base, create_db_engine
+from app.models import User
+from app.utils.auth_cache import user_state_cache
+
+
+def timed(label, fn, requests):
+    started = time.perf_counter()
+    for i in range(requests):
+        fn(i)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {elapsed / requests * 1e6:9.1f} us/request")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+    auth.JWT_SECRET_KEY = auth.JWT_SECRET_KEY or "benchmark-secret"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{Path(tmp) / 'auth.db'}")
+        Base.metadata.create_all(engine)
+        SessionLocal = sessionmaker(bind=engine)
+        db = SessionLocal()
+        # Registered a while ago; one in a hundred changed within the revocation window
+        now = datetime.now(timezone.utc)
+        db.bulk_insert_mappings(User, [
+            {
+                "full_name": f"User {i}",
+                "email": f"user{i}@example.com",
+                "password_hash": "x",
+                "role": "student",
+                "updated_at": now - timedelta(minutes=5 if i % 100 == 0 else 60 * 24),
+            }
+            for i in range(args.users)
+        ])
+        db.commit()
+        tokens = [auth.create_access_token(auth.access_token_claims(user)) for user in db.query(User)]
+        db.close()
+        rng = random.Random(0)
+        picks = [rng.choice(tokens) for _ in range(args.requests)]
+
+        def request(i):
+            db = SessionLocal()
+            try:
+                auth.get_current_user(picks[i], db)
+            finally:
+                db.close()
+
+        timed("decode, secret string", lambda i: jwt.decode(
+            picks[i], auth.JWT_SECRET_KEY, algorithms=[auth.JWT_ALGORITHM]), args.requests)
+        timed("decode, cached key", lambda i: auth.decode_access_token(picks[i]), args.requests)
+
+        auth.AUTH_VERIFY_MODE = "database"
+        timed("get_current_user, database", request, args.requests)
+        auth.AUTH_VERIFY_MODE = "claims"
+        user_state_cache.clear()
+        timed("get_current_user, claims", request, args.requests)
+        print(f"claims mode refreshes: {user_state_cache.stats()['refreshes']}, "
+              f"changed users in window: {user_state_cache.stats()['changed_users']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# benchmarks/dashboard_bench.py
+"""
+Admin dashboard query cost: func.date() scans over attendance_records vs.
+the rollup tables.
+
+    python -m benchmarks.dashboard_bench [--records 500000] [--days 120]
+
+Seeds a fresh SQLite file with --records check-ins spread over --days,
+rebuilds the rollups, then times the old and new summary/analytics queries.
+"""
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, create_db_engine
+from app.models import AttendanceDailyRollup, AttendanceRecord, AttendanceSessionRollup
+from app.utils.attendance_store import rebuild_rollups
+
+
+def seed(db, records, days):
+    rng = random.Random(0)
+    start = datetime.now(timezone.utc) - timedelta(days=days - 1)
+    rows = [
+        {
+            "session_id": i // 300,
+            "user_id": i % 300,
+            "check_in_time": start + timedelta(days=rng.randrange(days), seconds=rng.randrange(86400)),
+            "gps_lat": 6.52,
+            "gps_lon": 3.37,
+            "face_match_score": 0.9,
+        }
+        for i in range(records)
+    ]
+    db.bulk_insert_mappings(AttendanceRecord, rows)
+    db.commit()
+
+
+def timed(label, fn, repeat=5):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    print(f"{label:<34} {(time.perf_counter() - started) / repeat * 1000:9.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=500_000)
+    parser.add_argument("--days", type=int, default=120)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{Path(tmp) / 'dashboard.db'}")
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine)()
+        seed(db, args.records, args.days)
+        started = time.perf_counter()
+        rebuild_rollups(db)
+        db.commit()
+        print(f"{args.records:,} records, rollups rebuilt in {time.perf_counter() - started:.2f} s")
+
+        today = datetime.now(timezone.utc).date()
+        record_date = func.date(AttendanceRecord.check_in_time)
+
+        timed("scan: present today", lambda: db.query(AttendanceRecord).filter(record_date == today).count())
+        timed("scan: by session today", lambda: db.query(AttendanceRecord.session_id, func.count()).filter(
+            record_date == today).group_by(AttendanceRecord.session_id).all())
+        timed("scan: last 7 days", lambda: db.query(record_date, func.count()).group_by(record_date).order_by(
+            record_date.desc()).limit(7).all())
+
+        timed("rollup: present today", lambda: db.query(AttendanceDailyRollup.check_ins).filter(
+            AttendanceDailyRollup.day == today).scalar())
+        timed("rollup: by session today", lambda: db.query(AttendanceSessionRollup).filter(
+            AttendanceSessionRollup.day == today).all())
+        timed("rollup: last 7 days", lambda: db.query(AttendanceDailyRollup).order_by(
+            AttendanceDailyRollup.day.desc()).limit(7).all())
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
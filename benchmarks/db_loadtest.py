@@ -0,0 +1,122 @@
+# benchmarks/db_loadtest.py
+"""
+Requests/s of the check-in database path, sync Session on the threadpool
+vs. AsyncSession with the repositories, at 500 concurrent clients.
+
+    python -m benchmarks.db_loadtest [--concurrency 500] [--requests 5000] [--db-latency-ms 0]
+
+Runs in-process against a fresh SQLite file; each request does what
+mark_attendance does on a cache miss: user lookup, session lookup and the
+check-in upsert + commit. --db-latency-ms adds a simulated network round
+trip per query (time.sleep on the sync side, asyncio.sleep on the async
+side) to approximate a PostgreSQL server on another host.
+
+Against a live server, use benchmarks.loadtest --concurrency 500.
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.database import Base, create_async_db_engine, create_db_engine
+from app.models import AttendanceSession, User
+from app.repositories import AttendanceRepository, SessionRepository, UserRepository
+from app.utils.attendance_store import upsert_attendance
+from benchmarks.loadtest import fire, report
+
+USERS = 1000
+
+
+def seed(SessionLocal):
+    db = SessionLocal()
+    now = datetime.now(timezone.utc)
+    db.add(AttendanceSession(session_id=1, title="CSC 101", start_time=now, end_time=now + timedelta(hours=2), qr_code=""))
+    db.add_all(
+        User(user_id=i, full_name=f"Student {i}", email=f"s{i}@example.com", password_hash="x", role="student", face_embedding=b"\x00" * 512)
+        for i in range(1, USERS + 1)
+    )
+    db.commit()
+    db.close()
+
+
+def build_app(url, latency):
+    SessionLocal = sessionmaker(bind=create_db_engine(url), autoflush=False)
+    async_engine = create_async_db_engine(url)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.post("/sync/{user_id}")
+    def sync_check_in(user_id: int, db: Session = Depends(get_db)):
+        time.sleep(latency)
+        db.query(User.face_embedding, User.embedding_dtype).filter(User.user_id == user_id).first()
+        time.sleep(latency)
+        db.query(AttendanceSession).filter(AttendanceSession.session_id == 1).first()
+        time.sleep(latency)
+        action = upsert_attendance(db, 1, user_id, 6.52, 3.37, 0.9)
+        db.commit()
+        return {"action": action}
+
+    @app.post("/async/{user_id}")
+    async def async_check_in(user_id: int, db: AsyncSession = Depends(get_async_db)):
+        await asyncio.sleep(latency)
+        await UserRepository(db).get_face_embedding(user_id)
+        await asyncio.sleep(latency)
+        await SessionRepository(db).get(1)
+        await asyncio.sleep(latency)
+        action = await AttendanceRepository(db).toggle(1, user_id, 6.52, 3.37, 0.9)
+        await db.commit()
+        return {"action": action}
+
+    return app, SessionLocal, async_engine
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{Path(tmp) / 'load.db'}"
+        engine = create_db_engine(url)
+        Base.metadata.create_all(engine)
+        engine.dispose()
+        app, SessionLocal, async_engine = build_app(url, args.db_latency_ms / 1000)
+        seed(SessionLocal)
+
+        counter = iter(range(10 ** 9))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for mode in ("sync", "async"):
+                latencies, elapsed, errors = await fire(
+                    client, lambda c: c.post(f"/{mode}/{next(counter) % USERS + 1}"), args.requests, args.concurrency
+                )
+                report(f"{mode} ({args.concurrency} clients)", latencies, elapsed, errors)
+        await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--db-latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
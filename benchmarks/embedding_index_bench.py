@@ -0,0 +1,68 @@
+# benchmarks/embedding_index_bench.py
+"""
+Latency and recall of the 1:N embedding index at 1k, 10k and 100k users.
+
+    python -m benchmarks.embedding_index_bench [--queries 500]
+
+Enrollment vectors are random 128-d unit vectors; each query is an enrolled
+vector plus noise, so the correct answer is known. With hnswlib installed
+the HNSW backend is measured as well, with recall against exact search.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.utils.embedding_codec import encode_embedding
+from app.utils.embedding_index import EmbeddingIndex, hnswlib
+
+DIM = 128
+
+
+def build(vectors, ann_threshold):
+    index = EmbeddingIndex(ann_threshold=ann_threshold)
+    for user_id, vector in enumerate(vectors, start=1):
+        index.add(user_id, encode_embedding(vector))
+    return index
+
+
+def measure(index, queries, truth):
+    latencies, hits, results = [], 0, []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        best = index.search(query, k=1)[0][0]
+        latencies.append(time.perf_counter() - started)
+        results.append(best)
+        hits += best == expected
+    latencies = np.array(latencies) * 1000
+    return hits / len(queries), np.percentile(latencies, 50), np.percentile(latencies, 99), results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--noise", type=float, default=0.05)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for size in (1_000, 10_000, 100_000):
+        vectors = rng.standard_normal((size, DIM)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        truth = rng.integers(0, size, args.queries)
+        queries = vectors[truth] + args.noise * rng.standard_normal((args.queries, DIM)).astype(np.float32)
+
+        started = time.perf_counter()
+        exact = build(vectors, ann_threshold=size + 1)
+        build_seconds = time.perf_counter() - started
+        recall, p50, p99, exact_results = measure(exact, queries, truth + 1)
+        print(f"{size:>7} users  exact  build {build_seconds:6.2f}s  recall@1 {recall:.3f}  p50 {p50:.3f} ms  p99 {p99:.3f} ms")
+
+        if hnswlib is not None:
+            ann = build(vectors, ann_threshold=0)
+            recall, p50, p99, ann_results = measure(ann, queries, truth + 1)
+            agreement = np.mean(np.array(ann_results) == np.array(exact_results))
+            print(f"{size:>7} users  hnsw   recall@1 {recall:.3f}  vs exact {agreement:.3f}  p50 {p50:.3f} ms  p99 {p99:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
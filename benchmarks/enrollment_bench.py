@@ -0,0 +1,58 @@
+# benchmarks/enrollment_bench.py
+"""
+Bulk enrollment throughput through run_job with the real process pool.
+
+    python -m benchmarks.enrollment_bench [--users 2000] [--rounds 10] [--workers N]
+
+Enrolls --users admin rows (no photo) into a fresh SQLite file, so it
+measures what the pipeline itself costs: CSV parsing, bcrypt on the pool
+and batched inserts. Rows with photos add one face detection + embedding
+per row on the same pool (roughly 100-300 ms of CPU each for Facenet), so
+multiply accordingly; deepface must be installed for those.
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, create_db_engine
+from app.utils import bulk_enrollment
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bulk_enrollment.ENROLLMENT_DIR = str(Path(tmp) / "enrollments")
+        bulk_enrollment.ENROLLMENT_WORKERS = args.workers
+        engine = create_db_engine(f"sqlite:///{Path(tmp) / 'enroll.db'}")
+        Base.metadata.create_all(engine)
+        SessionLocal = sessionmaker(bind=engine)
+
+        csv_text = "full_name,email,role,password\n" + "".join(
+            f"User {i},user{i}@example.com,admin,initial-{i}\n" for i in range(args.users)
+        )
+        db = SessionLocal()
+        job_id = bulk_enrollment.create_job(db, io.BytesIO(csv_text.encode())).job_id
+        db.commit()
+        db.close()
+
+        started = time.perf_counter()
+        status = bulk_enrollment.run_job(SessionLocal, job_id, rounds=args.rounds)
+        elapsed = time.perf_counter() - started
+        rate = status["succeeded"] / elapsed
+        print(f"{status['succeeded']:,} users in {elapsed:.1f} s with {args.workers} worker(s), bcrypt cost {args.rounds}")
+        print(f"{rate:.1f} users/s ({rate / args.workers:.1f} per worker); 10k users would take "
+              f"{10_000 / rate / 60:.1f} min")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# benchmarks/export_bench.py
+"""
+Export throughput and peak memory: streaming CSV/Parquet vs. loading every
+row with .all().
+
+    python -m benchmarks.export_bench [--records 1000000] [--batch-size 5000]
+
+Seeds a temporary SQLite file, then runs each export in a fresh process
+so its peak RSS (ru_maxrss) is its own. Output is discarded.
+
+RSS includes SQLite's page cache and mmap window (SQLITE_CACHE_SIZE_KB,
+SQLITE_MMAP_SIZE), which fill up to their limits on big exports; set
+SQLITE_MMAP_SIZE=0 SQLITE_CACHE_SIZE_KB=2000 to see the Python side alone.
+"""
+import argparse
+import multiprocessing
+import resource
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, create_db_engine
+from app.models import AttendanceRecord, AttendanceSession, User
+from app.utils.attendance_export import export_query, iter_csv, iter_export_batches, iter_parquet
+
+USERS = 5000
+STUDENTS_PER_SESSION = 250
+
+
+def seed(url, records):
+    engine = create_db_engine(url)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    start = datetime(2026, 1, 5, 8, tzinfo=timezone.utc)
+    db.bulk_insert_mappings(User, [
+        {"user_id": i, "full_name": f"Student {i}", "email": f"s{i}@example.com", "password_hash": "x", "role": "student", "matric_number": f"M{i:06d}"}
+        for i in range(1, USERS + 1)
+    ])
+    db.bulk_insert_mappings(AttendanceSession, [
+        {"session_id": i, "title": f"Lecture {i}", "start_time": start, "end_time": start, "qr_code": ""}
+        for i in range(1, records // STUDENTS_PER_SESSION + 2)
+    ])
+    for offset in range(0, records, 100_000):
+        db.bulk_insert_mappings(AttendanceRecord, [
+            {
+                "session_id": i // STUDENTS_PER_SESSION + 1,
+                "user_id": i % USERS + 1,
+                "check_in_time": start + timedelta(minutes=i // 50),
+                "check_out_time": start + timedelta(minutes=i // 50 + 55),
+                "gps_lat": 6.52, "gps_lon": 3.37, "face_match_score": 0.87, "vpn_detected": False,
+            }
+            for i in range(offset, min(records, offset + 100_000))
+        ])
+        db.commit()
+    db.close()
+
+
+def run_export(url, mode, batch_size, results):
+    SessionLocal = sessionmaker(bind=create_db_engine(url))
+    started = time.perf_counter()
+    rows = size = 0
+    if mode == "all()":
+        db = SessionLocal()
+        result = db.execute(export_query()).all()
+        rows = len(result)
+        db.close()
+    else:
+        def counted(batches):
+            nonlocal rows
+            for batch in batches:
+                rows += len(batch)
+                yield batch
+
+        batches = counted(iter_export_batches(SessionLocal, export_query(), batch_size=batch_size))
+        for chunk in (iter_csv if mode == "csv" else iter_parquet)(batches):
+            size += len(chunk)
+    elapsed = time.perf_counter() - started
+    results.put((mode, rows, elapsed, size, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{Path(tmp) / 'export.db'}"
+        seeder = context.Process(target=seed, args=(url, args.records))
+        seeder.start()
+        seeder.join()
+
+        results = context.Queue()
+        for mode in ("csv", "parquet", "all()"):
+            process = context.Process(target=run_export, args=(url, mode, args.batch_size, results))
+            process.start()
+            mode, rows, elapsed, size, peak_mb = results.get()
+            process.join()
+            output = f"{size / 1e6:8.1f} MB out" if size else " " * 15
+            print(f"{mode:<8} {rows:>10,} rows  {rows / elapsed:>10,.0f} rows/s  {output}  peak RSS {peak_mb:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
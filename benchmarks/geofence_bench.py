@@ -0,0 +1,70 @@
+# benchmarks/geofence_bench.py
+"""
+Geofence throughput over a term's worth of attendance coordinates.
+
+    python -m benchmarks.geofence_bench [--records 1000000] [--db attendance.db]
+
+Defaults to synthetic points scattered around a lecture hall (about 300
+students x 3 lectures a week x 15 weeks x 75 courses). With --db the
+coordinates of attendance_records are read from that SQLite file instead.
+"""
+import argparse
+import sqlite3
+import time
+
+import numpy as np
+
+from app.utils.geofence import CircleZone, PolygonZone
+from app.utils.gps_check import check_gps_location
+
+CENTER = (6.5244, 3.3792)
+HALL = [[6.5240, 3.3790], [6.5240, 3.3799], [6.5245, 3.3799], [6.5245, 3.3790]]
+
+
+def load_points(args):
+    if args.db:
+        rows = sqlite3.connect(args.db).execute(
+            "SELECT gps_lat, gps_lon FROM attendance_records WHERE gps_lat IS NOT NULL AND gps_lon IS NOT NULL"
+        ).fetchall()
+        data = np.array(rows, dtype=np.float64).reshape(-1, 2)
+        return data[:, 0], data[:, 1]
+    rng = np.random.default_rng(0)
+    # Most students are in the room, some are at home across the city
+    near = rng.random(args.records) < 0.9
+    spread = np.where(near, 0.001, 0.05)
+    return CENTER[0] + rng.normal(0, spread), CENTER[1] + rng.normal(0, spread)
+
+
+def timed(label, fn, count):
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<34} {count / elapsed:>14,.0f} points/s  ({elapsed * 1000:8.1f} ms)")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--db")
+    args = parser.parse_args()
+
+    lats, lons = load_points(args)
+    count = len(lats)
+    print(f"{count:,} points")
+
+    circle = CircleZone(*CENTER, 100)
+    polygon = PolygonZone(HALL)
+    sample = min(count, 100_000)
+    timed(
+        f"scalar check_gps_location ({sample:,})",
+        lambda: [check_gps_location(lat, lon, *CENTER, 100) for lat, lon in zip(lats[:sample], lons[:sample])],
+        sample,
+    )
+    inside = timed("vectorized circle", lambda: circle.contains(lats, lons), count)
+    timed("vectorized polygon", lambda: polygon.contains(lats, lons), count)
+    print(f"{inside.mean():.1%} inside the circle")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# benchmarks/ip_ranges_bench.py
+"""
+Offline VPN/datacenter lookup throughput.
+
+    python -m benchmarks.ip_ranges_bench [--ranges 200000] [--lookups 200000]
+
+Builds random IPv4 and IPv6 range sets of the given size (roughly the size
+of public datacenter + VPN lists) and times lookups of random addresses.
+"""
+import argparse
+import ipaddress
+import random
+import time
+
+from app.utils.ip_ranges import IPRangeSet
+
+
+def random_cidrs(count, rng):
+    cidrs = []
+    for _ in range(count):
+        if rng.random() < 0.8:
+            prefix = rng.randint(16, 28)
+            address = ipaddress.IPv4Address(rng.getrandbits(32))
+        else:
+            prefix = rng.randint(32, 64)
+            address = ipaddress.IPv6Address(rng.getrandbits(128))
+        cidrs.append(f"{address}/{prefix}")
+    return cidrs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ranges", type=int, default=200_000)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    cidrs = random_cidrs(args.ranges, rng)
+    started = time.perf_counter()
+    ranges = IPRangeSet(cidrs)
+    print(f"built {len(ranges)} merged ranges from {len(cidrs)} CIDRs in {time.perf_counter() - started:.2f}s")
+
+    for label, bits, cls in (("IPv4", 32, ipaddress.IPv4Address), ("IPv6", 128, ipaddress.IPv6Address)):
+        addresses = [cls(rng.getrandbits(bits)) for _ in range(args.lookups)]
+        started = time.perf_counter()
+        hits = sum(ranges.contains(address) for address in addresses)
+        elapsed = time.perf_counter() - started
+        print(
+            f"{label}: {args.lookups / elapsed:,.0f} lookups/s, "
+            f"{elapsed / args.lookups * 1e6:.2f} us/lookup, {hits} hits"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# benchmarks/live_events_bench.py
+"""
+Fan-out cost of the live event hub: one session, many subscribers, some
+of which never read.
+
+    python -m benchmarks.live_events_bench [--subscribers 2000] [--events 1000] [--stalled 0.1]
+"""
+import argparse
+import asyncio
+import time
+
+from app.utils.live_events import LiveEventHub
+
+
+async def run(args):
+    hub = LiveEventHub(max_subscribers=args.subscribers)
+    subscriptions = [hub.subscribe(1) for _ in range(args.subscribers)]
+    readers = subscriptions[int(len(subscriptions) * args.stalled):]
+    received = 0
+
+    async def read(subscription):
+        nonlocal received
+        while await subscription.get(timeout=0.5) is not None:
+            received += 1
+
+    tasks = [asyncio.create_task(read(s)) for s in readers]
+    started = time.perf_counter()
+    for i in range(args.events):
+        hub.publish_attendance(1, i, "check_in")
+        if i % 50 == 0:
+            await asyncio.sleep(0)  # let readers run, as requests would
+    publish_elapsed = time.perf_counter() - started
+    await asyncio.gather(*tasks)
+
+    deliveries = args.events * args.subscribers
+    print(f"{args.subscribers:,} subscribers ({len(subscriptions) - len(readers):,} stalled), {args.events:,} events")
+    print(f"publish: {args.events / publish_elapsed:,.0f} events/s, {deliveries / publish_elapsed:,.0f} deliveries/s")
+    print(f"read by live clients: {received:,}; stats: {hub.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, default=2000)
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--stalled", type=float, default=0.1, help="fraction of subscribers that never read")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# benchmarks/loadtest.py
+"""
+Concurrent load generator for the Attendly API.
+
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --image face.jpg \
+        --session-id 1 --user-id 2 --concurrency 50 --requests 500
+
+    python -m benchmarks.loadtest --simulate
+
+--simulate needs no server or model: it runs an in-process app with a
+check-in that does 50 ms of blocking work either inline on the event loop
+or through the bounded executor, and probes a trivial endpoint alongside
+to show how much the loop stalls.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(label, latencies, elapsed, errors=0):
+    print(
+        f"{label:<24} {len(latencies) / elapsed:8.1f} req/s  "
+        f"p50 {percentile(latencies, 50) * 1000:7.1f} ms  "
+        f"p95 {percentile(latencies, 95) * 1000:7.1f} ms  "
+        f"p99 {percentile(latencies, 99) * 1000:7.1f} ms  "
+        f"errors {errors}"
+    )
+
+
+async def fire(client, make_request, total, concurrency):
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await make_request(client)
+                if response.status_code >= 500:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(total)])
+    return latencies, time.perf_counter() - started, errors
+
+
+async def probe(client, path, stop):
+    # Latency of a trivial endpoint while the load runs = event loop stall
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get(path)
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+async def run_live(args):
+    with open(args.image, "rb") as f:
+        image_bytes = f.read()
+    data = {
+        "session_id": str(args.session_id),
+        "user_id": str(args.user_id),
+        "latitude": str(args.latitude),
+        "longitude": str(args.longitude),
+    }
+
+    def make_request(client):
+        return client.post(
+            "/attendance/mark_attendance",
+            data=data,
+            files={"image": ("face.jpg", image_bytes, "image/jpeg")},
+        )
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=60, limits=limits) as client:
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, "/", stop))
+        latencies, elapsed, errors = await fire(client, make_request, args.requests, args.concurrency)
+        stop.set()
+        report("mark_attendance", latencies, elapsed, errors)
+        probe_latencies = await probe_task
+        report("  / while loaded", probe_latencies, elapsed)
+
+
+def build_simulated_app():
+    from fastapi import FastAPI
+    from app.utils.executors import BoundedExecutor
+
+    executor = BoundedExecutor("sim", max_workers=32, max_queue=512)
+    app = FastAPI()
+
+    def blocking_check_in():
+        time.sleep(0.05)
+        return {"status": "success"}
+
+    @app.post("/inline")
+    async def inline():
+        return blocking_check_in()
+
+    @app.post("/offloaded")
+    async def offloaded():
+        return await executor.run(blocking_check_in)
+
+    @app.get("/")
+    async def root():
+        return {}
+
+    return app
+
+
+async def run_simulated(args):
+    transport = httpx.ASGITransport(app=build_simulated_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://sim") as client:
+        for path in ("/inline", "/offloaded"):
+            stop = asyncio.Event()
+            probe_task = asyncio.create_task(probe(client, "/", stop))
+            latencies, elapsed, errors = await fire(client, lambda c: c.post(path), args.requests, args.concurrency)
+            stop.set()
+            report(path, latencies, elapsed, errors)
+            probe_latencies = await probe_task
+            report("  / while loaded", probe_latencies, elapsed)
+            if probe_latencies:
+                print(f"  probe max {max(probe_latencies) * 1000:.1f} ms, mean {statistics.mean(probe_latencies) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--image")
+    parser.add_argument("--session-id", type=int, default=1)
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--latitude", type=float, default=0.0)
+    parser.add_argument("--longitude", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--simulate", action="store_true")
+    args = parser.parse_args()
+
+    if args.simulate:
+        asyncio.run(run_simulated(args))
+    else:
+        if not args.image:
+            parser.error("--image is required against a live server")
+        asyncio.run(run_live(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# benchmarks/login_bench.py
+"""
+Login throughput: bcrypt verifications per second through the password
+pool, and per core.
+
+    python -m benchmarks.login_bench [--logins 64] [--rounds 10 12] [--workers N]
+
+Fires --logins concurrent verifications (a start-of-term burst) at a pool
+of --workers threads (default: one per core) for each bcrypt cost, and
+prints throughput plus the queue wait the last login in the burst saw.
+bcrypt releases the GIL, so threads scale with cores.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from passlib.context import CryptContext
+
+from app.utils.executors import BoundedExecutor
+
+
+async def burst(pool, context, hashed, logins):
+    started = time.perf_counter()
+    results = await asyncio.gather(*[
+        pool.run(context.verify_and_update, "correct horse battery staple", hashed) for _ in range(logins)
+    ])
+    assert all(matches for matches, _ in results)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 12])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    print(f"{args.workers} worker(s), {os.cpu_count()} core(s), {args.logins} concurrent logins")
+    print(f"{'rounds':>6} {'ms/login':>9} {'logins/s':>9} {'per core':>9} {'max wait ms':>12}")
+    for rounds in args.rounds:
+        context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+        hashed = context.hash("correct horse battery staple")
+        pool = BoundedExecutor("password", max_workers=args.workers, max_queue=args.logins)
+        elapsed = asyncio.run(burst(pool, context, hashed, args.logins))
+        stats = pool.stats()
+        pool.shutdown()
+        rate = args.logins / elapsed
+        cores = min(args.workers, os.cpu_count() or 1)
+        print(f"{rounds:>6} {stats['mean_run_ms']:>9.1f} {rate:>9.1f} {rate / cores:>9.1f} "
+              f"{stats['max_queue_wait_ms']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# benchmarks/pagination_bench.py
+"""
+Deep-page cost of OFFSET/LIMIT vs. keyset cursors on attendance_records.
+
+    python -m benchmarks.pagination_bench [--records 500000] [--page-size 50]
+
+Seeds a fresh SQLite file, then fetches the same page at increasing depths
+both ways. OFFSET walks and discards every preceding row; the keyset query
+seeks straight to the cursor through the (created_at, record_id) index.
+"""
+import argparse
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, create_db_engine
+from app.models import AttendanceRecord
+from app.utils.pagination import encode_cursor, keyset_page
+
+
+def seed(db, records):
+    start = datetime.now(timezone.utc) - timedelta(days=365)
+    db.bulk_insert_mappings(AttendanceRecord, [
+        {
+            "session_id": i // 300 + 1,
+            "user_id": i % 300 + 1,
+            # Bursts of identical timestamps, as a bulk import would leave
+            "created_at": start + timedelta(seconds=i // 10),
+            "check_in_time": start + timedelta(seconds=i // 10),
+        }
+        for i in range(records)
+    ])
+    db.commit()
+
+
+def timed(fn, repeat=5):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        rows = fn()
+    return (time.perf_counter() - started) / repeat * 1000, rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=500_000)
+    parser.add_argument("--page-size", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{Path(tmp) / 'pagination.db'}")
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine)()
+        seed(db, args.records)
+
+        newest_first = select(AttendanceRecord).order_by(
+            AttendanceRecord.created_at.desc(), AttendanceRecord.record_id.desc()
+        )
+        print(f"{'depth':>10} {'offset ms':>10} {'keyset ms':>10}")
+        depths = [args.page_size * 10 ** i for i in range(6) if args.page_size * 10 ** i < args.records]
+        for depth in depths + [args.records - args.page_size]:
+            offset_ms, rows = timed(lambda: db.execute(newest_first.offset(depth).limit(args.page_size)).scalars().all())
+            # The cursor a client would hold after reading `depth` rows
+            before = db.execute(newest_first.offset(depth - 1).limit(1)).scalar_one()
+            cursor = encode_cursor(before.created_at, before.record_id)
+            # keyset_page fetches one extra row to detect a next page
+            query = keyset_page(
+                select(AttendanceRecord), AttendanceRecord.created_at, AttendanceRecord.record_id,
+                cursor, args.page_size - 1,
+            )
+            keyset_ms, keyset_rows = timed(lambda: db.execute(query).scalars().all())
+            assert [r.record_id for r in keyset_rows] == [r.record_id for r in rows]
+            print(f"{depth:>10,} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# benchmarks/preprocess_bench.py
+"""
+Full-resolution decode vs the upload preprocessing pipeline.
+
+    python -m benchmarks.preprocess_bench [--images DIR] [--faces]
+
+Without --images a synthetic 12 MP JPEG is used. --faces (needs deepface
+and photos containing faces) also compares the Facenet embedding of the
+full frame with that of the preprocessed frame, to show match scores hold.
+"""
+import argparse
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+from app.utils.image_preprocess import IMAGE_MAX_EDGE, decode_image
+
+
+def synthetic_jpeg(width=4000, height=3000):
+    rng = np.random.default_rng(0)
+    small = rng.integers(0, 255, (height // 16, width // 16, 3), dtype=np.uint8)
+    frame = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return encoded.tobytes()
+
+
+def timed(fn, data, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        frame = fn(data)
+    return (time.perf_counter() - started) / repeat * 1000, frame
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--faces", action="store_true")
+    args = parser.parse_args()
+
+    if args.images:
+        paths = sorted(
+            p for ext in ("jpg", "jpeg", "png") for p in glob.glob(os.path.join(args.images, f"*.{ext}"))
+        )
+        samples = [(os.path.basename(p), open(p, "rb").read()) for p in paths]
+    else:
+        samples = [("synthetic-12mp.jpg", synthetic_jpeg())]
+
+    full_decode = lambda data: cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    print(f"max edge {IMAGE_MAX_EDGE}px, {args.repeat} repeats per image")
+    for name, data in samples:
+        full_ms, full = timed(full_decode, data, args.repeat)
+        fast_ms, fast = timed(decode_image, data, args.repeat)
+        line = (
+            f"{name:<28} full {full_ms:7.1f} ms {full.nbytes / 1e6:6.1f} MB   "
+            f"preprocessed {fast_ms:6.1f} ms {fast.nbytes / 1e6:5.1f} MB   "
+            f"speedup {full_ms / fast_ms:4.1f}x"
+        )
+        if args.faces:
+            from app.utils.face_model import face_model
+
+            a, b = face_model.represent(full), face_model.represent(fast)
+            line += f"   embedding cosine {np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)):.4f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
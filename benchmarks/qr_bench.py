@@ -0,0 +1,54 @@
+# benchmarks/qr_bench.py
+"""
+Cost of serving a session QR: the old per-request render vs. the
+fixed-mask PNG/SVG renderers, a cache hit, and a rotating token.
+
+    python -m benchmarks.qr_bench [--repeat 500]
+"""
+import argparse
+import io
+import time
+
+import qrcode
+
+from app.utils.session_qr import (
+    QrCache, render_png, render_svg, rotating_token, rotation_step, verify_rotating_token,
+)
+
+
+def legacy_render(data):
+    # What create-session did on every call before
+    qr = qrcode.QRCode(version=1, box_size=10, border=4)
+    qr.add_data(data)
+    qr.make(fit=True)
+    buf = io.BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def timed(label, fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    print(f"{label:<26} {(time.perf_counter() - started) / repeat * 1e6:10.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    token = rotating_token(1234, rotation_step(5), secret="benchmark")
+    cache = QrCache()
+    cache.put(token, "svg", render_svg(token))
+
+    timed("legacy PNG render", lambda: legacy_render(token), args.repeat)
+    timed("PNG render", lambda: render_png(token), args.repeat)
+    timed("SVG render", lambda: render_svg(token), args.repeat)
+    timed("cache hit", lambda: cache.get(token, "svg"), args.repeat)
+    timed("rotating token", lambda: rotating_token(1234, rotation_step(5), secret="benchmark"), args.repeat)
+    timed("verify token", lambda: verify_rotating_token(token, 1234, 5, secret="benchmark"), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/timetable_bench.py
+"""
+Creating a semester timetable: N courses meeting a few times a week for
+15 weeks, generated in one transaction. Compares the old path (one
+create-session per occurrence, each rendering and storing its QR PNG)
+with bulk generation of the rolling window and of the full range.
+
+    python -m benchmarks.timetable_bench [--courses 200] [--weeks 15] [--legacy-sample 200]
+"""
+import argparse
+import tempfile
+import time
+from datetime import date, datetime, time as clock, timedelta
+
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, create_db_engine
+from app.models import AttendanceSession
+from app.schemas import RecurringScheduleCreate
+from app.utils.session_qr import render_png, static_payload
+from app.utils.timetable import generate_sessions, materialize, new_schedule
+
+
+def make_db(directory, name):
+    engine = create_db_engine(f"sqlite:///{directory}/{name}.db")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def schedules(courses, first_day, weeks):
+    for i in range(courses):
+        yield RecurringScheduleCreate(
+            title=f"COURSE {i:03d}",
+            weekdays=[1 + i % 5, 1 + (i + 2) % 5, 1 + (i + 4) % 5][: 2 + i % 2],
+            start_time=clock(8 + i % 9, 0),
+            duration_minutes=60 + 60 * (i % 2),
+            start_date=first_day,
+            end_date=first_day + timedelta(weeks=weeks) - timedelta(days=1),
+            gps_lat=6.5 + i / 1000, gps_lon=3.3, allowed_radius=100,
+        )
+
+
+def bulk(SessionLocal, specs, today, window_days):
+    started = time.perf_counter()
+    db = SessionLocal()
+    rows = [new_schedule(spec, created_by=1) for spec in specs]
+    db.add_all(rows)
+    db.flush()
+    if window_days is None:
+        created = generate_sessions(db, rows, rows[0].start_date, rows[0].end_date)
+    else:
+        created = materialize(db, rows, today=today, window_days=window_days)
+    db.commit()
+    db.close()
+    return created, time.perf_counter() - started
+
+
+def legacy(SessionLocal, specs, sample):
+    # One ORM insert + flush, PNG render and commit per occurrence, as
+    # create-session does; timed on a sample and extrapolated
+    occurrences = []
+    for spec in specs:
+        schedule = new_schedule(spec)
+        day = schedule.start_date
+        while day <= schedule.end_date:
+            if str(day.isoweekday()) in schedule.weekdays.split(","):
+                occurrences.append((spec, day))
+            day += timedelta(days=1)
+    db = SessionLocal()
+    started = time.perf_counter()
+    for spec, day in occurrences[:sample]:
+        start = datetime.combine(day, spec.start_time)
+        session = AttendanceSession(
+            title=spec.title, start_time=start, end_time=start + timedelta(minutes=spec.duration_minutes),
+            created_by=1, qr_code="", gps_lat=spec.gps_lat, gps_lon=spec.gps_lon, allowed_radius=spec.allowed_radius,
+        )
+        db.add(session)
+        db.flush()
+        session.qr_code = f"/sessions/{session.session_id}/qr"
+        session.qr_image = render_png(static_payload(session.session_id, session.end_time))
+        db.commit()
+    elapsed = time.perf_counter() - started
+    db.close()
+    return len(occurrences), elapsed / max(1, min(sample, len(occurrences))) * len(occurrences)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--courses", type=int, default=200)
+    parser.add_argument("--weeks", type=int, default=15)
+    parser.add_argument("--legacy-sample", type=int, default=200)
+    args = parser.parse_args()
+
+    first_day = date(2026, 1, 5)
+    specs = list(schedules(args.courses, first_day, args.weeks))
+    with tempfile.TemporaryDirectory() as directory:
+        total, legacy_seconds = legacy(make_db(directory, "legacy"), specs, args.legacy_sample)
+        print(f"{'per-session create (est.)':<28} {total:6d} sessions {legacy_seconds * 1000:10.1f} ms")
+        created, seconds = bulk(make_db(directory, "window"), specs, first_day, 14)
+        print(f"{'bulk, 14-day window':<28} {created:6d} sessions {seconds * 1000:10.1f} ms")
+        created, seconds = bulk(make_db(directory, "full"), specs, first_day, None)
+        print(f"{'bulk, full semester':<28} {created:6d} sessions {seconds * 1000:10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
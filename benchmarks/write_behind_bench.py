@@ -0,0 +1,85 @@
+# benchmarks/write_behind_bench.py
+"""
+Attendance write throughput: one commit per check-in vs. the write-behind queue.
+
+    python -m benchmarks.write_behind_bench [--events 5000] [--clients 32] [--fsync]
+
+Both modes write to a fresh SQLite file in WAL mode from `--clients`
+threads, mimicking the io_executor. Records/s is measured until every
+event is committed.
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from app.utils.attendance_store import upsert_attendance
+from app.utils.attendance_store_test import make_sessionmaker
+from app.utils.write_behind import AttendanceEvent, WriteBehindQueue
+
+
+def events(count):
+    now = datetime.now(timezone.utc)
+    return [AttendanceEvent(i % 50, i, 6.52, 3.37, 0.9, now) for i in range(count)]
+
+
+def run_direct(SessionLocal, batch, clients):
+    def save(event):
+        db = SessionLocal()
+        try:
+            upsert_attendance(db, event.session_id, event.user_id, event.latitude, event.longitude, event.score, now=event.at)
+            db.commit()
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(save, batch))
+
+
+def run_write_behind(SessionLocal, batch, clients, log_path, fsync):
+    queue = WriteBehindQueue(SessionLocal, log_path=log_path, log_fsync=fsync)
+    queue.start()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(queue.submit, batch))
+    queue.stop()
+    return queue.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--fsync", action="store_true", help="fsync the write-behind log on every event")
+    args = parser.parse_args()
+    batch = events(args.events)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        SessionLocal = make_sessionmaker(_Path(tmp, "direct"))
+        started = time.perf_counter()
+        run_direct(SessionLocal, batch, args.clients)
+        elapsed = time.perf_counter() - started
+        print(f"{'commit per check-in':<24} {args.events / elapsed:>10,.0f} records/s  ({elapsed:6.2f} s)")
+
+        SessionLocal = make_sessionmaker(_Path(tmp, "write_behind"))
+        started = time.perf_counter()
+        stats = run_write_behind(SessionLocal, batch, args.clients, os.path.join(tmp, "wb.log"), args.fsync)
+        elapsed = time.perf_counter() - started
+        print(
+            f"{'write-behind':<24} {args.events / elapsed:>10,.0f} records/s  ({elapsed:6.2f} s, "
+            f"{stats['batches']} batches, mean {stats['mean_batch_size']:.0f}, {stats['mean_flush_ms']:.1f} ms/flush)"
+        )
+
+
+def _Path(tmp, name):
+    # make_sessionmaker expects a pathlib-style directory
+    from pathlib import Path
+
+    path = Path(tmp) / name
+    path.mkdir()
+    return path
+
+
+if __name__ == "__main__":
+    main()